@@ -10,12 +10,14 @@ from PySide6.QtWidgets import (
     QToolBar, QDoubleSpinBox,
     QGraphicsScene, QGraphicsView,
     QGraphicsTextItem, QGraphicsEllipseItem, QGraphicsPathItem, QGraphicsItem, QGraphicsRectItem, QGraphicsSceneMouseEvent,
-    QStyle, QStyleOptionGraphicsItem
+    QStyle, QStyleOptionGraphicsItem,
+    QTableView, QHeaderView
 )
 from PySide6.QtCore import (
     Qt, QObject, QEvent, QTimer, QKeyCombination,
     QPoint, QPointF, QLineF, QRect, QRectF, QCoreApplication, QStandardPaths, QSettings, Signal,
-    QVariantAnimation
+    QVariantAnimation,
+    QAbstractTableModel, QModelIndex, QSortFilterProxyModel
 )
 from PySide6.QtGui import (
     QGuiApplication, QInputDevice, QAction, QActionGroup, QKeySequence, QCursor,
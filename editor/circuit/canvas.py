@@ -60,11 +60,20 @@ class CircuitScene(QGraphicsScene):
         self.addItem(self.ghostPin)
 
         self.idle_frames = 0
+        self.defrag_after = 60  # quiet frames (~1 s) before the layout is checked for fragmentation
+        self.defrag_revision = -1  # logic.revision the quiet spell started at
+        self.defrag_pending = False  # the layout may still need defragment() steps
 
         # Flat registry: indexed by gate.location; grows on demand.
         # Lets the async consumer do O(1) widget lookups instead of scanning all comps.
         self.comp_registry: list[CompItem | None] = []
 
+        # Frame-budgeted refresh: widgets still waiting for this frame (ordered set),
+        # dirty widgets outside the viewport, and the seconds of refresh work per frame.
+        self.ui_pending: dict[QGraphicsItem, None] = {}
+        self.deferred: set[QGraphicsItem] = set()
+        self.frame_budget = 0.008
+
         # Defer task creation until QtAsyncio has installed its event loop.
         # asyncio.create_task() requires a running loop; the loop only starts
         # after QtAsyncio.run() is called (after AppWindow.__init__ returns).
@@ -78,25 +87,72 @@ class CircuitScene(QGraphicsScene):
 
 
     # ── Async UI consumer ─────────────────────────────────────────────
+    def _visible_rect(self) -> QRectF | None:
+        """Union of the scene areas shown by the attached views (None when headless)."""
+        views = self.views()
+        if not views:
+            return None
+        rect = QRectF()
+        for view in views:
+            rect = rect.united(view.mapToScene(view.viewport().rect()).boundingRect())
+        return rect
+
     async def async_ui_updater(self):
-        """Drain the engine's visual_queue and refresh only the dirty widgets."""
+        """Drain the engine's visual_queue and refresh only the dirty widgets.
+        Widgets outside the viewport wait in `deferred` until they scroll into view,
+        and each frame stops refreshing once `frame_budget` seconds are spent."""
         self._ui_wakeup_event = asyncio.Event()
+        last_view = None
 
         while True:
-            if logic.visual_queue_empty():
+            if logic.visual_queue_empty() and not self.ui_pending:
                 await asyncio.sleep(0.016)
-            # a longer break just in case the queue is empty
-            
-            size=logic.visual_queue_size()
-            while size:
-                size-=1
-                gate_id = logic.pop_visual_queue()
-                if gate_id < 0:
-                    print('Error Found while updating')
-                if gate_id < len(self.comp_registry):
-                    comp = self.comp_registry[gate_id]
+                # a longer break just in case the queue is empty
+                self.idle_frames += 1
+                if logic.revision != self.defrag_revision:  # an edit starts a new quiet spell
+                    self.defrag_revision = logic.revision
+                    self.idle_frames = 0
+                    self.defrag_pending = True
+                elif self.defrag_pending and self.idle_frames >= self.defrag_after:
+                    if self.idle_frames == self.defrag_after:
+                        logic.collect(True)  # keep the profiles: undo renews deleted gates
+                    self.defrag_pending = self.defragment()  # one bounded step per quiet frame
+            else:
+                self.idle_frames = 0
+            deadline = time.perf_counter() + self.frame_budget
+
+            # one call drains the whole queue and clears the update flags natively;
+            # the dict keeps arrival order and folds repeats of the same widget
+            pending = self.ui_pending
+            registry = self.comp_registry
+            size = len(registry)
+            for gate_id in logic.drain_visual_queue():
+                if gate_id < size:
+                    comp = registry[gate_id]
                     if comp is not None:
+                        pending[comp] = None
+
+            view = self._visible_rect()
+            if view is not None and self.deferred and view != last_view:
+                # pull back the deferred widgets that scrolled into view
+                shown = [comp for comp in self.deferred if comp.sceneBoundingRect().intersects(view)]
+                for comp in shown:
+                    self.deferred.discard(comp)
+                    pending[comp] = None
+            last_view = view
+
+            if pending:
+                batch = list(pending)
+                pending.clear()
+                for i, comp in enumerate(batch):
+                    if not i & 31 and time.perf_counter() > deadline:
+                        # out of time: the rest carries over to the next frame
+                        pending.update(dict.fromkeys(batch[i:]))
+                        break
+                    if view is None or comp.sceneBoundingRect().intersects(view):
                         comp.poll_update()
+                    else:
+                        self.deferred.add(comp)
 
             # Yield to Qt event loop for the remainder of the frame
             await asyncio.sleep(0)# lower values don't mean anything 0 == 0.005
@@ -116,16 +172,19 @@ class CircuitScene(QGraphicsScene):
             for i, logic_pin in enumerate(comp._unit.inputs):
                 self._ensure_registry_size(logic_pin.location)
                 self.comp_registry[logic_pin.location] = comp._pinslist[CompEdge.INPUT][i]
+                logic.observe(logic_pin, True)
             
             for i, logic_pin in enumerate(comp._unit.outputs):
                 self._ensure_registry_size(logic_pin.location)
                 self.comp_registry[logic_pin.location] = comp._pinslist[CompEdge.OUTPUT][i]
+                logic.observe(logic_pin, True)
         else:
             loc = comp._unit.location
             if loc<0:
                 print('Error Found')
             self._ensure_registry_size(loc)
             self.comp_registry[loc] = comp
+            logic.observe(comp._unit, True)
 
     def unregister_comp(self, comp: CompItem):
         """Remove a visual CompItem from comp_registry."""
@@ -134,11 +193,39 @@ class CircuitScene(QGraphicsScene):
         if comp._unit.id == Const.IC_ID:
             for logic_pin in comp._unit.inputs + comp._unit.outputs:
                 if logic_pin.location < len(self.comp_registry):
+                    self._forget_widget(self.comp_registry[logic_pin.location])
                     self.comp_registry[logic_pin.location] = None
+                logic.observe(logic_pin, False)
         else:
             loc = comp._unit.location
             if loc < len(self.comp_registry):
                 self.comp_registry[loc] = None
+            self._forget_widget(comp)
+            logic.observe(comp._unit, False)
+
+    def remap_registry(self, moves):
+        """Follow the flat old, new location pairs from defragment() in comp_registry."""
+        registry = self.comp_registry
+        comps = [registry[old] if old < len(registry) else None for old in moves[::2]]
+        for comp, new in zip(comps, moves[1::2]):
+            if comp is not None:
+                self._ensure_registry_size(new)
+            if new < len(registry):
+                registry[new] = comp
+
+    def defragment(self, force: bool = False) -> bool:
+        """Take one bounded re-packing step once the backend reports enough fragmentation,
+        and follow the moved gates with the registry. Deleted gates stay in place for undo.
+        Returns whether anything moved, the idle loop keeps stepping until nothing does."""
+        moves = logic.defragment(force)
+        self.remap_registry(moves)
+        return len(moves) > 0
+
+    def _forget_widget(self, widget):
+        """Drop a widget from the pending and deferred refresh sets."""
+        if widget is not None:
+            self.ui_pending.pop(widget, None)
+            self.deferred.discard(widget)
 
 
     # Editor State Management
@@ -148,6 +235,9 @@ class CircuitScene(QGraphicsScene):
             self.simulationMode=Const.SIMULATE
         else:
             logic.reset()
+            # every widget is polled below, so nothing stays deferred
+            self.ui_pending.clear()
+            self.deferred.clear()
             for comp in self.comp_registry:
                 if comp is  not None:
                     comp.poll_update()
@@ -586,6 +676,8 @@ class CircuitScene(QGraphicsScene):
         self.comps  = []
         self.iclist = []
         self.comp_registry=[]
+        self.ui_pending.clear()
+        self.deferred.clear()
         logic.clearcircuit()
         self.undo_stack.setClean()
     
@@ -626,19 +718,20 @@ class CircuitScene(QGraphicsScene):
                         p = cast(OutputPinItem, comp._pinslist[edge][i])
                         sources[w] = p
 
-        # Wiring
-        for id, outpin in sources.items():
-            if id not in supplies: continue
+        # Wiring, settled in one wave once every wire is in
+        with logic.batch():
+            for id, outpin in sources.items():
+                if id not in supplies: continue
 
-            inpins = supplies[id]
-            w = WireItem(outpin, inpins.pop(0))
-            
-            for inpin in inpins:
-                w.addSupply(inpin)
-            
-            self.wires.append(w)
-            self.addItem(w)
-            new_wires.append(w)
+                inpins = supplies[id]
+                w = WireItem(outpin, inpins.pop(0))
+
+                for inpin in inpins:
+                    w.addSupply(inpin)
+
+                self.wires.append(w)
+                self.addItem(w)
+                new_wires.append(w)
 
         # Full circuit is now built — simulate from scratch
         # if self.simulationMode != Const.DESIGN:
@@ -64,74 +64,76 @@ class DeleteCommand(QUndoCommand):
         return list(wires)
 
     def redo(self):
-        # 1. MARK DELETED GATES
-        for comp in self.items_to_delete:
-            if comp._unit:
-                logic.delobj(comp._unit)
-
-        # 2. DISAPPEAR COMPONENTS
-        for comp in self.items_to_delete:
-            self.scene.removeItem(comp)
-            self.scene.comps.remove(comp)
-
-        # 3. DISAPPEAR WIRES & HANDLE BOUNDARY LOGIC
-        for wire in self.wires_to_delete:
-            self.scene.removeItem(wire)
-            self.scene.wires.remove(wire)
+        with logic.batch():
+            # 1. MARK DELETED GATES
+            for comp in self.items_to_delete:
+                if comp._unit:
+                    logic.delobj(comp._unit)
+
+            # 2. DISAPPEAR COMPONENTS
+            for comp in self.items_to_delete:
+                self.scene.removeItem(comp)
+                self.scene.comps.remove(comp)
+
+            # 3. DISAPPEAR WIRES & HANDLE BOUNDARY LOGIC
+            for wire in self.wires_to_delete:
+                self.scene.removeItem(wire)
+                self.scene.wires.remove(wire)
             
-            if wire.source and wire.source.logical:
-                source_unit = wire.source.logical
+                if wire.source and wire.source.logical:
+                    source_unit = wire.source.logical
                 
-                for supply in wire.supplies:
-                    if supply.logical:
-                        target_unit, target_idx = supply.logical
+                    for supply in wire.supplies:
+                        if supply.logical:
+                            target_unit, target_idx = supply.logical
                         
-                        logic.disconnect(target_unit, target_idx)
-                        supply.setWire(None)
-                        comp = self.scene.comp_registry[target_unit.location]
-                        if comp: comp.poll_update()
+                            logic.disconnect(target_unit, target_idx)
+                            supply.setWire(None)
+                            comp = self.scene.comp_registry[target_unit.location]
+                            if comp: comp.poll_update()
                             
-                wire.source.setWire(None)
+                    wire.source.setWire(None)
 
 
     def undo(self):
-        # 1. UNMARK DELETED GATES FIRST
-        for comp in self.items_to_delete:
-            if comp._unit:
-                logic.renewobj(comp._unit)
-
-        # 2. REAPPEAR COMPONENTS
-        for comp in self.items_to_delete:
-            self.scene.addItem(comp)
-            self.scene.comps.append(comp)
+        with logic.batch():
+            # 1. UNMARK DELETED GATES FIRST
+            for comp in self.items_to_delete:
+                if comp._unit:
+                    logic.renewobj(comp._unit)
+
+            # 2. REAPPEAR COMPONENTS
+            for comp in self.items_to_delete:
+                self.scene.addItem(comp)
+                self.scene.comps.append(comp)
             
-        # 3. REAPPEAR WIRES & RECONNECT BOUNDARY LOGIC
-        for wire in self.wires_to_delete:
-            self.scene.addItem(wire)
-            self.scene.wires.append(wire)
+            # 3. REAPPEAR WIRES & RECONNECT BOUNDARY LOGIC
+            for wire in self.wires_to_delete:
+                self.scene.addItem(wire)
+                self.scene.wires.append(wire)
             
-            if wire.source and wire.source.logical:
-                source_unit = wire.source.logical
+                if wire.source and wire.source.logical:
+                    source_unit = wire.source.logical
                 
-                # wire inherits the freshest possible state.
-                comp = self.scene.comp_registry[source_unit.location]
-                if comp: comp.poll_update()
+                    # wire inherits the freshest possible state.
+                    comp = self.scene.comp_registry[source_unit.location]
+                    if comp: comp.poll_update()
                 
-                for supply in wire.supplies:
-                    if supply.logical:
-                        target_unit, target_idx = supply.logical
+                    for supply in wire.supplies:
+                        if supply.logical:
+                            target_unit, target_idx = supply.logical
                         
-                        if supply.getWire() is None: 
-                            logic.connect(target_unit, source_unit, target_idx)
-                            supply.setWire(wire)
+                            if supply.getWire() is None: 
+                                logic.connect(target_unit, source_unit, target_idx)
+                                supply.setWire(wire)
                             
-                            # THE FIX: Force the target to update its UI wires instantly
-                            comp = self.scene.comp_registry[target_unit.location]
-                            if comp: comp.poll_update()
+                                # THE FIX: Force the target to update its UI wires instantly
+                                comp = self.scene.comp_registry[target_unit.location]
+                                if comp: comp.poll_update()
                                 
-                wire.source.setWire(wire)
+                    wire.source.setWire(wire)
                 
-            wire.updateShape()
+                wire.updateShape()
 
 #TODO: clean-up
 class ConnectCommand(QUndoCommand):
@@ -164,42 +166,44 @@ class ConnectCommand(QUndoCommand):
             
         g_wire.updateShape()
 
-        # Logical Connection
-        if t_pin.logical and source.logical:
-            unit, idx = t_pin.logical
+        with logic.batch():
+            # Logical Connection
+            if t_pin.logical and source.logical:
+                unit, idx = t_pin.logical
             
-            # Connecting at a peeking pin
-            if isinstance(unit, Gate) and idx >= unit.inputlimit:
-                self.old_limit = unit.inputlimit
+                # Connecting at a peeking pin
+                if isinstance(unit, Gate) and idx >= unit.inputlimit:
+                    self.old_limit = unit.inputlimit
                 
-                if unit.setlimits(idx + 1):
-                    # Making sure undo remembers gate resize
-                    self.gate_size_changed = True
+                    if unit.setlimits(idx + 1):
+                        # Making sure undo remembers gate resize
+                        self.gate_size_changed = True
             
-            logic.connect(unit, source.logical, idx)
+                logic.connect(unit, source.logical, idx)
 
     def undo(self):
         scene = self.scene
         g_wire = self.ghost_wire
         t_pin = self.target_pin
 
-        # 1. Undo logical connection
-        if t_pin.logical: logic.disconnect(*t_pin.logical)
+        with logic.batch():
+            # 1. Undo logical connection
+            if t_pin.logical: logic.disconnect(*t_pin.logical)
             
-        # 2. Undo UI connection
-        g_wire._cutSupply(t_pin)
-        g_wire.updateShape()
+            # 2. Undo UI connection
+            g_wire._cutSupply(t_pin)
+            g_wire.updateShape()
         
-        if self.added_to_scene:
-            if g_wire in scene.wires:
-                scene.wires.remove(g_wire)
-            scene.removeItem(g_wire)
-            self.added_to_scene = False
+            if self.added_to_scene:
+                if g_wire in scene.wires:
+                    scene.wires.remove(g_wire)
+                scene.removeItem(g_wire)
+                self.added_to_scene = False
         
-        if self.gate_size_changed:
-            gate_comp = cast(GateItem, t_pin.parentComp)
-            gate_comp.setInputCount(self.old_limit)
-            # ^ This automatically calls unit.setlimits(self.old_limit)
+            if self.gate_size_changed:
+                gate_comp = cast(GateItem, t_pin.parentComp)
+                gate_comp.setInputCount(self.old_limit)
+                # ^ This automatically calls unit.setlimits(self.old_limit)
 
 
 #TODO: clean-up
@@ -218,78 +222,80 @@ class PasteCommand(QUndoCommand):
             self.comps, self.wires = self.scene.deserialize(self.data, addToSelected=True)
             return
 
-        # 1. UNMARK DELETED GATES FIRST
-        for comp in self.comps:
-            if comp._unit:
-                logic.renewobj(comp._unit)
+        with logic.batch():
+            # 1. UNMARK DELETED GATES FIRST
+            for comp in self.comps:
+                if comp._unit:
+                    logic.renewobj(comp._unit)
 
-        # 2. REAPPEAR COMPONENTS
-        for comp in self.comps:
-            self.scene.addItem(comp)
-            self.scene.comps.append(comp)
-            self.scene.register_comp(comp)
+            # 2. REAPPEAR COMPONENTS
+            for comp in self.comps:
+                self.scene.addItem(comp)
+                self.scene.comps.append(comp)
+                self.scene.register_comp(comp)
 
-        # 3. REAPPEAR AND RECONNECT WIRES
-        for wire in self.wires:
-            self.scene.addItem(wire)
-            self.scene.wires.append(wire)
+            # 3. REAPPEAR AND RECONNECT WIRES
+            for wire in self.wires:
+                self.scene.addItem(wire)
+                self.scene.wires.append(wire)
 
-            if wire.source and wire.source.logical:
-                source_unit = wire.source.logical
+                if wire.source and wire.source.logical:
+                    source_unit = wire.source.logical
 
-                # wire inherits the freshest possible state.
-                comp = self.scene.comp_registry[source_unit.location]
-                if comp: comp.poll_update()
+                    # wire inherits the freshest possible state.
+                    comp = self.scene.comp_registry[source_unit.location]
+                    if comp: comp.poll_update()
 
-                for supply in wire.supplies:
-                    if supply.logical:
-                        target_unit, target_idx = supply.logical
+                    for supply in wire.supplies:
+                        if supply.logical:
+                            target_unit, target_idx = supply.logical
 
-                        if supply.getWire() is None: 
-                            logic.connect(target_unit, source_unit, target_idx)
-                            supply.setWire(wire)
+                            if supply.getWire() is None: 
+                                logic.connect(target_unit, source_unit, target_idx)
+                                supply.setWire(wire)
 
-                            # THE FIX: Force the target to update its UI wires instantly
-                            comp = self.scene.comp_registry[target_unit.location]
-                            if comp: comp.poll_update()
+                                # THE FIX: Force the target to update its UI wires instantly
+                                comp = self.scene.comp_registry[target_unit.location]
+                                if comp: comp.poll_update()
 
-                wire.source.setWire(wire)
+                    wire.source.setWire(wire)
                 
-            wire.updateShape()
+                wire.updateShape()
 
     def undo(self):
-        # 1. MARK DELETED GATES
-        for comp in self.comps:
-            if comp._unit:
-                logic.delobj(comp._unit)
-
-        # 2. DISAPPEAR COMPONENTS
-        for comp in self.comps:
-            self.scene.removeItem(comp)
-            self.scene.comps.remove(comp)
-            self.scene.unregister_comp(comp)
-
-        # 3. DISAPPEAR AND DISCONNECT WIRES
-        for wire in self.wires:
-            self.scene.removeItem(wire)
-            if wire in self.scene.wires:
-                self.scene.wires.remove(wire)
-
-            if wire.source and wire.source.logical:
-                source_unit = wire.source.logical
-
-                for supply in wire.supplies:
-                    if supply.logical:
-                        target_unit, target_idx = supply.logical
-
-                        logic.disconnect(target_unit, target_idx)
-                        supply.setWire(None)
-
-                        # THE FIX: Force the alive target to update its UI wires instantly
-                        comp = self.scene.comp_registry[target_unit.location]
-                        if comp: comp.poll_update()
+        with logic.batch():
+            # 1. MARK DELETED GATES
+            for comp in self.comps:
+                if comp._unit:
+                    logic.delobj(comp._unit)
+
+            # 2. DISAPPEAR COMPONENTS
+            for comp in self.comps:
+                self.scene.removeItem(comp)
+                self.scene.comps.remove(comp)
+                self.scene.unregister_comp(comp)
+
+            # 3. DISAPPEAR AND DISCONNECT WIRES
+            for wire in self.wires:
+                self.scene.removeItem(wire)
+                if wire in self.scene.wires:
+                    self.scene.wires.remove(wire)
+
+                if wire.source and wire.source.logical:
+                    source_unit = wire.source.logical
+
+                    for supply in wire.supplies:
+                        if supply.logical:
+                            target_unit, target_idx = supply.logical
+
+                            logic.disconnect(target_unit, target_idx)
+                            supply.setWire(None)
+
+                            # THE FIX: Force the alive target to update its UI wires instantly
+                            comp = self.scene.comp_registry[target_unit.location]
+                            if comp: comp.poll_update()
 
-                wire.source.setWire(None)
+                    wire.source.setWire(None)
 
 
 class MoveCommand(QUndoCommand):
@@ -1,33 +1,66 @@
+import io
+
 from core.QtCore import *
 import editor.theme as theme
+from editor.tools.models import TruthTableModel, DiagnoseModel
 
 class CircuitDialog(QDialog):
-    """Base dialog for circuit information display"""
-    def __init__(self, parent, title: str, text: str, min_width, min_height):
+    """Base dialog showing a circuit model in a sortable, filterable table"""
+    def __init__(self, parent, title: str, model: QAbstractTableModel, min_width, min_height, proxy=None):
+        """proxy sorts and filters model, by default a QSortFilterProxyModel;
+        a model that does both itself is passed as its own proxy"""
         super().__init__(parent)
         self.setWindowTitle(title)
         self.setMinimumSize(min_width, min_height)
         
         layout = QVBoxLayout(self)
         
-        self.text_edit = QTextEdit()
-        self.text_edit.setReadOnly(True)
-        self.text_edit.setFont("Segoe UI")
-        self.text_edit.setTabStopDistance(40)
-        self.text_edit.setPlainText(text)
+        self.model = model
+        self.proxy = proxy
+        if proxy is None:
+            self.proxy = QSortFilterProxyModel(self)
+            self.proxy.setSourceModel(model)
+            self.proxy.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+            self.proxy.setFilterKeyColumn(-1)
+        
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filter rows...")
+        self.filter_edit.textChanged.connect(self.proxy.setFilterFixedString)
+        
+        self.column_box = QComboBox()
+        self.column_box.addItem("All columns", -1)
+        for column in range(model.columnCount()):
+            self.column_box.addItem(str(model.headerData(column, Qt.Orientation.Horizontal)), column)
+        self.column_box.currentIndexChanged.connect(lambda: self.proxy.setFilterKeyColumn(self.column_box.currentData()))
         
-        copy_btn = QPushButton("Copy to Clipboard")
-        copy_btn.clicked.connect(self.copy_to_clipboard)
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(self.filter_edit)
+        filter_layout.addWidget(self.column_box)
+        
+        # Rows are only pulled from the model as they scroll into view,
+        # so nothing is sorted until a header is clicked
+        self.table_view = QTableView()
+        self.table_view.setModel(self.proxy)
+        self.table_view.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.table_view.setSortingEnabled(True)
+        self.table_view.horizontalHeader().setStretchLastSection(True)
+        self.table_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.table_view.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.table_view.setFont("Segoe UI")
+        
+        self.copy_btn = QPushButton("Copy to Clipboard")
+        self.copy_btn.clicked.connect(self.copy_to_clipboard)
         
         close_btn = QPushButton("Close")
         close_btn.clicked.connect(self.accept)
         
         btn_layout = QHBoxLayout()
         btn_layout.addStretch()
-        btn_layout.addWidget(copy_btn)
+        btn_layout.addWidget(self.copy_btn)
         btn_layout.addWidget(close_btn)
         
-        layout.addWidget(self.text_edit)
+        layout.addLayout(filter_layout)
+        layout.addWidget(self.table_view)
         layout.addLayout(btn_layout)
         
         self.apply_theme()
@@ -39,13 +72,18 @@ class CircuitDialog(QDialog):
             QDialog {{
                 background-color: {colors.primary_bg.name()};
             }}
-            QTextEdit {{
+            QTableView, QLineEdit, QComboBox {{
                 background-color: {colors.secondary_bg.name()};
                 color: {colors.text.name()};
                 border: 1px solid {colors.outline.name()};
                 font-family: "Courier New", "Monaco", monospace;
                 font-size: 10pt;
             }}
+            QHeaderView::section {{
+                background-color: {colors.primary_bg.name()};
+                color: {colors.text.name()};
+                border: 1px solid {colors.outline.name()};
+            }}
             QPushButton {{
                 background-color: {colors.button.name()};
                 color: {colors.text.name()};
@@ -59,16 +97,35 @@ class CircuitDialog(QDialog):
         """)
     
     def copy_to_clipboard(self):
-        QGuiApplication.clipboard().setText(self.text_edit.toPlainText())
-        self.sender().setText("Copied!")
-        QTimer.singleShot(1500, lambda: self.sender().setText("Copy to Clipboard"))
+        """Copies the filtered rows, in their sorted order, as tab separated text"""
+        proxy = self.proxy
+        columns = range(proxy.columnCount())
+        lines = ["\t".join(str(proxy.headerData(c, Qt.Orientation.Horizontal)) for c in columns)]
+        for row in range(proxy.rowCount()):
+            lines.append("\t".join(str(proxy.data(proxy.index(row, c))) for c in columns))
+        QGuiApplication.clipboard().setText("\n".join(lines))
+        self.copied()
+
+    def copied(self):
+        self.copy_btn.setText("Copied!")
+        QTimer.singleShot(1500, lambda: self.copy_btn.setText("Copy to Clipboard"))
 
 
 class TruthTableDialog(CircuitDialog):
-    def __init__(self, parent, truth_table_text: str):
-        super().__init__(parent, "Truth Table", truth_table_text, 700, 500)
+    def __init__(self, parent, logic):
+        model = TruthTableModel(logic)
+        super().__init__(parent, "Truth Table", model, 700, 500, proxy=model)
+        if model.window < model.total:
+            self.layout().insertWidget(1, QLabel(f"Showing the first {model.window:,} of {model.total:,} rows"))
+
+    def copy_to_clipboard(self):
+        """Copies the rows in view as CSV, written by the model from the raw table bytes"""
+        buffer = io.StringIO()
+        self.model.write(buffer)
+        QGuiApplication.clipboard().setText(buffer.getvalue())
+        self.copied()
 
 
 class DiagnoseDialog(CircuitDialog):
-    def __init__(self, parent, diagnose_text: str):
-        super().__init__(parent, "Circuit Diagnosis", diagnose_text, 750, 650)
\ No newline at end of file
+    def __init__(self, parent, logic):
+        super().__init__(parent, "Circuit Diagnosis", DiagnoseModel(logic), 750, 650)
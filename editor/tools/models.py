@@ -0,0 +1,161 @@
+from collections import OrderedDict
+
+from core.QtCore import *
+from core.LogicCore import Const
+
+
+class TruthTableModel(QAbstractTableModel):
+    """Truth table of the circuit, rows are evaluated a chunk at a time as the view scrolls to them.
+    At most VIEW_ROWS rows are shown; sorting and filtering run over their raw bytes, not through data()"""
+    IN_CELLS = ("0", "1")
+    OUT_CELLS = ("F", "T", "X")
+    CSV_CELLS = bytes.maketrans(b"\0\1\2", b"01X")  # as writeTruthTable() writes them
+    CACHED_CHUNKS = 16
+    VIEW_ROWS = CACHED_CHUNKS << Const.TABLE_CHUNK  # every shown chunk stays cached
+
+    def __init__(self, logic, parent=None):
+        super().__init__(parent)
+        self.logic = logic
+        variables = logic.get_variables()
+        outputs = [pin for pin in logic.objlist[Const.OUTPUT_PIN_ID] if pin is not None]
+        self.inputs = len(variables)
+        self.columns = [repr(v) for v in variables] + [repr(pin) for pin in outputs]
+        self.total = 1 << self.inputs if 0 < self.inputs <= Const.TABLE_INPUTS else 0
+        self.window = min(self.total, self.VIEW_ROWS)
+        self.rows = self.window
+        self.order = None    # table row of every view row once sorted or filtered
+        self.filter_text = ""
+        self.filter_column = -1
+        self.sort_column = -1
+        self.descending = False
+        self.chunk_bits = min(self.inputs, Const.TABLE_CHUNK)
+        self.chunks = OrderedDict()    # chunk -> raw rows, least recently used first
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def chunk(self, chunk: int) -> bytes:
+        raw = self.chunks.get(chunk)
+        if raw is None:
+            raw = self.chunks[chunk] = self.logic.truthRows(chunk)
+            if len(self.chunks) > self.CACHED_CHUNKS:
+                self.chunks.popitem(last=False)
+        else:
+            self.chunks.move_to_end(chunk)
+        return raw
+
+    def cell(self, row: int, column: int) -> int:
+        if self.order is not None:
+            row = self.order[row]
+        raw = self.chunk(row >> self.chunk_bits)
+        return raw[(row & ((1 << self.chunk_bits) - 1))*len(self.columns) + column]
+
+    def window_rows(self) -> bytes:
+        """Raw bytes of every shown row in table order."""
+        size = 1 << self.chunk_bits
+        return b"".join(self.chunk(chunk) for chunk in range((self.window + size - 1) // size))[:self.window*len(self.columns)]
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            value = self.cell(index.row(), index.column())
+            return self.IN_CELLS[value] if index.column() < self.inputs else self.OUT_CELLS[value]
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.columns[section]
+        return str(section if self.order is None else self.order[section])
+
+    # The dialog drives these like a QSortFilterProxyModel's
+    def setFilterFixedString(self, text: str):
+        self.filter_text = text
+        self.refine()
+
+    def setFilterKeyColumn(self, column: int):
+        self.filter_column = column
+        self.refine()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.sort_column = column
+        self.descending = order == Qt.SortOrder.DescendingOrder
+        self.refine()
+
+    def refine(self):
+        """Rebuild the view rows from the filter and the sort column.
+        Each column is a byte slice of the window, matched with translate() and sorted on its bytes,
+        so no cell is formatted; cells compare like their text, 0 < 1 and F < T < X"""
+        self.beginResetModel()
+        self.order = None
+        if self.window and (self.filter_text or self.sort_column >= 0):
+            raw, width = self.window_rows(), len(self.columns)
+            rows = range(self.window)
+            if self.filter_text:
+                text = self.filter_text.upper()
+                columns = range(width) if self.filter_column < 0 else (self.filter_column,)
+                hits = 0
+                for column in columns:
+                    cells = self.IN_CELLS if column < self.inputs else self.OUT_CELLS
+                    matches = bytes(text in cell for cell in cells).ljust(256, b"\0")
+                    hits |= int.from_bytes(raw[column::width].translate(matches), "big")
+                hits = hits.to_bytes(self.window, "big")
+                rows = [row for row in rows if hits[row]]
+            if self.sort_column >= 0:
+                rows = sorted(rows, key=raw[self.sort_column::width].__getitem__, reverse=self.descending)
+            self.order = rows
+        self.rows = self.window if self.order is None else len(self.order)
+        self.endResetModel()
+
+    def write(self, stream):
+        """Write the shown rows as CSV. In table order they come straight from logic.writeTruthTable(),
+        a sorted or filtered view is formatted from the window's raw bytes"""
+        if self.order is None:
+            self.logic.writeTruthTable(stream, 'csv', limit=self.rows)
+            return
+        raw, width = self.window_rows(), len(self.columns)
+        stream.write(",".join(self.columns) + "\n")
+        stream.writelines(",".join(raw[row*width:(row + 1)*width].translate(self.CSV_CELLS).decode()) + "\n"
+                          for row in self.order)
+
+
+class DiagnoseModel(QAbstractTableModel):
+    """One row per gate and IC pin, each diagnosed the first time the view shows it"""
+    COLUMNS = ("Component", "Sources", "Book[L,H,U]", "Targets", "Out")
+
+    def __init__(self, logic, parent=None):
+        super().__init__(parent)
+        self.logic = logic
+        self.gates = [comp for comp in logic.get_components() if comp.id != Const.IC_ID]
+        for ic in logic.get_ics():
+            self.gates.extend(ic.inputs)
+            self.gates.extend(ic.outputs)
+        self.cache = {}    # row -> diagnose_row() cells
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.gates)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        row = self.cache.get(index.row())
+        if row is None:
+            row = self.cache[index.row()] = self.logic.diagnose_row(self.gates[index.row()])
+        return str(row[index.column()])
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section]
+        return str(section)
@@ -0,0 +1,133 @@
+from Const import *
+
+LEVEL_BITS = 12  # same variable limit as the compiled backend
+
+
+class BDD:
+    """Reduced ordered binary decision diagrams over variables 0..variables-1, tested in that order.
+    Nodes are ints; the terminals LOW, HIGH and UNKNOWN are nodes 0, 1 and 2, so a diagram can say
+    that a gate reads UNKNOWN for some inputs. Every diagram built by one BDD is canonical:
+    two functions are equal exactly when their nodes are."""
+    __slots__ = ['variables', 'level', 'low', 'high', 'unique', 'computed', 'negated']
+
+    def __init__(self, variables: int):
+        if variables < 0 or variables >= 1 << LEVEL_BITS:
+            raise ValueError(f"a BDD holds up to {(1 << LEVEL_BITS) - 1} variables")
+        self.variables = variables
+        self.level: list[int] = [variables] * 3
+        self.low: list[int] = [-1] * 3
+        self.high: list[int] = [-1] * 3
+        self.unique: dict[tuple, int] = {}  # (var, low, high) -> node
+        self.computed: dict[tuple, int] = {}  # (op, f, g) -> node
+        self.negated: dict[int, int] = {}
+
+    def __len__(self):
+        return len(self.level)
+
+    def node(self, var: int, low: int, high: int) -> int:
+        """The node testing var, shared with every equal one and skipped when both branches agree."""
+        if low == high:
+            return low
+        key = (var, low, high)
+        index = self.unique.get(key)
+        if index is None:
+            index = self.unique[key] = len(self.level)
+            self.level.append(var)
+            self.low.append(low)
+            self.high.append(high)
+        return index
+
+    def var(self, index: int) -> int:
+        """The function that is variable index."""
+        if index < 0 or index >= self.variables:
+            raise IndexError(f"no variable {index}")
+        return self.node(index, LOW, HIGH)
+
+    def negate(self, f: int) -> int:
+        """f with LOW and HIGH swapped, UNKNOWN stays."""
+        if f <= UNKNOWN:
+            return f if f == UNKNOWN else f ^ 1
+        result = self.negated.get(f)
+        if result is None:
+            result = self.negated[f] = self.node(self.level[f], self.negate(self.low[f]), self.negate(self.high[f]))
+        return result
+
+    def apply(self, op: int, f: int, g: int) -> int:
+        """f op g for op AND_ID, OR_ID or XOR_ID. UNKNOWN is the identity of every op,
+        as an unknown input is ignored by process() while another input is known."""
+        if f == UNKNOWN:
+            return g
+        if g == UNKNOWN:
+            return f
+        if f <= HIGH and g <= HIGH:
+            if op == AND_ID: return f & g
+            if op == OR_ID: return f | g
+            return f ^ g
+        if op == AND_ID and (f == LOW or g == LOW):
+            return LOW
+        if op == OR_ID and (f == HIGH or g == HIGH):
+            return HIGH
+        if f > g:  # every op commutes, one cache entry serves both orders
+            f, g = g, f
+        key = (op, f, g)
+        result = self.computed.get(key)
+        if result is not None:
+            return result
+        top = min(self.level[f], self.level[g])
+        f0, f1 = (self.low[f], self.high[f]) if self.level[f] == top else (f, f)
+        g0, g1 = (self.low[g], self.high[g]) if self.level[g] == top else (g, g)
+        result = self.computed[key] = self.node(top, self.apply(op, f0, g0), self.apply(op, f1, g1))
+        return result
+
+    def value(self, f: int, row: int) -> int:
+        """Value of f at row, variable 0 being the most significant bit as in a truth table."""
+        while f > UNKNOWN:
+            f = self.high[f] if (row >> (self.variables - 1 - self.level[f])) & 1 else self.low[f]
+        return f
+
+    def count(self, f: int, value: int = HIGH) -> int:
+        """Number of rows at which f reads value."""
+        return self.paths(f, value, {}) << self.level[f]
+
+    def paths(self, f: int, value: int, memo: dict) -> int:
+        """Rows over the variables from f's level on at which f reads value."""
+        if f <= UNKNOWN:
+            return 1 if f == value else 0
+        found = memo.get(f)
+        if found is None:
+            low, high, level = self.low[f], self.high[f], self.level[f]
+            found = memo[f] = (self.paths(low, value, memo) << (self.level[low] - level - 1)) + \
+                              (self.paths(high, value, memo) << (self.level[high] - level - 1))
+        return found
+
+    def support(self, f: int) -> list[int]:
+        """The variables f depends on, in order."""
+        stack, seen, found = [f], set(), set()
+        while stack:
+            f = stack.pop()
+            if f <= UNKNOWN or f in seen:
+                continue
+            seen.add(f)
+            found.add(self.level[f])
+            stack.append(self.low[f])
+            stack.append(self.high[f])
+        return sorted(found)
+
+    def depends(self, f: int, index: int) -> bool:
+        """Whether some change of variable index alone changes f."""
+        return index in self.support(f)
+
+    def rows(self, functions: list, start: int, count: int) -> bytes:
+        """Rows start..start+count of the truth table of functions, one byte per cell in input order
+        like Circuit.truthRows(); only the rows asked for are ever evaluated."""
+        n = self.variables
+        if start < 0 or count < 0 or n > 62 or start + count > 1 << n:
+            raise IndexError(f"rows {start}..{start + count} are outside the table")
+        for f in functions:
+            if f < 0 or f >= len(self.level):
+                raise ValueError(f"{f} is not a node of this BDD")
+        out = bytearray()
+        for row in range(start, start + count):
+            out.extend((row >> (n - 1 - j)) & 1 for j in range(n))
+            out.extend(self.value(f, row) for f in functions)
+        return bytes(out)
@@ -5,8 +5,10 @@ from Gates import Gate, Variable, Profile, hide_profile, reveal_profile
 from Const import *
 import Const
 from IC import IC
+from BDD import BDD
 from Store import get, reset_loc
-from collections import deque
+from collections import deque, OrderedDict
+from array import array
 import asyncio
 import time
 import heapq
@@ -14,6 +16,225 @@ import io
 import contextlib
 
 Global_delay=[2,0,3,1,4,5,0,0,0,0,0]
+TABLE_FORMATS = ('text', 'csv', 'binary')  # what writeTruthTable() can emit
+
+MASK64 = (1 << 64) - 1
+OPEN_PIN = 0  # label structural_hash() gives an empty input or one fed from outside the selection
+
+def splitmix(z: int) -> int:
+    """splitmix64 finalizer, every input bit reaches every output bit."""
+    z = (z + 0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+def mix(h: int, v: int) -> int:
+    """Order-sensitive combination of h and v."""
+    return splitmix(h ^ splitmix(v))
+
+def gray_block(chunk: int) -> int:
+    """Inverse Gray code of chunk, the block whose codes fill the rows chunk<<width onwards."""
+    block = chunk
+    chunk >>= 1
+    while chunk:
+        block ^= chunk
+        chunk >>= 1
+    return block
+
+class TableCache:
+    """Least recently used truth-table chunks keyed by (structural hash, chunk), capped at limit bytes.
+    With a directory set the chunks are also kept there as files, under the same cap."""
+    __slots__ = ['directory', 'limit', 'size', 'disk', 'entries']
+
+    def __init__(self, limit: int = TABLE_CACHE, directory: str = None):
+        self.limit = limit
+        self.directory = directory  # None keeps the cache in memory only
+        self.size = 0  # bytes held in memory
+        self.disk = -1  # bytes held in directory, -1 until counted
+        self.entries: OrderedDict = OrderedDict()  # key -> rows, least recently used first
+
+    def path(self, key: tuple) -> str:
+        return os.path.join(self.directory, f"{key[0]:016x}-{key[1]}.tt")
+
+    def get(self, key: tuple):
+        """Rows stored under key, None when neither memory nor the directory has them."""
+        raw = self.entries.get(key)
+        if raw is not None:
+            self.entries.move_to_end(key)
+            return raw
+        if self.directory is None:
+            return None
+        try:
+            with open(self.path(key), 'rb') as file:
+                raw = file.read()
+            os.utime(self.path(key))  # the directory is trimmed oldest first
+        except OSError:
+            return None
+        self.remember(key, raw)
+        return raw
+
+    def put(self, key: tuple, raw: bytes):
+        """Store raw under key, evicting the least recently used rows past the cap."""
+        self.remember(key, raw)
+        if self.directory is None:
+            return
+        path = self.path(key)
+        try:
+            with open(path + '.tmp', 'wb') as file:
+                file.write(raw)
+            os.replace(path + '.tmp', path)
+        except OSError:
+            return
+        if self.disk == -1:
+            self.disk = sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.name.endswith('.tt'))
+        else:
+            self.disk += len(raw)
+        if self.disk > self.limit:
+            self.trim()
+
+    def remember(self, key: tuple, raw: bytes):
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        self.entries[key] = raw
+        self.size += len(raw)
+        while self.size > self.limit and self.entries:
+            self.size -= len(self.entries.popitem(last=False)[1])
+
+    def trim(self):
+        """Delete the least recently used files until the directory is back under the cap."""
+        files = sorted((entry for entry in os.scandir(self.directory) if entry.name.endswith('.tt')),
+                       key=lambda entry: entry.stat().st_mtime)
+        for entry in files:
+            if self.disk <= self.limit:
+                break
+            try:
+                self.disk -= entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """Forget every entry, in memory and in the directory."""
+        self.entries.clear()
+        self.size = 0
+        if self.directory is not None:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.tt'):
+                    os.remove(entry.path)
+            self.disk = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+table_cache = TableCache()  # shared by every circuit, the keys already tell circuits apart
+
+class Netlist:
+    """Read-only compiled copy of a circuit's live gates in topological order, see Circuit.compile().
+    evaluate() works in a caller-owned scratch buffer and writes nothing else,
+    so any number of threads may evaluate one netlist at once."""
+    __slots__ = ['size', 'cyclic', 'types', 'limits', 'sources', 'inputs', 'outputs', 'index']
+
+    def __init__(self):
+        self.size = 0
+        self.cyclic = False  # feedback loops are swept again until they settle
+        self.types: list[int] = []
+        self.limits: list[int] = []
+        self.sources: list[list[int]] = []  # netlist index of every connected input, in slot order
+        self.inputs: list[int] = []  # netlist index of each variable, in get_variables() order
+        self.outputs: list[int] = []  # netlist index of each output pin
+        self.index: dict[int, int] = {}  # circuit location -> netlist index of every live gate
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def variables(self) -> int:
+        return len(self.inputs)
+
+    def scratch(self) -> bytearray:
+        """A buffer evaluate() can work in, one byte per gate."""
+        return bytearray(self.size)
+
+    def run(self, values: bytes, state: bytearray):
+        """Settle state from the variable values with the rules of Gate.process().
+        One sweep settles an acyclic netlist, feedback is swept until nothing changes (at most size times)."""
+        state[:self.size] = bytes([UNKNOWN]) * self.size
+        for i, value in zip(self.inputs, values):
+            state[i] = value if value < UNKNOWN else UNKNOWN
+        for _ in range(self.size):
+            changed = False
+            for i in range(self.size):
+                gate_type = self.types[i]
+                if gate_type == VARIABLE_ID:
+                    continue
+                sources = self.sources[i]
+                if gate_type > VARIABLE_ID:
+                    if not sources or state[sources[0]] == UNKNOWN:
+                        output = UNKNOWN
+                    else:
+                        output = state[sources[0]] ^ (gate_type == NOT_ID)
+                else:
+                    high = low = unknown = 0
+                    for source in sources:
+                        value = state[source]
+                        if value == HIGH: high += 1
+                        elif value == LOW: low += 1
+                        else: unknown += 1
+                    limit = self.limits[i]
+                    if high + low == limit or (high + low and high + low + unknown == limit):
+                        if gate_type <= NAND_ID: output = int(low == 0) ^ (gate_type & 1)
+                        elif gate_type <= NOR_ID: output = int(high > 0) ^ (gate_type & 1)
+                        else: output = (high & 1) ^ (gate_type & 1)
+                    else:
+                        output = UNKNOWN
+                if output != state[i]:
+                    state[i] = output
+                    changed = True
+            if not changed or not self.cyclic:
+                break
+
+    def evaluate(self, input_values, output_locations=None, scratch: bytearray = None) -> bytes:
+        """Outputs of the gates at output_locations (circuit locations, the output pins by default)
+        for input_values, one 0/1 per variable in get_variables() order.
+        The work is done in scratch, a fresh buffer when None."""
+        values = bytes(input_values)
+        if len(values) != len(self.inputs):
+            raise ValueError(f"netlist has {len(self.inputs)} variables, got {len(values)} values")
+        if scratch is None:
+            scratch = bytearray(self.size)
+        elif len(scratch) < self.size:
+            raise ValueError("scratch is smaller than the netlist")
+        if output_locations is None:
+            picks = self.outputs
+        else:
+            picks = []
+            for loc in output_locations:
+                if loc not in self.index:
+                    raise IndexError(f"no live gate at location {loc}")
+                picks.append(self.index[loc])
+        self.run(values, scratch)
+        return bytes(scratch[i] for i in picks)
+
+class Snapshot:
+    """Dynamic state of a circuit taken by Circuit.snapshot(): outputs, values, books,
+    profile outputs, scheduled flags, the clock and the time queue.
+    It fits only the circuit it was taken of, at the revision it was taken at."""
+    __slots__ = ['circuit', 'revision', 'mode', 'gates', 'states', 'profiles', 'outputs', 'clock', 'time_queue']
+
+    def __init__(self):
+        self.circuit = None  # the circuit it was taken of, a clone at the same revision is another one
+        self.revision = 0
+        self.mode = DESIGN
+        self.gates: list[Gate] = []
+        self.states: list[tuple] = []  # (output, value, scheduled, book) of each gate
+        self.profiles: list[Profile] = []
+        self.outputs = bytearray()  # output of every profile, hitlist after hitlist
+        self.clock = 0
+        self.time_queue: list[Task] = []
+
+    def __len__(self):
+        return len(self.gates)
+
 # ─── Circuit ──────────────────────────────────────────────────────
 class Task:
     __slots__=['gate','time','location']
@@ -32,8 +253,10 @@ class Circuit:
         'objlist', 'copydata',
         'counter', 'queue',
         'eval_count','time_queue','runner',
-        'visual_queue','Global_Clock','oscillation_queue',
-        '_location_map', '_loc_map_counter'
+        'visual_queue','Global_Clock','oscillation_queue','observers',
+        '_location_map', '_loc_map_counter', 'tombstones', 'stash',
+        'batching', 'pending', 'revision', 'hashed',
+        'focused', 'watched', 'dormant'
     ]
 
     def __init__(self):
@@ -41,20 +264,36 @@ class Circuit:
         self.objlist: list[list] = [[] for _ in range(TOTAL)]
         self.copydata: list = []
         self.counter: int = 0
-        self.queue: list = [[None] * LIMIT, [None] * LIMIT]  # double buffer: fixed [2][LIMIT]
+        self.queue: list = [[None] * 64, [None] * 64]  # double buffer, grown with the gate count
         self.eval_count = 0
         self.time_queue: list[Task] = []
         self.oscillation_queue:deque[Gate]=deque()
         heapq.heapify(self.time_queue)
         self.runner=None
         self.visual_queue: deque[Gate] = deque()  # stores gate locations (ints) for dirty UI updates
+        self.observers = 0  # number of gates feeding the visual queue
+        self.tombstones: list[Gate] = []  # gates deleted since the last collect()
+        self.stash: dict[Gate, list[tuple[Gate, Profile]]] = {}  # profiles collect(keep) removed
+        self.batching: int = 0  # depth of open batch() blocks
+        self.pending: list[Gate] = []  # origins recorded by the open batch, marked so each is listed once
+        self.revision: int = 1  # bumped by every structural edit, whatever is cached against the structure keys on it
+        self.hashed: tuple = (0, 0)  # (revision, value) of the last whole-circuit structural_hash()
+        self.focused: bool = False  # only the fan-in cone of the gates focus() watches is evaluated
+        self.watched: list[Gate] = []  # gates focus() takes the cone of
+        self.dormant: list[Gate] = []  # gates turned idle by the last focus
         self.Global_Clock=0
 
     def __repr__(self):
         return 'Circuit'
 
+    @property
+    def table_cache(self) -> TableCache:
+        """The truth-table cache every circuit shares."""
+        return table_cache
+
     def getcomponent(self, choice: int):
         """Create and register a new component."""
+        self.revision += 1
         gt = get(choice)
         if gt:
             self.counter += 1
@@ -69,33 +308,382 @@ class Circuit:
             if gt.id == VARIABLE_ID:
                 gt.output = LOW if get_MODE() != DESIGN else UNKNOWN
         return gt
+
+    def build_from_arrays(self, types, input_limits=None, edge_src=None, edge_dst=None, edge_pin=None):
+        """Create a whole netlist in one pass: gate i has type types[i] and input_limits[i] inputs,
+        edge k wires gate edge_src[k] into pin edge_pin[k] of gate edge_dst[k] (indices within the batch).
+        Nothing is evaluated while wiring; one simulation from the new variables runs at the end.
+        Returns the new gates in input order."""
+        self.revision += 1
+        types = [int(t) for t in types]
+        n = len(types)
+        limits = [1 if t >= VARIABLE_ID else 2 for t in types]
+        if input_limits is not None:
+            input_limits = [int(lim) for lim in input_limits]
+            if len(input_limits) != n:
+                raise ValueError('input_limits must have one entry per gate')
+        edges = []
+        if edge_src is not None or edge_dst is not None or edge_pin is not None:
+            if edge_src is None or edge_dst is None or edge_pin is None:
+                raise ValueError('edge_src, edge_dst and edge_pin go together')
+            if not len(edge_src) == len(edge_dst) == len(edge_pin):
+                raise ValueError('edge arrays must have the same length')
+            edges = [(int(s), int(d), int(p)) for s, d, p in zip(edge_src, edge_dst, edge_pin)]
+        # check everything before the circuit is touched
+        for i, t in enumerate(types):
+            if t < 0 or t >= IC_ID:
+                raise ValueError(f'types[{i}]: {t} is not a gate type')
+            if input_limits is not None and t < VARIABLE_ID:
+                if not 2 <= input_limits[i] <= 255:
+                    raise ValueError(f'input_limits[{i}]: {input_limits[i]} is out of range')
+                limits[i] = input_limits[i]
+        taken = set()
+        for k, (s, d, p) in enumerate(edges):
+            if not (0 <= s < n and 0 <= d < n):
+                raise ValueError(f'edge {k} refers to a gate outside the batch')
+            if types[d] == VARIABLE_ID:
+                raise ValueError(f'edge {k} drives a variable')
+            if not 0 <= p < limits[d]:
+                raise ValueError(f'edge {k}: pin {p} is out of range')
+            if (d, p) in taken:
+                raise ValueError(f'edge {k}: pin {p} of gate {d} is already wired')
+            taken.add((d, p))
+
+        gates = [self.getcomponent(t) for t in types]
+        for gate, lim in zip(gates, limits):
+            if lim > 2:
+                gate.sources.extend([None] * (lim - gate.inputlimit))
+                gate.inputlimit = lim
+        for s, d, p in edges:
+            source, target = gates[s], gates[d]
+            source.hitlist.append(Profile(target, p, UNKNOWN))
+            target.sources[p] = source
+            target.book[UNKNOWN] += 1
+        variables = [gate for gate in gates if gate.id == VARIABLE_ID]
+        for gate in variables:
+            gate.output = UNKNOWN
+        if get_MODE() != DESIGN:
+            self.custom_simulate(variables)
+        return gates
     
-    def optimize(self):
+    def reserve(self, gates: int):
+        """Size hint for the Reactor's flat gate list; Python lists grow on their own."""
         pass
+
+    def use_hugepages(self, flag: bool = True):
+        """Huge page backing only applies to the Reactor's flat arrays; always off here."""
+        return False
+
+    def optimize(self):
+        """Gates never move in the engine: an empty old->new location map means nothing moved."""
+        return array('i')
+
+    def fragmentation(self) -> float:
+        """The engine keeps no flat gate layout, so it never fragments."""
+        return 0.0
+
+    def defragment(self, force: bool = False, limit: int = DEFRAG_SLICE):
+        """Gates never move in the engine: no old, new location pairs."""
+        return array('i')
+
+    def focus(self, gates: list = None, compact: bool = False) -> int:
+        """Evaluate only the fan-in cone of gates (by default every probe and output pin, an IC stands for its outputs),
+        the gates outside it keep their last state and are no longer visited.
+        compact also optimizes, which lays the cone out contiguously where gates have a layout.
+        Returns the size of the cone; edits made while focused need a new focus()."""
+        if self.focused:
+            self.unfocus()  # the new cone may reach gates the old one left stale
+        if gates is None:
+            gates = [item for item in self.objlist[PROBE_ID] + self.objlist[OUTPUT_PIN_ID] if item is not None]
+        self.watched = []
+        for item in gates:
+            if item.id == IC_ID:
+                self.watched.extend(item.outputs)
+            else:
+                self.watched.append(item)
+        cone = self.mark_cone(self.watched)
+        if compact:
+            self.optimize()
+        return cone
+
+    def unfocus(self):
+        """Evaluate every gate again. Sources that changed while their targets were idle
+        settle them in one wave, clock variables catch up on their next tick."""
+        if not self.focused:
+            return
+        origins = []
+        for gate in self.expand(self.get_components()):
+            if gate.id < 0 or gate.inputlimit == 0:
+                continue
+            for profile in gate.hitlist:
+                if profile.target.idle and profile.output != gate.output:
+                    origins.append(gate)
+                    break
+        self.clear_cone()
+        self.batch_propagate(origins)
+
+    def mark_cone(self, watched: list) -> int:
+        """Turn every gate idle but the fan-in cone of watched, returns the cone size."""
+        self.dormant = self.expand(self.get_components())
+        for gate in self.dormant:
+            gate.idle = True
+        stack = []
+        for gate in watched:
+            if gate.idle:
+                gate.idle = False
+                stack.append(gate)
+        cone = 0
+        while stack:
+            gate = stack.pop()
+            cone += 1
+            if isinstance(gate.sources, list):
+                for source in gate.sources:
+                    if source is not None and source.idle:
+                        source.idle = False
+                        stack.append(source)
+        self.focused = True
+        return cone
+
+    def clear_cone(self):
+        """Every gate is evaluated again, without settling anything."""
+        for gate in self.dormant:
+            gate.idle = False
+        self.dormant = []
+        self.focused = False
+
+    def compile(self) -> Netlist:
+        """Read-only Netlist of the live gates for evaluate(), topologically ordered.
+        It copies what it needs, so later edits and simulation never reach it."""
+        net = Netlist()
+        gates = self.expand(self.get_components())
+        member = set(gates)
+        in_degree = dict.fromkeys(gates, 0)
+        for gate in gates:
+            for profile in gate.hitlist:
+                if profile.target in member:
+                    in_degree[profile.target] += 1
+        order = []
+        queue = deque(gate for gate in gates if in_degree[gate] == 0)
+        while queue:
+            gate = queue.popleft()
+            order.append(gate)
+            for profile in gate.hitlist:
+                target = profile.target
+                if target in member:
+                    in_degree[target] -= 1
+                    if in_degree[target] == 0:
+                        queue.append(target)
+        if len(order) < len(gates):
+            # whatever feedback kept from the order follows in location order
+            net.cyclic = True
+            placed = set(order)
+            order.extend(sorted((gate for gate in gates if gate not in placed), key=lambda gate: gate.location))
+        index = {gate: i for i, gate in enumerate(order)}
+        net.size = len(order)
+        for gate in order:
+            net.types.append(gate.id)
+            net.limits.append(gate.inputlimit)
+            sources = gate.sources if isinstance(gate.sources, list) else ()
+            net.sources.append([index[source] for source in sources if source is not None and source in member])
+        net.index = {gate.location: i for gate, i in index.items()}
+        net.inputs = [index[gate] for gate in self.get_variables()]
+        net.outputs = [index[gate] for gate in self.objlist[OUTPUT_PIN_ID] if gate is not None]
+        return net
+
+    def symbolic(self, bdd: BDD, outputs: list = None) -> list[int]:
+        """BDD nodes of the output pins (or of the gates in outputs) as functions of the variables,
+        variable i of bdd being the i-th of get_variables(). One pass over the compiled netlist
+        with the rules of Gate.process(), so tables wider than TABLE_INPUTS can be read,
+        counted and compared through bdd."""
+        net = self.compile()
+        if net.cyclic:
+            raise ValueError("feedback loops have no BDD")
+        if len(net.inputs) > bdd.variables:
+            raise ValueError(f"the circuit has {len(net.inputs)} variables, the BDD {bdd.variables}")
+        functions = [UNKNOWN] * net.size
+        for k, i in enumerate(net.inputs):
+            functions[i] = bdd.var(k)
+        for i in range(net.size):
+            gate_type = net.types[i]
+            if gate_type == VARIABLE_ID:
+                continue
+            sources = net.sources[i]
+            if gate_type > VARIABLE_ID:
+                acc = functions[sources[0]] if sources else UNKNOWN
+                if gate_type == NOT_ID:
+                    acc = bdd.negate(acc)
+            elif len(sources) < net.limits[i]:
+                acc = UNKNOWN  # an open input keeps the gate unknown
+            else:
+                acc = UNKNOWN
+                for source in sources:
+                    acc = bdd.apply(gate_type & ~1, acc, functions[source])
+                if gate_type & 1:
+                    acc = bdd.negate(acc)
+            functions[i] = acc
+        if outputs is None:
+            return [functions[i] for i in net.outputs]
+        picks = []
+        for gate in outputs:
+            if gate.location not in net.index:
+                raise IndexError(f"{gate} is not a live gate of this circuit")
+            picks.append(net.index[gate.location])
+        return [functions[i] for i in picks]
+
+    def snapshot(self) -> Snapshot:
+        """Copy the simulation state into a Snapshot that restore() puts back in one pass,
+        any number of snapshots of the same structure can be kept."""
+        snap = Snapshot()
+        snap.circuit = self
+        snap.revision = self.revision
+        snap.mode = get_MODE()
+        snap.clock = self.Global_Clock
+        snap.time_queue = list(self.time_queue)  # still a heap
+        snap.gates = self.expand(self.get_components())
+        snap.states = [(gate.output, gate.value, gate.scheduled, tuple(gate.book)) for gate in snap.gates]
+        snap.profiles = [profile for gate in snap.gates for profile in gate.hitlist]
+        snap.outputs = bytearray(profile.output for profile in snap.profiles)
+        return snap
+
+    def restore(self, snap: Snapshot):
+        """Put back the state snapshot() took, without propagating anything.
+        Observed gates whose output differs are queued for the view."""
+        if snap.circuit is not self:
+            raise ValueError("the snapshot was taken of another circuit")
+        if snap.revision != self.revision:
+            raise ValueError("the snapshot was taken of a different structure")
+        set_MODE(snap.mode)
+        self.Global_Clock = snap.clock
+        self.time_queue = list(snap.time_queue)
+        for gate, (output, value, scheduled, book) in zip(snap.gates, snap.states):
+            if gate.observed and not gate.update and gate.output != output:
+                gate.update = True
+                self.visual_queue.append(gate)
+            gate.output = output
+            gate.value = value
+            gate.scheduled = scheduled
+            gate.book[:] = book
+        for profile, output in zip(snap.profiles, snap.outputs):
+            profile.output = output
+        if self.time_queue and (self.runner is None or self.runner.done()):
+            self.runner = asyncio.create_task(self.task_manager())
+
+    def clone(self) -> "Circuit":
+        """Independent copy of the circuit: every gate, profile and IC is copied directly,
+        without going through full_data() and generate().
+        Either side can then be edited or simulated without touching the other."""
+        mode = get_MODE()
+        twin = Circuit()
+        set_MODE(mode)  # a new circuit starts the shared mode over in DESIGN
+        # every gate reachable from the circuit, tombstones included, walked without recursion
+        copies: dict[Gate, Gate] = {}
+        stack = self.expand(self.get_components()) + self.tombstones + list(self.stash) + self.pending
+        while stack:
+            gate = stack.pop()
+            if gate in copies:
+                continue
+            twin_gate = copies[gate] = object.__new__(type(gate))
+            for slot in Gate.__slots__:
+                setattr(twin_gate, slot, getattr(gate, slot))
+            stack.extend(profile.target for profile in gate.hitlist)
+            if isinstance(gate.sources, list):
+                stack.extend(source for source in gate.sources if source is not None)
+        for gate, twin_gate in copies.items():
+            twin_gate.book = list(gate.book)
+            twin_gate.hitlist = [Profile(copies[profile.target], profile.index, profile.output) for profile in gate.hitlist]
+            if isinstance(gate.sources, list):
+                twin_gate.sources = [None if source is None else copies[source] for source in gate.sources]
+
+        def adopt(ic: IC) -> IC:
+            twin_ic = object.__new__(IC)
+            for slot in IC.__slots__:
+                setattr(twin_ic, slot, getattr(ic, slot))
+            twin_ic.inputs = [copies[pin] for pin in ic.inputs]
+            twin_ic.outputs = [copies[pin] for pin in ic.outputs]
+            twin_ic.internal = [adopt(comp) if comp.id == IC_ID else copies[comp] for comp in ic.internal]
+            twin_ic.map = list(ic.map)
+            return twin_ic
+
+        twin.objlist = [[None if item is None else adopt(item) if kind == IC_ID else copies[item] for item in items]
+                        for kind, items in enumerate(self.objlist)]
+        twin.copydata = list(self.copydata)
+        twin.counter = self.counter
+        twin.eval_count = self.eval_count
+        twin.observers = self.observers
+        twin.Global_Clock = self.Global_Clock
+        twin.time_queue = [Task(copies[task.gate], task.time, task.location) for task in self.time_queue]  # still a heap
+        twin.visual_queue = deque(copies[gate] for gate in self.visual_queue)
+        twin.oscillation_queue = deque(copies[gate] for gate in self.oscillation_queue)
+        twin.tombstones = [copies[gate] for gate in self.tombstones]
+        twin.stash = {copies[gate]: [(copies[source], Profile(copies[profile.target], profile.index, profile.output))
+                                     for source, profile in entries] for gate, entries in self.stash.items()}
+        twin.revision = self.revision
+        twin.hashed = self.hashed
+        twin.focused = self.focused
+        twin.watched = [copies[gate] for gate in self.watched]
+        twin.dormant = [copies[gate] for gate in self.dormant]
+        twin.pending = [copies[gate] for gate in self.pending]  # the twin has no open batch, so it settles them now
+        twin.flush()
+        if twin.time_queue:
+            twin.runner = asyncio.create_task(twin.task_manager())
+        return twin
     
     def getobj(self, code: tuple):
         return self.objlist[code[0]][code[1]]
 
     def delobj(self, gate:Gate|IC):
+        self.revision += 1
         if gate.id == IC_ID:
             for i in (gate.inputs+gate.outputs+gate.internal):
                 self.counter-=1
                 i.id=-i.id-1
+                self.tombstones.append(i)
             self.counter -= gate.counter
         else:
             self.counter -= 1
             gate.id=-gate.id-1
+            self.tombstones.append(gate)
         self.objlist[gate.code[0]][gate.code[1]]=None
 
+    def collect(self, keep: bool = False) -> int:
+        """Drop the profiles live sources still hold for gates deleted since the last call.
+        With keep the profiles are stashed so renewobj can put them back."""
+        removed = 0
+        for gate in self.tombstones:
+            if gate.id >= 0 or gate.id == -VARIABLE_ID-1:
+                continue
+            for i, source in enumerate(gate.sources):
+                if source is None or source.id < 0:
+                    continue
+                hitlist = source.hitlist
+                for j, profile in enumerate(hitlist):
+                    if profile.target is gate and profile.index == i:
+                        if keep:
+                            self.stash.setdefault(gate, []).append((source, profile))
+                        hitlist[j] = hitlist[-1]
+                        hitlist.pop()
+                        removed += 1
+                        break
+        self.tombstones.clear()
+        return removed
+
+    def _restore(self, gate: Gate):
+        for source, profile in self.stash.pop(gate, ()):
+            if gate.sources[profile.index] is source:
+                source.hitlist.append(profile)
+
     def renewobj(self,gate:Gate):
+        self.revision += 1
         if gate.id == IC_ID:
             for i in (gate.inputs+gate.outputs+gate.internal):
                 self.counter+=1
                 i.id=-i.id-1
+                self._restore(i)
             self.counter += gate.counter
         else:
             self.counter += 1
             gate.id=-gate.id-1
+            self._restore(gate)
         self.objlist[gate.code[0]][gate.code[1]]=gate
 
     def get_components(self) -> list:
@@ -116,19 +704,21 @@ class Circuit:
             print(f'{i}. {gate}')
 
     def setlimits(self, gate: Gate, size: int) -> bool:
+        self.revision += 1
         prev = gate.output
         if gate.setlimits(size):
             if prev != gate.output:
-                self.propagate(gate)
+                self.settle(gate)
             return True
         return False
 
     def connect(self, target: Gate, source: Gate, index: int):
         """Connect source -> target at pin index."""
+        self.revision += 1
         prev = target.output
         target.connect(source, index)
         if prev != target.output:
-            self.propagate(target)
+            self.settle(target)
     
     def set_timings(self, fps: float, ratio: float):
         Const.VISUALIZE = fps * (1 - ratio)
@@ -157,145 +747,254 @@ class Circuit:
                 changed_gates.append(gate)
 
         if mode != COMPILE:
-            for gate in changed_gates:
-                self.propagate(gate)
+            self.batch_propagate(changed_gates)
 
     def disconnect(self, target: Gate, index: int):
         """Disconnect at pin index."""
+        self.revision += 1
         prev = target.output
         target.disconnect(index)
         if prev != target.output:
-            self.propagate(target)
+            self.settle(target)
 
     def hide(self, gatelist: list):
         """Soft delete — disconnect and remove from view."""
+        self.revision += 1
         for gate in gatelist:
+            gate.hide()
             self.delobj(gate)
 
-        for gate in gatelist:
-            if gate.id == IC_ID:
-                for pin in gate.outputs:
-                    self.propagate(pin)
-            else:
-                self.propagate(gate)
+        # recompute what the gates drove, every changed target seeds the same wave
+        with self.batch():
+            for gate in gatelist:
+                if gate.id == IC_ID:
+                    for pin in gate.outputs:
+                        self.release(pin)
+                else:
+                    self.release(gate)
+
+    def release(self, origin: Gate):
+        """Recompute the live targets the hidden origin drove and settle those that changed."""
+        for profile in origin.hitlist:
+            target = profile.target
+            if target.id >= 0:
+                prev = target.output
+                target.process()
+                if prev != target.output:
+                    self.settle(target)
 
 
     def reveal(self, gatelist: list):
         """Bring a hidden component back."""
+        self.revision += 1
         for gate in reversed(gatelist):
-            if gate.id == IC_ID:
-                gate.reveal()
-            else:
-                gate.reveal()
-                self.renewobj(gate)
-
-        for gate in reversed(gatelist):
-            if gate.id == IC_ID:
-                for pin in gate.outputs:
-                    if pin.output!=UNKNOWN:
-                        self.propagate(pin)
-            else:
-                if gate.output!=UNKNOWN:
-                    self.propagate(gate)
+            # renew first, a gate processes with its live type
+            self.renewobj(gate)
+            gate.reveal()
+
+        with self.batch():
+            for gate in reversed(gatelist):
+                if gate.id == IC_ID:
+                    for pin in gate.outputs:
+                        if pin.output!=UNKNOWN:
+                            self.settle(pin)
+                else:
+                    if gate.output!=UNKNOWN:
+                        self.settle(gate)
 
     def output(self, gate: Gate):
         print(f'{gate} output is {gate.getoutput()}')
   
     def table(self, variables: list, gate_list: list) -> list:
         """Generate a truth table for the circuit."""
-        n = len(variables)
-        rows_count = 1 << n
-        raw_rows = [None] * rows_count
-        gray = 0
-        prev_gray = 0
+        return self.table_block(variables, gate_list, 0, len(variables))
 
-        for i in range(rows_count):
+    def table_block(self, variables: list, gate_list: list, block: int, width: int) -> list:
+        """Rows of the 2**width Gray codes of block, in input order.
+        The first code is set directly and settled in one wave, then one variable flips per row."""
+        n = len(variables)
+        first = block << width
+        base = (block ^ (block >> 1)) << width
+        raw_rows = [None] * (1 << width)
+        gray = first ^ (first >> 1)
+
+        changed = []
+        for j, var in enumerate(variables):
+            bit = (gray >> (n - 1 - j)) & 1
+            if var.output != bit:
+                var.output = bit
+                changed.append(var)
+        self.batch_propagate(changed)
+
+        for i in range(first, first + (1 << width)):
             # Gray Code Sequence
-            prev_gray = gray
             gray = i ^ (i >> 1)
             
-            if i != 0:
-                mask = prev_gray ^ gray
-                changed_bit = mask.bit_length() - 1
+            if i != first:
+                # the lowest set bit of i is the one variable that changes
+                changed_bit = (i & -i).bit_length() - 1
                 j = (n - 1) - changed_bit
                 
                 var = variables[j]
-                bit = 1 if (gray & mask) else 0
+                bit = (gray >> changed_bit) & 1
                 if bit != var.output:
                     var.output = bit
                     self.propagate(var)
-            else:
-                for j in range(n):
-                    var = variables[j]
-                    if var.output != 0:
-                        var.output = 0
-                        self.propagate(var)
 
             # Fast tuple extraction
             v_states = tuple(var.output for var in variables)
             g_states = tuple(gate.output for gate in gate_list)
-            raw_rows[gray] = (v_states, g_states)
+            raw_rows[gray - base] = (v_states, g_states)
 
         return raw_rows
 
-    def truthTable(self, variables: list = None, outputs: list = None) -> str:
+    def truthTable(self, variables: list = None, outputs: list = None, *, workers: int = 1) -> str:
         """Gray Code optimized Truth Table with sorting and string caching."""
-      
+        buffer = io.StringIO()
+        self.writeTruthTable(buffer, 'text', variables, outputs, workers=workers)
+        return buffer.getvalue()
+
+    def writeTruthTable(self, stream, fmt: str = 'text', variables: list = None, outputs: list = None, *, workers: int = 1, limit: int = None) -> int:
+        """Write the truth table to stream as 'text', 'csv' or 'binary' (one byte per cell), returning the row count.
+        Rows are evaluated 2**TABLE_CHUNK at a time in input order, so memory stays bounded;
+        limit stops after that many rows and evaluates no chunk past them.
+        workers only matters on the Reactor, the engine always evaluates on one thread.
+        Chunks are memoized in table_cache against the structural hash, a repeat request only formats."""
+        if fmt not in TABLE_FORMATS:
+            raise ValueError(f"unknown truth table format {fmt!r}")
+        picked = variables is not None or outputs is not None
         if variables is None:
             variables = self.get_variables()
-        if not variables:
-            return ''
+        if not variables or len(variables) > TABLE_INPUTS:
+            return 0
 
         gate_list = []
         if outputs is not None:
             gate_list = outputs
         else:
             gate_list = [item for item in self.objlist[OUTPUT_PIN_ID] if item is not None]
-
-        raw_rows = self.table(variables, gate_list)
+        key = self.column_key(variables, gate_list) if picked else self.structural_hash()
 
         # repr() gives the plain name (no ANSI codes) — used for width math and file output.
         # str() gives the colored name — used only for the printed header cells.
         var_reprs  = [repr(v) for v in variables]
         gate_reprs = [repr(v) for v in gate_list]
         all_reprs  = var_reprs + gate_reprs
+        separator = ""
+
+        if fmt == 'text':
+            col_width = max((len(name) for name in all_reprs), default=4) + 2
+            IN_MAP = [
+                "0".center(col_width),
+                "1".center(col_width)
+            ]
+            OUT_MAP = [
+                "F".center(col_width),
+                "T".center(col_width),
+                "1/0".center(col_width),
+                "X".center(col_width)
+            ]
+
+            # Header: colored names padded to col_width based on plain-name length.
+            var_colored   = [str(v) for v in variables]
+            gate_colored  = [str(v) for v in gate_list]
+            all_colored   = var_colored + gate_colored
+            header_parts  = [
+                colored.center(col_width + len(colored) - len(plain))
+                for colored, plain in zip(all_colored, all_reprs)
+            ]
+            header    = " | ".join(header_parts)
+            separator = "─" * (col_width * len(all_reprs) + 3 * (len(all_reprs) - 1))
+            stream.write(f"{separator}\n{header}\n{separator}\n")
+            glue = " | "
+        elif fmt == 'csv':
+            IN_MAP = ["0", "1"]
+            OUT_MAP = ["0", "1", "X"]
+            stream.write(",".join(all_reprs) + "\n")
+            glue = ","
 
-        col_width = max((len(name) for name in all_reprs), default=4) + 2
-
-        IN_MAP = [
-            "0".center(col_width),
-            "1".center(col_width)
-        ]
-        OUT_MAP = [
-            "F".center(col_width),
-            "T".center(col_width),
-            "1/0".center(col_width),
-            "X".center(col_width)
-        ]
-
-        # Header: colored names padded to col_width based on plain-name length.
-        var_colored   = [str(v) for v in variables]
-        gate_colored  = [str(v) for v in gate_list]
-        all_colored   = var_colored + gate_colored
-        header_parts  = [
-            colored.center(col_width + len(colored) - len(plain))
-            for colored, plain in zip(all_colored, all_reprs)
-        ]
-        header    = " | ".join(header_parts)
-        separator = "─" * (col_width * len(all_reprs) + 3 * (len(all_reprs) - 1))
-        mode=get_MODE()
+        n = len(variables)
+        col = n + len(gate_list)
+        width = min(n, TABLE_CHUNK)
+        total = 1 << n if limit is None else max(min(limit, 1 << n), 0)
+        walked = False
+        refocus = self.focused
+        for chunk in range((total + (1 << width) - 1) >> width):
+            raw, missed = self.table_chunk(variables, gate_list, key, chunk, width, walked)
+            walked |= missed
+            if (chunk + 1) << width > total:  # the limit ends inside this chunk
+                raw = raw[:(total - (chunk << width)) * col]
+            if fmt == 'binary':
+                stream.write(raw)
+                continue
+            lines = []
+            for row in range(0, len(raw), col):
+                row_parts = [IN_MAP[v] for v in raw[row:row + n]]
+                row_parts.extend(OUT_MAP[g] for g in raw[row + n:row + col])
+                lines.append(glue.join(row_parts))
+            lines.append("")
+            stream.write("\n".join(lines))
+
+        if fmt == 'text':
+            stream.write(separator + "\n")
+        if walked:  # a fully cached table leaves the circuit alone
+            self.settle_table(refocus)
+        return total
+
+    def table_chunk(self, variables: list, gate_list: list, key: int, chunk: int, width: int, scoped: bool = False) -> tuple:
+        """(rows of chunk, whether they were evaluated), from the table cache or stored there on a miss.
+        The first miss of a walk narrows evaluation to the cone of gate_list, unless it is already scoped."""
+        raw = table_cache.get((key, chunk))
+        if raw is not None:
+            return raw, False
+        if not scoped:
+            self.unfocus()
+            self.mark_cone(gate_list)
+        raw_rows = self.table_block(variables, gate_list, gray_block(chunk), width)
+        raw = bytes(cell for v_states, g_states in raw_rows for cell in v_states + g_states)
+        table_cache.put((key, chunk), raw)
+        return raw, True
+
+    def truthRows(self, chunk: int) -> bytes:
+        """Rows chunk<<TABLE_CHUNK onwards of the truth table, one byte per cell in input order.
+        Lets a view pull a large table a chunk at a time, the circuit is settled back after a cache miss."""
+        variables = self.get_variables()
+        if not variables or len(variables) > TABLE_INPUTS:
+            return b""
+        gate_list = [item for item in self.objlist[OUTPUT_PIN_ID] if item is not None]
+        n = len(variables)
+        width = min(n, TABLE_CHUNK)
+        if not 0 <= chunk < 1 << (n - width):
+            raise IndexError(f"truth table has no chunk {chunk}")
+        refocus = self.focused
+        raw, walked = self.table_chunk(variables, gate_list, self.structural_hash(), chunk, width)
+        if walked:
+            self.settle_table(refocus)
+        return raw
+
+    def settle_table(self, refocus: bool):
+        """Reset and simulate after a walk, under the focus the circuit had before it."""
+        mode = get_MODE()
+        self.clear_cone()
         self.reset()
+        if refocus:
+            self.mark_cone(self.watched)
         self.simulate(mode)
-        
-        final_table_lines = [separator, header, separator]
-        for v_states, g_states in raw_rows:
-            row_parts = [IN_MAP[v] for v in v_states]
-            row_parts.extend(OUT_MAP[g] for g in g_states)
-            final_table_lines.append(" | ".join(row_parts))
-            
-        final_table_lines.append(separator)
-        final_table_lines.append("")
-        return "\n".join(final_table_lines)
+
+    def diagnose_row(self, comp: Gate) -> tuple:
+        """(component, sources, book, targets, output) cells of comp's diagnosis, plain and untruncated."""
+        # Sources: repr() keeps column widths intact; no color needed for source names.
+        if isinstance(comp.sources, list):
+            ch = [f"[{i}]:{repr(c)}" for i, c in enumerate(comp.sources) if c is not None]
+            ch_str = ", ".join(ch) if ch else "None"
+        else:
+            ch_str = f"val:{comp.sources}"
+
+        book = f"[{comp.book[0]},{comp.book[1]},{comp.book[2]}]"
+
+        tgt = [f"{repr(p.target)} " for p in comp.hitlist]
+        tgt_str = ", ".join(tgt) if tgt else "None"
+        return repr(comp), ch_str, book, tgt_str, comp.getoutput()
 
     def diagnose(self):
         """Print a detailed report."""
@@ -319,17 +1018,7 @@ class Circuit:
             print("-" * total_width)
 
             for comp in gates:
-                # Sources: repr() keeps column widths intact; no color needed for source names.
-                if isinstance(comp.sources, list):
-                    ch = [f"[{i}]:{repr(c)}" for i, c in enumerate(comp.sources) if c is not None]
-                    ch_str = ", ".join(ch) if ch else "None"
-                else:
-                    ch_str = f"val:{comp.sources}"
-
-                book = f"[{comp.book[0]},{comp.book[1]},{comp.book[2]}]"
-
-                tgt = [f"{repr(p.target)} " for p in comp.hitlist]
-                tgt_str = ", ".join(tgt) if tgt else "None"
+                _, ch_str, book, tgt_str, _ = self.diagnose_row(comp)
 
                 ch_str  = ch_str[:26]  + ".." if len(ch_str)  > 28 else ch_str
                 tgt_str = tgt_str[:23] + ".." if len(tgt_str) > 25 else tgt_str
@@ -379,6 +1068,90 @@ class Circuit:
         
         return f.getvalue()
 
+    def structural_hash(self, selection: list = None) -> int:
+        """Hash of the gate types, input limits and wiring of selection (the whole circuit when None),
+        independent of locations. Variables and pins count by rank, ICs by their own pin order.
+        The whole-circuit hash is kept until the next edit through the circuit."""
+        if selection is None:
+            if self.hashed[0] == self.revision:
+                return self.hashed[1]
+            rank = self.rank_gates([gate for kind in (VARIABLE_ID, INPUT_PIN_ID, OUTPUT_PIN_ID, IC_ID) for gate in self.objlist[kind] if gate is not None], {})
+            value = self.structure(self.expand(self.get_components()), rank)
+            self.hashed = (self.revision, value)
+            return value
+        return self.structure(self.expand(selection), self.rank_gates(selection, {}))
+
+    def column_key(self, variables: list, outputs: list) -> int:
+        """Table cache key of hand-picked columns: the structural hash followed by the refined label
+        of every picked gate, so it depends on structure and never on locations or objlist slots."""
+        gates = self.expand(self.get_components())
+        rank = self.rank_gates([gate for kind in (VARIABLE_ID, INPUT_PIN_ID, OUTPUT_PIN_ID, IC_ID) for gate in self.objlist[kind] if gate is not None], {})
+        labels = {}
+        self.structure(gates, rank, labels)
+        key = self.structural_hash()
+        for group in (variables, outputs):
+            key = mix(key, len(group))
+            for gate in group:
+                key = mix(key, labels.get(gate, OPEN_PIN))
+        return key
+
+    def expand(self, components: list) -> list:
+        """The gates of components, with every IC replaced by its pins and internal gates."""
+        gates = []
+        for comp in components:
+            if comp.id == IC_ID:
+                gates.extend(comp.inputs)
+                gates.extend(comp.outputs)
+                gates.extend(self.expand(comp.internal))
+            else:
+                gates.append(comp)
+        return gates
+
+    def rank_gates(self, gates: list, rank: dict) -> dict:
+        """Rank the variables and pins of gates by kind in list order, each IC ranks its own pins."""
+        counts = [0] * TOTAL
+        for gate in gates:
+            kind = gate.id
+            if kind == IC_ID:
+                self.rank_gates(gate.inputs, rank)
+                self.rank_gates(gate.outputs, rank)
+                self.rank_gates([ic for ic in gate.internal if ic.id == IC_ID], rank)
+            elif kind == VARIABLE_ID or kind == INPUT_PIN_ID or kind == OUTPUT_PIN_ID:
+                rank[gate] = counts[kind]
+                counts[kind] += 1
+        return rank
+
+    def structure(self, gates: list, rank: dict, labels: dict = None) -> int:
+        """Colour refinement over gates: every round folds the labels of a gate's sources
+        and targets into its own, until the number of distinct labels stops growing.
+        Every gate here is symmetric in its inputs, so sources and targets are summed, not ordered.
+        labels, when given, receives the final label of every gate."""
+        member = {gate: i for i, gate in enumerate(gates)}
+        label = [mix(mix(gate.id, gate.inputlimit), rank.get(gate, -1) + 1) for gate in gates]
+        classes = len(set(label))
+        for _ in range(HASH_ROUNDS):
+            refined = []
+            for i, gate in enumerate(gates):
+                up = 0
+                if isinstance(gate.sources, list):
+                    for source in gate.sources:
+                        j = member.get(source)
+                        up += splitmix(label[j] if j is not None else OPEN_PIN)
+                down = 0
+                for profile in gate.hitlist:
+                    j = member.get(profile.target)
+                    if j is not None:
+                        down += splitmix(label[j])
+                refined.append(mix(mix(label[i], up & MASK64), down & MASK64))
+            label = refined
+            grown = len(set(label))
+            if grown == classes:
+                break
+            classes = grown
+        if labels is not None:
+            labels.update(zip(gates, label))
+        return mix(len(gates), sum(splitmix(value) for value in label) & MASK64)
+
     def writetojson(self, location: str):
         circuit = [gate.full_data() for gate in self.get_components()]
         with open(location, 'wb') as file:
@@ -429,6 +1202,7 @@ class Circuit:
 
 
     def transfer_info(self,gate:Gate, id:int):
+        self.revision += 1
         if id>=IC_ID or id<0:
             return
         real_source=[source for source in gate.sources if source is not None ]
@@ -440,9 +1214,10 @@ class Circuit:
                 gate.code=(id,len(self.objlist[id]))
                 self.objlist[id].append(gate)
                 gate.process()
-                self.propagate(gate)
+                self.settle(gate)
 
     def build_ic(self):
+        self.flush()
         my_ic=self.getcomponent(IC_ID)
         queue=[]
         index=0
@@ -486,6 +1261,7 @@ class Circuit:
         return self.objlist[IC_ID].pop()
 
     def ic_pin_change(self):
+        self.revision += 1
         for var in self.objlist[VARIABLE_ID]:
             if var is not None:
                 var.code=(INPUT_PIN_ID,len(self.objlist[INPUT_PIN_ID]))
@@ -500,6 +1276,7 @@ class Circuit:
         self.objlist[PROBE_ID].clear()
 
     def reorder(self,gate:Gate|IC,index:int):
+        self.revision += 1
         lst=self.objlist[gate.id]
         if index<0 or index>=len(lst):
             return
@@ -565,14 +1342,23 @@ class Circuit:
                 self.objlist[i].pop()
 
     def clearcircuit(self):
+        self.revision += 1
         for i in range(TOTAL):
             self.objlist[i].clear()
         self.counter = 0
+        self.observers = 0
+        self.tombstones.clear()
+        self.stash.clear()
+        self.pending.clear()
+        self.watched = []
+        self.dormant = []
+        self.focused = False
         reset_loc()   # reset shared location counter in Store
 
     def copy(self, components: list):
         if not components:
             return
+        self.flush()
         self.copydata = []
         cluster = []
         for i in components:
@@ -628,15 +1414,13 @@ class Circuit:
         if self.runner is not None and not self.runner.done():
             self.runner.cancel()
         self.runner=None
-        for variable in self.objlist[VARIABLE_ID]:
-            if variable is not None:
-                variable.output = variable.value
-                self.propagate(variable)
+        variables = [variable for variable in self.objlist[VARIABLE_ID] if variable is not None]
+        self.custom_simulate(variables)
 
     def custom_simulate(self,gates:list[Gate]):
         for i in gates:
             i.output = i.value
-            self.propagate(i)
+        self.batch_propagate(gates)
         
     def reset(self):
         """Reset to design mode."""
@@ -664,7 +1448,7 @@ class Circuit:
         gate = task.gate
         if not gate.scheduled:
             return
-        if not gate.update:
+        if gate.observed and not gate.update:
             self.visual_queue.append(gate)
             gate.update = True
         gate.scheduled = False
@@ -675,7 +1459,7 @@ class Circuit:
             if profile_output != new_output:
                 target = profile.target
                 gate_type = target.id
-                if gate_type<0:
+                if gate_type<0 or target.idle:  # tombstoned, or outside the focused cone
                     continue
                 limit = target.inputlimit
                 if gate_type > VARIABLE_ID:
@@ -696,7 +1480,7 @@ class Circuit:
                         else: target_output = UNKNOWN
                 if target_output != target.output:
                     target.output = target_output
-                    if not target.update:
+                    if target.observed and not target.update:
                         target.update = True
                         self.visual_queue.append(target)
                     if not target.scheduled:
@@ -717,25 +1501,41 @@ class Circuit:
 
     def propagate(self, origin: Gate):
         """Double-buffer, fixed-size queue — mirrors reactor's queue[2][LIMIT] pattern."""
-        if origin.inputlimit==0:
-            if origin.scheduled:
-                origin.scheduled=False
-                return
-            heapq.heappush(self.time_queue,Task(origin,self.Global_Clock+origin.book[PRIMARY],origin.location))
-            origin.scheduled=True
-            if self.runner is None or self.runner.done():
-                self.runner=asyncio.create_task(self.task_manager())
-            return
-
+        self.batch_propagate((origin,))
+
+    def batch_propagate(self, origins):
+        """One wave seeded with every origin at once; clock variables are scheduled instead."""
+        need = max(self.counter, len(origins)) + 1
+        if len(self.queue[0]) < need:
+            # a wave holds every live gate at most once
+            size = max(need, 2 * len(self.queue[0]))
+            self.queue = [[None] * size, [None] * size]
         read_buf: list = self.queue[0]
         write_buf: list = self.queue[1]
-        read_end: int = 1
+        read_end: int = 0
         write_end: int = 0
         counter: int = 0
-        read_buf[0] = origin
-        if not origin.update:
-            origin.update=True
-            self.visual_queue.append(origin)             
+        clocked = False
+        for origin in origins:
+            if origin.inputlimit==0:
+                origin.mark=False
+                if origin.scheduled:
+                    origin.scheduled=False
+                else:
+                    heapq.heappush(self.time_queue,Task(origin,self.Global_Clock+origin.book[PRIMARY],origin.location))
+                    origin.scheduled=True
+                    clocked = True
+                continue
+            if origin.observed and not origin.update:
+                origin.update=True
+                self.visual_queue.append(origin)
+            if not origin.hitlist:
+                origin.mark=False
+                continue
+            read_buf[read_end] = origin
+            read_end += 1
+        if clocked and (self.runner is None or self.runner.done()):
+            self.runner=asyncio.create_task(self.task_manager())
         while read_end > 0:
             if counter > self.counter:
                 for i in range(read_end):
@@ -760,7 +1560,7 @@ class Circuit:
                         target = profile.target
                         gate_type = target.id
                         limit = target.inputlimit
-                        if gate_type<0:
+                        if gate_type<0 or target.idle:
                             continue
                         if gate_type>VARIABLE_ID:
                             if new_output>HIGH:target_output = new_output
@@ -782,12 +1582,12 @@ class Circuit:
 
                         if target_output != target.output:
                             target.output = target_output
-                            if not target.update:
+                            if target.observed and not target.update:
                                 target.update = True
                                 if target.location<0:
                                     print('Error in propagation')
                                 self.visual_queue.append(target)
-                            if not target.mark:
+                            if not target.mark and target.hitlist:
                                 target.mark = True
                                 write_buf[write_end] = target
                                 write_end += 1
@@ -795,7 +1595,40 @@ class Circuit:
             read_buf, write_buf = write_buf, read_buf
             read_end, write_end = write_end, 0
 
+    @contextlib.contextmanager
+    def batch(self):
+        """with circuit.batch(): structural edits only record the gates they changed,
+        the outermost exit settles them all in one wave."""
+        self.batching += 1
+        try:
+            yield self
+        finally:
+            self.batching -= 1
+            if not self.batching:
+                self.flush()
+
+    def settle(self, origin: Gate):
+        """Propagate origin now, or record it for the open batch."""
+        if not self.batching or origin.inputlimit == 0:
+            self.propagate(origin)
+        elif not origin.mark:
+            origin.mark = True
+            self.pending.append(origin)
+
+    def flush(self):
+        """Settle the origins recorded by the open batch in one wave."""
+        origins, self.pending = self.pending, []
+        if origins:
+            self.batch_propagate(origins)
+
     # ── Visual-queue helpers (called from the UI layer) ──────────────
+    def observe(self, gate: Gate, flag: bool):
+        """Subscribe or unsubscribe a gate from the visual queue."""
+        if gate.observed == flag:
+            return
+        gate.observed = flag
+        self.observers += 1 if flag else -1
+
     def visual_queue_empty(self) -> bool:
         """Return True when there are no pending dirty gate locations."""
         return len(self.visual_queue) == 0
@@ -815,3 +1648,23 @@ class Circuit:
     def visual_queue_size(self) -> int:
         """Return the size of the visual queue."""
         return len(self.visual_queue)
+
+    def drain_visual_queue(self, max_items: int = -1, out=None):
+        """Pop up to max_items dirty gate locations in one call.
+        Returns a new int32 array, or fills the caller's buffer and returns the count."""
+        n = len(self.visual_queue)
+        if 0 <= max_items < n:
+            n = max_items
+        if out is None:
+            buffer = array('i', bytes(4 * n))
+        else:
+            buffer = out
+            n = min(n, len(out))
+        popleft = self.visual_queue.popleft
+        for i in range(n):
+            gate = popleft()
+            gate.update = False
+            buffer[i] = gate.location
+        if out is None:
+            return buffer
+        return n
@@ -11,6 +11,11 @@ SIMULATE = 1
 COMPILE = 3
 
 LIMIT = 500_000
+TABLE_INPUTS = 30  # widest circuit truthTable() enumerates
+TABLE_CHUNK = 12  # log2 of the rows writeTruthTable() evaluates at a time
+HASH_ROUNDS = 64  # most refinement rounds structural_hash() runs
+TABLE_CACHE = 1 << 26  # bytes of truth-table rows kept by the table cache
+DEFRAG_SLICE = 4096  # most gates one defragment() step moves
 
 AND_ID = 0
 NAND_ID = 1
@@ -51,7 +51,7 @@ class Gate:
     __slots__ = [
         'sources', 'hitlist', 'inputlimit', 'book',
         'output', 'scheduled', 'mark', 'id', 'code', 'codename', 'custom_name',
-        'value', 'location','update'
+        'value', 'location','update','observed','idle'
     ]
 
     def __init__(self,id:int,name:str):
@@ -73,6 +73,8 @@ class Gate:
         self.custom_name: str = ''
         self.location: int = -1   # flat index assigned by Circuit at registration
         self.update: bool = False
+        self.observed: bool = False  # only observed gates feed the visual queue
+        self.idle: bool = False  # outside the focused cone, never evaluated as a target
 
     def __repr__(self) -> str:
         return self.codename if self.custom_name == '' else self.custom_name
@@ -1,4 +1,4 @@
-import io, sys, re
+import io, sys
 import json
 from pathlib import Path
 from typing import cast
@@ -160,31 +160,26 @@ class AppWindow(QMainWindow):
         QSettings().setValue("main_window/geometry", self.saveGeometry())
         self.update_props_position()
 
-    def _show_output(self, title: str, func, dialog_class: type, returns_string: bool = False):
-        text = func()
-        
-        # Remove ANSI codes
-        text = re.sub(r'\x1B\[[0-?]*[ -/]*[@-~]', '', text)
-        
-        if text.strip():
-            dialog_class(self, text).exec()
-        else:
-            QMessageBox.information(self, "No Data", f"No {title.lower()} available.")
-
     def show_truth_table(self):
         # Remember Simulation Mode
         mode = Const.get_MODE()
         if mode != Const.SIMULATE:
             return 'Please switch to Simulation Mode first.'
         
-        # Show Table
-        self._show_output("Truth Table", logic.truthTable, TruthTableDialog, returns_string=True)
+        # Show Table, its rows are evaluated as they scroll into view
+        if logic.get_variables():
+            TruthTableDialog(self, logic).exec()
+        else:
+            QMessageBox.information(self, "No Data", "No truth table available.")
         
         # Restore Simulation Mode
         Const.set_MODE(mode)
 
     def show_diagnose(self):
-        self._show_output("Diagnosis", logic.diagnose_str, DiagnoseDialog, returns_string=False)
+        if logic.get_components():
+            DiagnoseDialog(self, logic).exec()
+        else:
+            QMessageBox.information(self, "No Data", "No diagnosis available.")
 
     def closeEvent(self, event):
         # To make sure a runtime error isn't raised when closing the app
@@ -495,6 +490,11 @@ if __name__ == "__main__":
     ICPath = Path(appPath) / "IC"
     ICPath.mkdir(parents=True, exist_ok=True)
 
+    # Truth tables are memoized by circuit structure across sessions
+    tablesPath = Path(QStandardPaths.writableLocation(StandardLocation.CacheLocation)) / "TruthTables"
+    tablesPath.mkdir(parents=True, exist_ok=True)
+    logic.table_cache.directory = str(tablesPath)
+
 
     ### App Theme
     app.setStyle("Fusion")
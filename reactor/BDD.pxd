@@ -0,0 +1,23 @@
+# distutils: language = c++
+from libcpp.vector cimport vector
+from libcpp.unordered_map cimport unordered_map
+
+cdef class BDD:
+    cdef readonly int variables
+    cdef vector[int] level     # variable tested by each node, variables for the three terminals
+    cdef vector[int] low       # node taken when the variable is 0
+    cdef vector[int] high      # node taken when the variable is 1
+    cdef unordered_map[unsigned long long, int] unique    # (level, low, high) -> node, keeps the diagrams reduced
+    cdef unordered_map[unsigned long long, int] computed  # (op, f, g) -> apply() result
+    cdef unordered_map[int, int] negated
+
+    cdef int node(self, int var, int low, int high) except -1
+    cpdef int var(self, int index) except -1
+    cpdef int negate(self, int f) except -1
+    cpdef int apply(self, int op, int f, int g) except -1
+    cpdef int value(self, int f, Py_ssize_t row)
+    cpdef object count(self, int f, int value=*)
+    cdef object paths(self, int f, int value, dict memo)
+    cpdef list support(self, int f)
+    cpdef bint depends(self, int f, int index)
+    cpdef bytes rows(self, list functions, Py_ssize_t start, Py_ssize_t count)
@@ -0,0 +1,161 @@
+# distutils: language = c++
+# cython: boundscheck=False
+# cython: wraparound=False
+# cython: initializedcheck=False
+# cython: cdivision=True
+# cython: nonecheck=False
+from Const cimport *
+from libcpp.vector cimport vector
+from libcpp.unordered_map cimport unordered_map
+from cython.operator cimport dereference as deref
+
+cdef int NODE_BITS = 26   # node ids and levels are packed into one 64-bit unique-table key
+cdef int LEVEL_BITS = 12
+
+cdef class BDD:
+    '''Reduced ordered binary decision diagrams over variables 0..variables-1, tested in that order.
+    Nodes are ints; the terminals LOW, HIGH and UNKNOWN are nodes 0, 1 and 2, so a diagram can say
+    that a gate reads UNKNOWN for some inputs. Every diagram built by one BDD is canonical:
+    two functions are equal exactly when their nodes are'''
+
+    def __init__(self, int variables):
+        if variables < 0 or variables >= 1 << LEVEL_BITS:
+            raise ValueError(f"a BDD holds up to {(1 << LEVEL_BITS) - 1} variables")
+        self.variables = variables
+        for _ in range(3):
+            self.level.push_back(variables)
+            self.low.push_back(-1)
+            self.high.push_back(-1)
+
+    def __len__(self):
+        return self.level.size()
+
+    cdef int node(self, int var, int low, int high) except -1:
+        '''the node testing var, shared with every equal one and skipped when both branches agree'''
+        if low == high:
+            return low
+        cdef unsigned long long key = (<unsigned long long>var << (2*NODE_BITS)) | (<unsigned long long>low << NODE_BITS) | high
+        cdef unordered_map[unsigned long long, int].iterator it = self.unique.find(key)
+        if it != self.unique.end():
+            return deref(it).second
+        cdef int index = self.level.size()
+        if index >= 1 << NODE_BITS:
+            raise MemoryError(f"a BDD holds up to {1 << NODE_BITS} nodes")
+        self.level.push_back(var)
+        self.low.push_back(low)
+        self.high.push_back(high)
+        self.unique[key] = index
+        return index
+
+    cpdef int var(self, int index) except -1:
+        '''the function that is variable index'''
+        if index < 0 or index >= self.variables:
+            raise IndexError(f"no variable {index}")
+        return self.node(index, LOW, HIGH)
+
+    cpdef int negate(self, int f) except -1:
+        '''f with LOW and HIGH swapped, UNKNOWN stays'''
+        if f <= UNKNOWN:
+            return f if f == UNKNOWN else f ^ 1
+        cdef unordered_map[int, int].iterator it = self.negated.find(f)
+        if it != self.negated.end():
+            return deref(it).second
+        cdef int result = self.node(self.level[f], self.negate(self.low[f]), self.negate(self.high[f]))
+        self.negated[f] = result
+        return result
+
+    cpdef int apply(self, int op, int f, int g) except -1:
+        '''f op g for op AND_ID, OR_ID or XOR_ID. UNKNOWN is the identity of every op,
+        as an unknown input is ignored by process() while another input is known'''
+        if f == UNKNOWN:
+            return g
+        if g == UNKNOWN:
+            return f
+        if f <= HIGH and g <= HIGH:
+            if op == AND_ID: return f & g
+            if op == OR_ID: return f | g
+            return f ^ g
+        if op == AND_ID and (f == LOW or g == LOW):
+            return LOW
+        if op == OR_ID and (f == HIGH or g == HIGH):
+            return HIGH
+        if f > g: # every op commutes, one cache entry serves both orders
+            f, g = g, f
+        cdef unsigned long long key = (<unsigned long long>op << 60) | (<unsigned long long>f << 30) | g
+        cdef unordered_map[unsigned long long, int].iterator it = self.computed.find(key)
+        if it != self.computed.end():
+            return deref(it).second
+        cdef int top = min(self.level[f], self.level[g])
+        cdef int f0 = self.low[f] if self.level[f] == top else f
+        cdef int f1 = self.high[f] if self.level[f] == top else f
+        cdef int g0 = self.low[g] if self.level[g] == top else g
+        cdef int g1 = self.high[g] if self.level[g] == top else g
+        cdef int result = self.node(top, self.apply(op, f0, g0), self.apply(op, f1, g1))
+        self.computed[key] = result
+        return result
+
+    cpdef int value(self, int f, Py_ssize_t row):
+        '''value of f at row, variable 0 being the most significant bit as in a truth table'''
+        while f > UNKNOWN:
+            f = self.high[f] if (row >> (self.variables - 1 - self.level[f])) & 1 else self.low[f]
+        return f
+
+    cpdef object count(self, int f, int value=HIGH):
+        '''number of rows at which f reads value'''
+        cdef dict memo = {}
+        return self.paths(f, value, memo) << self.level[f]
+
+    cdef object paths(self, int f, int value, dict memo):
+        '''rows over the variables from f's level on at which f reads value'''
+        if f <= UNKNOWN:
+            return 1 if f == value else 0
+        cdef object found = memo.get(f)
+        if found is not None:
+            return found
+        cdef int low = self.low[f], high = self.high[f], level = self.level[f]
+        found = (self.paths(low, value, memo) << (self.level[low] - level - 1)) + \
+                (self.paths(high, value, memo) << (self.level[high] - level - 1))
+        memo[f] = found
+        return found
+
+    cpdef list support(self, int f):
+        '''the variables f depends on, in order'''
+        cdef vector[int] stack
+        cdef set seen = set(), found = set()
+        stack.push_back(f)
+        while not stack.empty():
+            f = stack.back()
+            stack.pop_back()
+            if f <= UNKNOWN or f in seen:
+                continue
+            seen.add(f)
+            found.add(self.level[f])
+            stack.push_back(self.low[f])
+            stack.push_back(self.high[f])
+        return sorted(found)
+
+    cpdef bint depends(self, int f, int index):
+        '''whether some change of variable index alone changes f'''
+        return index in self.support(f)
+
+    cpdef bytes rows(self, list functions, Py_ssize_t start, Py_ssize_t count):
+        '''rows start..start+count of the truth table of functions, one byte per cell in input order
+        like Circuit.truthRows(); only the rows asked for are ever evaluated'''
+        cdef int n = self.variables, m = len(functions), j
+        if start < 0 or count < 0 or n > 62 or start + count > (<Py_ssize_t>1) << n:
+            raise IndexError(f"rows {start}..{start + count} are outside the table")
+        cdef vector[int] roots
+        for f in functions:
+            if f < 0 or f >= <int>self.level.size():
+                raise ValueError(f"{f} is not a node of this BDD")
+            roots.push_back(f)
+        cdef bytearray out = bytearray((n + m) * count)
+        cdef unsigned char* cell = out
+        cdef Py_ssize_t row
+        for row in range(start, start + count):
+            for j in range(n):
+                cell[j] = (row >> (n - 1 - j)) & 1
+            for j in range(m):
+                cell[n + j] = self.value(roots[j], row)
+            cell += n + m
+        return bytes(out)
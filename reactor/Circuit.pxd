@@ -1,9 +1,12 @@
 # distutils: language = c++
-from Gates cimport Gate, Variable, Profile, CPP_Gate, vector, Task
+from Gates cimport Gate, GateVerse, Variable, Profile, CPP_Gate, vector, Task, ProfilePool
 from libcpp.vector cimport vector
 from libcpp.deque cimport deque
-from Const cimport LIMIT, TOTAL
+from libcpp.unordered_map cimport unordered_map
+from libcpp.utility cimport pair
+from Const cimport TOTAL
 from IC cimport IC
+from BDD cimport BDD
 
 cdef extern from "<queue>" namespace "std" nogil:
     cdef cppclass priority_queue[T, Container=*, Compare=*]:
@@ -22,17 +25,37 @@ cdef extern from "<functional>" namespace "std" nogil:
 cdef class Circuit:
     cdef public list objlist
     cdef public list copydata
-    cdef public list gate_verse
+    cdef public GateVerse gate_verse
+    cdef object ics                # WeakSet of the ICs built here, their interiors follow optimize/refresh
     cdef public int hidden
     cdef public unsigned long long eval_count
+    cdef public int observers      # gates subscribed to the visual queue
+    cdef public double frag_threshold  # fragmentation score that triggers defragment()
+    cdef double settled_jump       # average jump distance after the last optimize, -1 before any baseline
     cdef public object runner      # asyncio.Task or None (FLIPFLOP async runner)
     cdef unsigned int Global_Clock
     cdef unsigned int[12] Global_delay
     cdef priority_queue[Task, vector[Task], greater[Task]] time_queue
     cdef deque[int] visual_queue   # C++ deque of dirty gate locations for UI consumer
-    cdef int queue[2][LIMIT]
+    cdef vector[int] queue         # both wave buffers back to back, sized to the gate count on demand
     cdef vector[CPP_Gate] gate_infolist
+    cdef ProfilePool* pool         # slab storage behind every hitlist in gate_infolist
+    cdef readonly bint hugepages   # back gate_infolist, the wave buffers and the pool with huge pages
+    cdef const void* advised       # gate_infolist buffer the huge page advice was last given for
+    cdef vector[int] tombstones    # locations tombstoned since the last collect()
+    cdef unordered_map[int, vector[pair[int, Profile]]] stash  # dead target -> (source, profile) removed by collect(keep)
+    cdef int batching              # depth of open batch() blocks, structural edits only record their origins meanwhile
+    cdef vector[int] pending       # origins recorded by the open batch, marked so each is listed once
+    cdef public unsigned long long revision  # bumped by every structural edit, whatever is cached against the structure keys on it
+    cdef unsigned long long hashed_revision  # revision the cached whole-circuit structural_hash() was taken at
+    cdef unsigned long long hashed
+    cdef readonly unsigned long long layout  # bumped whenever gates move or hitlists shrink without an edit (optimize, collect)
+    cdef public bint focused       # only the fan-in cone of the gates focus() watches is evaluated
+    cdef int cone_end              # one past the last cone location, sweep stops there while focused
+    cdef vector[int] watched       # locations focus() takes the cone of, kept across optimize
     cpdef object getcomponent(self, int choice)
+    cdef void enlist(self, object gt, int choice)
+    cpdef list build_from_arrays(self, object types, object input_limits=*, object edge_src=*, object edge_dst=*, object edge_pin=*)
     cpdef object getobj(self, tuple code)
     cpdef list get_components(self)
     cpdef list get_variables(self)
@@ -40,7 +63,11 @@ cdef class Circuit:
     cpdef void listComponent(self)
     cpdef void listVar(self)
     cpdef bint setlimits(self, Gate gate, int size)
-    cpdef void optimize(self)
+    cpdef object optimize(self)
+    cdef double average_jump(self) nogil
+    cpdef double fragmentation(self)
+    cpdef object defragment(self, bint force=*, int limit=*)
+    cdef object compact(self, int limit)
     cpdef void connect(self, Gate target, int source, int index)
     cpdef void toggle(self, int target, int value)
     cpdef void disconnect(self, Gate target, int index)
@@ -52,16 +79,45 @@ cdef class Circuit:
     cpdef void save_as_ic(self, str location, str ic_name, str tag, str description)
     cpdef void readfromjson(self, str location)
     cpdef void writetojson(self, str location)
-    cpdef void refresh(self)
+    cpdef object refresh(self)
+    cdef void remap_pending(self, const int* hash_map, int limit) nogil
+    cdef void entomb(self, vector[int]& locs)
     cpdef void renewobj(self, object obj)
+    cpdef int collect(self, bint keep=*)
+    cdef void unstash(self, int location)
     cpdef void hide(self, list gatelist)
+    cdef void release(self, int origin)
     cpdef void reveal(self, list gatelist)
     cpdef void output(self, Gate gate)
     cpdef void ic_pin_change(self)
     cpdef void reorder(self, object gate, int index)
     cpdef void generate(self, list circuit)
-    cdef bytearray table(self,vector[int] &var,vector[int] &gate)
-    cpdef str truthTable(self)
+    cpdef void reserve(self, int gates)
+    cpdef bint use_hugepages(self, bint flag=*)
+    cdef void advise(self) nogil
+    cdef bytearray table(self, vector[int] &var, vector[int] &gate, int workers=*)
+    cdef void table_block(self, vector[int] &var, vector[int] &gate, Py_ssize_t block, int width, unsigned char* out) nogil
+    cdef tuple table_columns(self, vector[int] &var, vector[int] &gate, list variables=*, list outputs=*)
+    cpdef bytes truthRows(self, Py_ssize_t chunk)
+    cpdef tuple diagnose_row(self, Gate comp)
+    cpdef unsigned long long structural_hash(self, list selection=*)
+    cdef void rank_gates(self, list gates, vector[int]& rank)
+    cdef unsigned long long structure(self, vector[int]& locs, vector[int]& rank, vector[unsigned long long]* labels=*) nogil
+    cdef unsigned long long column_key(self, list variables, list outputs)
+    cdef bytes table_chunk(self, vector[int] &var, vector[int] &gate, unsigned long long key, Py_ssize_t chunk, int width, bint* walked)
+    cdef void scope_table(self, vector[int] &gate)
+    cdef void settle_table(self, bint refocus, int mode)
+    cdef void write_rows(self, object stream, str fmt, bytes raw_rows, int n, int m, list cells)
+    cpdef int focus(self, list gates=*, bint compact=*)
+    cpdef void unfocus(self)
+    cdef int mark_cone(self, vector[int]& watched)
+    cdef void clear_cone(self) nogil
+    cpdef object compile(self)
+    cpdef list symbolic(self, BDD bdd, list outputs=*)
+    cpdef object snapshot(self)
+    cpdef void restore(self, object snap)
+    cpdef object clone(self)
+    cdef IC adopt_ic(self, IC ic)
     cpdef void rank_reset(self)
     cpdef void clearcircuit(self)
     cpdef void simulate(self, int Mode)
@@ -71,12 +127,17 @@ cdef class Circuit:
     cpdef list paste(self)
     cpdef void transfer_info(self, Gate gate, int id)
     cdef void complete_task(self, Task task) nogil
+    cdef int* waves(self, Py_ssize_t need) nogil
     cdef void propagate(self, int origin) nogil
     cdef void sweep(self, int origin) nogil
     cpdef void batch_toggle(self, list batch)
     cpdef list geometry(self)
     cdef void batch_propagate(self, vector[int] origins) nogil
+    cdef void settle(self, int origin) nogil
+    cpdef void flush(self)
+    cpdef void observe(self, Gate gate, bint flag)
     cpdef bint visual_queue_empty(self)
     cpdef void visual_queue_clear(self)
     cpdef int pop_visual_queue(self)
     cpdef int visual_queue_size(self)
+    cpdef object drain_visual_queue(self, int max_items=*, object out=*)
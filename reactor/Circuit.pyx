@@ -7,23 +7,336 @@
 import orjson
 import asyncio
 from libcpp.deque cimport deque
-from Gates cimport Gate, Variable, Profile, Task, vector, CPP_Gate
+from Gates cimport Gate, GateVerse, Variable, Profile, Task, vector, CPP_Gate, HitList, ProfilePool, advise_hugepages, hugepages_supported, reset as reset_gate
+from Gates cimport process as process_gate
 from Const cimport *
 from IC cimport IC
-from Store cimport get, decode
+from BDD cimport BDD
+from Store cimport get, decode, verse
 from cpython.list cimport PyList_GET_SIZE, PyList_GET_ITEM
+from cpython.ref cimport PyObject
 from libc.stdint cimport uint8_t,int8_t
 from libcpp.unordered_map cimport unordered_map
 from libcpp.vector cimport vector
 from libcpp.deque cimport deque
 from libcpp.algorithm cimport sort  
+from libcpp.utility cimport pair, move
+from cython.operator cimport dereference as deref, preincrement as inc
+from cpython cimport array
+import array
 import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+from collections import OrderedDict
+from libc.string cimport memcpy, memset
+
+cdef array.array INT_ARRAY = array.array('i')  # template for array.clone
+cdef Py_ssize_t PARALLEL_ROWS = 1 << 16  # smaller tables are not worth cloning the circuit for
+cdef unsigned long long OPEN_PIN = 0  # label structural_hash() gives an empty input or one fed from outside the selection
+TABLE_FORMATS = ('text', 'csv', 'binary')  # what writeTruthTable() can emit
+
+def _table_blocks(Circuit twin, list variables, list outputs, Py_ssize_t first, Py_ssize_t step, int width, bytearray matrix):
+    '''worker side of Circuit.table(): every step-th Gray-code block from first, evaluated on a private clone
+    without the GIL and written straight to its rows of matrix'''
+    cdef vector[int] var, gate
+    for loc in variables:
+        var.push_back(loc)
+    for loc in outputs:
+        gate.push_back(loc)
+    cdef Py_ssize_t col = var.size() + gate.size()
+    cdef Py_ssize_t block = first, blocks = (<Py_ssize_t>1) << (var.size() - width)
+    cdef unsigned char* out = matrix
+    with nogil:
+        while block < blocks:
+            twin.table_block(var, gate, block, width, out + ((block ^ (block >> 1)) << width)*col)
+            block += step
+
+cdef inline Py_ssize_t gray_block(Py_ssize_t chunk) nogil:
+    '''inverse Gray code of chunk, the block whose codes fill the rows chunk<<width onwards'''
+    cdef Py_ssize_t block = chunk
+    chunk >>= 1
+    while chunk:
+        block ^= chunk
+        chunk >>= 1
+    return block
+
+cdef inline unsigned long long splitmix(unsigned long long z) noexcept nogil:
+    '''splitmix64 finalizer, every input bit reaches every output bit'''
+    z += <unsigned long long>0x9E3779B97F4A7C15
+    z = (z ^ (z >> 30)) * <unsigned long long>0xBF58476D1CE4E5B9
+    z = (z ^ (z >> 27)) * <unsigned long long>0x94D049BB133111EB
+    return z ^ (z >> 31)
+
+cdef inline unsigned long long mix(unsigned long long h, unsigned long long v) noexcept nogil:
+    '''order-sensitive combination of h and v'''
+    return splitmix(h ^ splitmix(v))
+
+cdef Py_ssize_t distinct(vector[unsigned long long]& labels) noexcept nogil:
+    '''number of different values in labels'''
+    cdef vector[unsigned long long] ordered = labels
+    cdef Py_ssize_t i, count = 0
+    sort(ordered.begin(), ordered.end())
+    for i in range(<Py_ssize_t>ordered.size()):
+        if i == 0 or ordered[i] != ordered[i-1]:
+            count += 1
+    return count
+
+cdef class TableCache:
+    '''least recently used truth-table chunks keyed by (structural hash, chunk), capped at limit bytes.
+    With a directory set the chunks are also kept there as files, under the same cap'''
+    cdef public object directory  # None keeps the cache in memory only
+    cdef public Py_ssize_t limit
+    cdef Py_ssize_t size          # bytes held in memory
+    cdef Py_ssize_t disk          # bytes held in directory, -1 until counted
+    cdef object entries           # key -> rows, least recently used first
+
+    def __init__(self, Py_ssize_t limit=TABLE_CACHE, object directory=None):
+        self.limit = limit
+        self.directory = directory
+        self.size = 0
+        self.disk = -1
+        self.entries = OrderedDict()
+
+    cdef str path(self, tuple key):
+        return os.path.join(self.directory, f"{key[0]:016x}-{key[1]}.tt")
+
+    cpdef bytes get(self, tuple key):
+        '''rows stored under key, None when neither memory nor the directory has them'''
+        cdef bytes raw = self.entries.get(key)
+        if raw is not None:
+            self.entries.move_to_end(key)
+            return raw
+        if self.directory is None:
+            return None
+        try:
+            with open(self.path(key), 'rb') as file:
+                raw = file.read()
+            os.utime(self.path(key)) # the directory is trimmed oldest first
+        except OSError:
+            return None
+        self.remember(key, raw)
+        return raw
+
+    cpdef void put(self, tuple key, bytes raw):
+        '''store raw under key, evicting the least recently used rows past the cap'''
+        self.remember(key, raw)
+        if self.directory is None:
+            return
+        cdef str path = self.path(key)
+        try:
+            with open(path + '.tmp', 'wb') as file:
+                file.write(raw)
+            os.replace(path + '.tmp', path)
+        except OSError:
+            return
+        if self.disk == -1:
+            self.disk = sum([entry.stat().st_size for entry in os.scandir(self.directory) if entry.name.endswith('.tt')])
+        else:
+            self.disk += len(raw)
+        if self.disk > self.limit:
+            self.trim()
+
+    cdef void remember(self, tuple key, bytes raw):
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        self.entries[key] = raw
+        self.size += len(raw)
+        while self.size > self.limit and self.entries:
+            self.size -= len(self.entries.popitem(last=False)[1])
+
+    cdef void trim(self):
+        '''delete the least recently used files until the directory is back under the cap'''
+        cdef list files = sorted([entry for entry in os.scandir(self.directory) if entry.name.endswith('.tt')],
+                                 key=lambda entry: entry.stat().st_mtime)
+        for entry in files:
+            if self.disk <= self.limit:
+                break
+            try:
+                self.disk -= entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    cpdef void clear(self):
+        '''forget every entry, in memory and in the directory'''
+        self.entries.clear()
+        self.size = 0
+        if self.directory is not None:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.tt'):
+                    os.remove(entry.path)
+            self.disk = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+table_cache = TableCache()  # shared by every circuit, the keys already tell circuits apart
+
+cdef const int[::1] ints(object seq):
+    '''int32 view of seq, copied into an array only when it is not an int32 buffer already'''
+    try:
+        return seq
+    except (ValueError, TypeError):
+        return array.array('i', seq)
+
+cdef class Batch:
+    '''context of circuit.batch(), the outermost exit settles everything recorded inside'''
+    cdef Circuit circuit
+    def __cinit__(self, Circuit circuit):
+        self.circuit = circuit
+    def __enter__(self):
+        self.circuit.batching += 1
+        return self.circuit
+    def __exit__(self, exc_type, exc, tb):
+        self.circuit.batching -= 1
+        if self.circuit.batching == 0:
+            self.circuit.flush()
+        return False
+
+cdef class Netlist:
+    '''read-only compiled copy of a circuit's live gates in topological order, see Circuit.compile().
+    evaluate() works in a caller-owned scratch buffer and writes nothing else,
+    so any number of threads may evaluate one netlist at once'''
+    cdef readonly int size
+    cdef readonly bint cyclic     # feedback loops are swept again until they settle
+    cdef vector[int8_t] types
+    cdef vector[uint8_t] limits
+    cdef vector[int] starts       # sources of gate i are sources[starts[i]:starts[i+1]]
+    cdef vector[int] sources      # netlist index of every connected input, in slot order
+    cdef vector[int] inputs       # netlist index of each variable, in get_variables() order
+    cdef vector[int] outputs      # netlist index of each output pin
+    cdef vector[int] index        # circuit location -> netlist index, -1 when the gate was not live
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def variables(self):
+        return <int>self.inputs.size()
+
+    cpdef bytearray scratch(self):
+        '''a buffer evaluate() can work in, one byte per gate'''
+        return bytearray(self.size)
+
+    cdef void run(self, const uint8_t* values, uint8_t* state) noexcept nogil:
+        '''settle state from the variable values with the rules of Gate.process().
+        One sweep settles an acyclic netlist, feedback is swept until nothing changes (at most size times)'''
+        cdef int i, j, end, gate_type, limit, high, low, unknown, output, passes = 0
+        cdef uint8_t value
+        cdef bint changed = True
+        memset(state, UNKNOWN, self.size)
+        for i in range(<int>self.inputs.size()):
+            state[self.inputs[i]] = values[i] if values[i] < UNKNOWN else UNKNOWN
+        while changed and passes < self.size:
+            changed = False
+            passes += 1
+            for i in range(self.size):
+                gate_type = self.types[i]
+                if gate_type == VARIABLE_ID:
+                    continue
+                j = self.starts[i]
+                end = self.starts[i+1]
+                if gate_type > VARIABLE_ID:
+                    if j == end or state[self.sources[j]] == UNKNOWN:
+                        output = UNKNOWN
+                    else:
+                        output = state[self.sources[j]] ^ (gate_type == NOT_ID)
+                else:
+                    high = low = unknown = 0
+                    while j < end:
+                        value = state[self.sources[j]]
+                        if value == HIGH: high += 1
+                        elif value == LOW: low += 1
+                        else: unknown += 1
+                        j += 1
+                    limit = self.limits[i]
+                    if high + low == limit or (high + low and high + low + unknown == limit):
+                        if gate_type <= NAND_ID:   output = (low == 0) ^ (gate_type & 1)
+                        elif gate_type <= NOR_ID:  output = (high > 0) ^ (gate_type & 1)
+                        else:                      output = (high & 1) ^ (gate_type & 1)
+                    else:
+                        output = UNKNOWN
+                if output != state[i]:
+                    state[i] = output
+                    changed = True
+            if not self.cyclic:
+                break
+
+    cpdef bytes evaluate(self, object input_values, object output_locations=None, bytearray scratch=None):
+        '''outputs of the gates at output_locations (circuit locations, the output pins by default)
+        for input_values, one 0/1 per variable in get_variables() order.
+        The work is done in scratch, a fresh buffer when None, with the GIL released'''
+        cdef bytes values = bytes(input_values)
+        if len(values) != <Py_ssize_t>self.inputs.size():
+            raise ValueError(f"netlist has {self.inputs.size()} variables, got {len(values)} values")
+        if scratch is None:
+            scratch = bytearray(self.size)
+        elif len(scratch) < self.size:
+            raise ValueError("scratch is smaller than the netlist")
+        cdef vector[int] picks
+        cdef Py_ssize_t loc, i
+        if output_locations is None:
+            picks = self.outputs
+        else:
+            for loc in output_locations:
+                if loc < 0 or loc >= <Py_ssize_t>self.index.size() or self.index[loc] < 0:
+                    raise IndexError(f"no live gate at location {loc}")
+                picks.push_back(self.index[loc])
+        cdef const uint8_t* raw = values
+        cdef uint8_t* state = scratch
+        with nogil:
+            self.run(raw, state)
+        cdef bytearray result = bytearray(picks.size())
+        for i in range(<Py_ssize_t>picks.size()):
+            result[i] = state[picks[i]]
+        return bytes(result)
+
+cdef struct GateState:
+    uint8_t output
+    uint8_t value
+    uint8_t scheduled
+    uint8_t book[3]
+
+cdef class Snapshot:
+    '''dynamic state of a circuit taken by Circuit.snapshot(): outputs, values, books,
+    profile outputs, scheduled flags, the clock and the time queue, packed in native arrays.
+    It fits only the circuit it was taken of, at the revision and layout it was taken at'''
+    cdef readonly unsigned long long revision
+    cdef readonly unsigned long long layout
+    cdef readonly Py_ssize_t mode
+    cdef object circuit           # the circuit it was taken of, a clone at the same revision is another one
+    cdef vector[GateState] gates
+    cdef vector[uint8_t] profiles  # output of every profile, hitlist after hitlist
+    cdef unsigned int clock
+    cdef priority_queue[Task, vector[Task], greater[Task]] time_queue
+
+    def __len__(self):
+        return self.gates.size()
+
+    @property
+    def nbytes(self):
+        return self.gates.size()*sizeof(GateState) + self.profiles.size() + self.time_queue.size()*sizeof(Task)
+
 cdef class Circuit:
     def __cinit__(self):
         self.hidden = 0 # the oscillation breaking system
         self.eval_count = 0 # just a metric for evaluating speed
-        self.gate_infolist.reserve(500_000)# the cpp_gate list consisting of every single gate's info in c++
-        self.gate_verse = [] # the gate list in python
+        self.observers = 0 # number of gates feeding the visual queue
+        self.frag_threshold = 0.25 # fragmentation score that triggers defragment()
+        self.settled_jump = -1 # average jump distance after the last optimize, -1 until fragmentation() first measures it
+        self.pool = new ProfilePool() # hitlist storage, released in __dealloc__ after the gates
+        self.hugepages = False # opt-in, see use_hugepages
+        self.advised = NULL
+        self.batching = 0 # no batch() block is open
+        self.revision = 1 # nothing is hashed at revision 0
+        self.hashed_revision = 0
+        self.focused = False # every gate is evaluated until focus()
+        self.layout = 0
+        self.cone_end = 0
+        self.gate_verse = verse(self.gate_infolist) # gate wrappers by location, built on demand
+        self.ics = weakref.WeakSet()
         self.runner = None        # asyncio.Task for FLIPFLOP drain loop
         self.Global_Clock = 0
         cdef unsigned int delay_init[12]
@@ -41,66 +354,220 @@ cdef class Circuit:
     def __repr__(self):
         return 'Circuit'
     def __dealloc__(self):
-        pass  # asyncio task is cancelled automatically when the event loop closes
+        # hitlists hand their blocks back to the pool, so the gates go first
+        # asyncio task is cancelled automatically when the event loop closes
+        self.gate_infolist.clear()
+        del self.pool
     @property
     def infolist_size(self):
         return self.gate_infolist.size()
 
+    @property
+    def hitlist_bytes(self):
+        '''bytes the hitlist pool has taken from the system, whole huge pages while use_hugepages is on'''
+        return self.pool.bytes()
+
+    @property
+    def table_cache(self):
+        '''the truth-table cache every circuit shares'''
+        return table_cache
+
     cpdef object getcomponent(self, int choice):
         '''Get object from store, put it in objlist and update its code and codename'''
-        gt = get(choice, self.gate_infolist, self.gate_verse) 
+        self.revision += 1
+        gt = get(choice, self.gate_infolist, self.gate_verse, self.pool) 
+        if self.hugepages:
+            self.advise()
+        if choice == IC_ID:
+            self.ics.add(gt)
         if gt:
-            rank = len(self.objlist[choice])
-            self.objlist[choice].append(gt)
-            gt.code = (choice, rank)
-            if gt.id == VARIABLE_ID:
-                gt.codename = chr(ord('A') + (rank) % 26) + str((rank + 1) // 26)
-            else:
-                gt.codename = gt.codename + '-' + str(len(self.objlist[choice]))
-            if gt.id == VARIABLE_ID:
-                self.gate_infolist[(<Gate>gt).location].output = UNKNOWN if MODE==DESIGN else LOW
+            self.enlist(gt, choice)
         return gt
 
+    cdef void enlist(self, object gt, int choice):
+        '''put a new component in objlist and give it its code and codename'''
+        rank = len(self.objlist[choice])
+        self.objlist[choice].append(gt)
+        gt.code = (choice, rank)
+        if gt.id == VARIABLE_ID:
+            gt.codename = chr(ord('A') + (rank) % 26) + str((rank + 1) // 26)
+        else:
+            gt.codename = gt.codename + '-' + str(len(self.objlist[choice]))
+        if gt.id == VARIABLE_ID:
+            self.gate_infolist[(<Gate>gt).location].output = UNKNOWN if MODE==DESIGN else LOW
+
+    cpdef list build_from_arrays(self, object types, object input_limits=None, object edge_src=None, object edge_dst=None, object edge_pin=None):
+        '''Create a whole netlist in one native pass.
+        gate i has type types[i] and input_limits[i] inputs (None: the defaults, ignored for non logic gates);
+        edge k wires gate edge_src[k] into pin edge_pin[k] of gate edge_dst[k], indices count from 0 in this batch.
+        int32 buffers (array('i'), numpy int32) are read in place, other int sequences are copied once.
+        Nothing is evaluated while wiring; one simulation from the new variables runs at the end.
+        Every gate is listed in objlist as getcomponent does, so saving, copying and deleting see them all.
+        returns the new gates in input order'''
+        cdef const int[::1] kinds = ints(types)
+        cdef const int[::1] limits = None
+        cdef const int[::1] src = None
+        cdef const int[::1] dst = None
+        cdef const int[::1] pin = None
+        cdef Py_ssize_t n = kinds.shape[0], m = 0, i, k
+        cdef int kind, lim, start, slot
+        cdef vector[int] first # first slot of every gate in a flat table of all input slots
+        cdef vector[char] taken
+        cdef CPP_Gate* gate_infolist
+        cdef Gate gt
+        cdef list varlist = []
+        cdef list gates = []
+        self.revision += 1
+        if input_limits is not None:
+            limits = ints(input_limits)
+            if limits.shape[0] != n:
+                raise ValueError('input_limits must have one entry per gate')
+        if edge_src is not None or edge_dst is not None or edge_pin is not None:
+            if edge_src is None or edge_dst is None or edge_pin is None:
+                raise ValueError('edge_src, edge_dst and edge_pin go together')
+            src, dst, pin = ints(edge_src), ints(edge_dst), ints(edge_pin)
+            m = src.shape[0]
+            if dst.shape[0] != m or pin.shape[0] != m:
+                raise ValueError('edge arrays must have the same length')
+        '''check everything before the circuit is touched'''
+        first.resize(n+1)
+        for i in range(n):
+            kind = kinds[i]
+            if kind < 0 or kind >= IC_ID:
+                raise ValueError(f'types[{i}]: {kind} is not a gate type')
+            lim = 1 if kind >= VARIABLE_ID else 2
+            if limits is not None and kind < VARIABLE_ID:
+                lim = limits[i]
+                if lim < 2 or lim > 255:
+                    raise ValueError(f'input_limits[{i}]: {lim} is out of range')
+            first[i+1] = first[i]+lim
+        taken.resize(first[n])
+        for k in range(m):
+            if src[k] < 0 or src[k] >= n or dst[k] < 0 or dst[k] >= n:
+                raise ValueError(f'edge {k} refers to a gate outside the batch')
+            if kinds[dst[k]] == VARIABLE_ID:
+                raise ValueError(f'edge {k} drives a variable')
+            slot = first[dst[k]]+pin[k]
+            if pin[k] < 0 or slot >= first[dst[k]+1]:
+                raise ValueError(f'edge {k}: pin {pin[k]} is out of range')
+            if taken[slot]:
+                raise ValueError(f'edge {k}: pin {pin[k]} of gate {dst[k]} is already wired')
+            taken[slot] = True
+        '''gates, then hitlists and source slots, all still unknown'''
+        start = self.gate_infolist.size()
+        self.reserve(n)
+        for i in range(n):
+            self.gate_infolist.emplace_back(CPP_Gate(kinds[i], first[i+1]-first[i], self.pool))
+            self.gate_verse.grow(first[i+1]-first[i])
+        gate_infolist = self.gate_infolist.data()
+        for k in range(m):
+            gate_infolist[start+src[k]].hitlist.emplace_back(start+dst[k], pin[k], UNKNOWN)
+            self.gate_verse.sources[start+dst[k]][pin[k]] = start+src[k]
+            if kinds[dst[k]] < VARIABLE_ID:
+                gate_infolist[start+dst[k]].book[UNKNOWN] += 1
+        '''list every gate, then settle everything in one go'''
+        for i in range(n):
+            kind = kinds[i]
+            gt = self.gate_verse.get(start+i)
+            self.enlist(gt, kind)
+            gates.append(gt)
+            if kind == VARIABLE_ID:
+                gate_infolist[start+i].output = UNKNOWN
+                varlist.append(start+i)
+        if MODE != DESIGN:
+            self.custom_simulate(varlist)
+        return gates
+
     cpdef object getobj(self, tuple code):
         return self.objlist[code[0]][code[1]]
 
     cpdef void delobj(self, object obj):
         '''Delete object from objlist and mutate info id for removal'''
-        cdef CPP_Gate* gate_info=self.gate_infolist.data()
-        cdef Gate gate
-        cdef IC ic
+        cdef vector[int] locs
+        self.revision += 1
         if obj.id == IC_ID:
-            ic = <IC>obj
-            for gate in ic.outputs+ic.inputs+ic.internal:
-                gate_info[gate.location].type = -gate_info[gate.location].type -1
-                self.hidden+=1
-                gate.id = -gate.id - 1
+            locs = (<IC>obj).locations()
         else:
-            gate = <Gate>obj
-            gate_info[gate.location].type = -gate_info[gate.location].type -1 
-            self.hidden += 1
-            gate.id = -gate.id - 1
+            locs.push_back((<Gate>obj).location)
+        self.entomb(locs)
         self.objlist[obj.code[0]][obj.code[1]] = None
 
+    cdef void entomb(self, vector[int]& locs):
+        '''tombstone every location in one pass'''
+        cdef int loc
+        for loc in locs:
+            self.gate_verse.flip(loc)
+            self.tombstones.push_back(loc)
+        self.hidden += locs.size()
+
     cpdef void renewobj(self, object obj):
         '''Renew object in objlist and revert info id'''
-        cdef CPP_Gate* gate_info=self.gate_infolist.data()
         cdef Gate gate
         cdef IC ic
+        cdef int loc
+        self.revision += 1
         if obj.id == IC_ID:
             ic = <IC>obj
             
-            for gate in ic.outputs+ic.inputs+ic.internal:
-                gate_info[gate.location].type = -gate_info[gate.location].type -1
-                gate.id = -gate.id - 1
+            for loc in ic.locations():
+                self.gate_verse.flip(loc)
                 self.hidden-=1
+                self.unstash(loc)
         else:
             gate = <Gate>obj
-            gate_info[gate.location].type = -gate_info[gate.location].type -1 
-            gate.id = -gate.id - 1
+            self.gate_verse.flip(gate.location)
             self.hidden -= 1
+            self.unstash(gate.location)
         self.objlist[obj.code[0]][obj.code[1]] = obj
 
+    cpdef int collect(self, bint keep=False):
+        '''Drop the profiles that live sources still hold for gates tombstoned since the last call.
+        No gate moves. With keep the profiles are stashed so renewobj can put them back;
+        without it, only collect gates that will never be renewed'''
+        cdef CPP_Gate* gate_infolist=self.gate_infolist.data()
+        cdef Profile* profile
+        cdef Profile* end
+        cdef HitList* hitlist
+        cdef vector[int]* sources
+        cdef int loc,src,i,removed=0
+        for loc in self.tombstones:
+            if gate_infolist[loc].type>=0 or gate_infolist[loc].type==-VARIABLE_ID-1:
+                continue # renewed already / variables have no sources
+            sources=&self.gate_verse.sources[loc]
+            for i in range(sources.size()):
+                src=sources[0][i]
+                if src==-1 or gate_infolist[src].type<0:
+                    continue # dead sources never propagate
+                hitlist=&gate_infolist[src].hitlist
+                profile=hitlist.data()
+                end=profile+hitlist.size()
+                while profile<end:
+                    if profile.target==loc and profile.index==i:
+                        if keep:
+                            self.stash[loc].push_back(pair[int,Profile](src,profile[0]))
+                        profile[0]=(end-1)[0] # swap and pop, the dead target's book stays as it was
+                        hitlist.pop_back()
+                        removed+=1
+                        break
+                    profile+=1
+        self.tombstones.clear()
+        if removed:
+            self.layout += 1
+        return removed
+
+    cdef void unstash(self, int location):
+        '''give back the profiles collect() stashed for a renewed gate'''
+        cdef unordered_map[int, vector[pair[int,Profile]]].iterator it=self.stash.find(location)
+        if it==self.stash.end():
+            return
+        cdef CPP_Gate* gate_infolist=self.gate_infolist.data()
+        cdef vector[int]* sources=&self.gate_verse.sources[location]
+        cdef pair[int,Profile] entry
+        for entry in deref(it).second:
+            if sources[0][entry.second.index]==entry.first: # still wired the same way
+                gate_infolist[entry.first].hitlist.push_back(entry.second)
+        self.stash.erase(it)
+
 
     cpdef list get_components(self):
         '''Get all components in the circuit'''
@@ -130,9 +597,10 @@ cdef class Circuit:
         '''Set the input-size of a gate'''
         cdef CPP_Gate* info = &self.gate_infolist[gate.location]
         cdef int prev = info.output
+        self.revision += 1
         if gate.setlimits(size):
             if prev != info.output:
-                self.propagate(gate.location)
+                self.settle(gate.location)
             return True
         return False
 
@@ -140,9 +608,10 @@ cdef class Circuit:
         '''Connect a gate to another gate'''
         cdef CPP_Gate* info = &self.gate_infolist[target.location]
         cdef int prev = info.output
+        self.revision += 1
         target.connect(source, index)
         if prev != info.output:
-            self.propagate(target.location)
+            self.settle(target.location)
 
     cpdef void toggle(self, int target, int value):
         '''toggles a variable's value'''
@@ -156,11 +625,11 @@ cdef class Circuit:
                 self.sweep(target)
 
     cpdef void batch_toggle(self, list batch):
-        '''toggles multiple variables and sweeps exactly once for performance'''
+        '''toggles multiple variables, then settles them in one wave (one sweep in COMPILE mode)'''
         cdef int target, value
         cdef tuple pair
         cdef CPP_Gate* info
-        cdef bint need_sweep = False
+        cdef vector[int] origins
         cdef int origin=self.gate_infolist.size()
         for pair in batch:
             target = pair[0]
@@ -170,48 +639,78 @@ cdef class Circuit:
                 info.value = value
                 info.output = value if MODE != DESIGN else UNKNOWN
                 if MODE != COMPILE:
-                    self.propagate(target)
-                else:
-                    if origin>target:
-                        origin=target
+                    origins.push_back(target)
+                elif origin>target:
+                    origin=target
         if MODE==COMPILE:
             self.sweep(origin)
+        elif not origins.empty():
+            self.batch_propagate(origins)
 
     cpdef void disconnect(self, Gate target, int index):
         '''Disconnect a gate from another gate'''
         cdef CPP_Gate* info = &self.gate_infolist[target.location]
         cdef int prev = info.output
+        self.revision += 1
         target.disconnect(index)
         if prev != info.output:
-            self.propagate(target.location)
+            self.settle(target.location)
 
     cpdef void hide(self, list gatelist):
-        '''Hide a list of gates'''
+        '''Hide a list of gates, settling every output they drove in one wave'''
         cdef Gate pin
         cdef IC ic
+        cdef vector[int] locs
+        cdef int loc
+        self.revision += 1
         for gate in gatelist:
             if gate.id == IC_ID:
                 ic = <IC>gate
                 ic.hide()
+                for loc in ic.locations():
+                    locs.push_back(loc)
             else:
                 pin = <Gate>gate
                 pin.hide()
-            '''make the gates invisible/ready for removal'''
-            self.delobj(gate)
+                locs.push_back(pin.location)
+            self.objlist[gate.code[0]][gate.code[1]] = None
+        '''make the gates invisible/ready for removal'''
+        self.entomb(locs)
 
+        '''recompute what the gates drove, every changed target seeds the same wave'''
+        self.batching += 1
         for gate in gatelist:
-            '''Turn off the outputs of the gates/ propagates unknown values'''
             if gate.id == IC_ID:
                 ic = <IC>gate
                 for pin in ic.outputs:
-                    self.propagate(pin.location)
+                    self.release(pin.location)
             else:
-                self.propagate((<Gate>gate).location)
+                self.release((<Gate>gate).location)
+        self.batching -= 1
+        if self.batching == 0:
+            self.flush()
+
+    cdef void release(self, int origin):
+        '''recompute the live targets the hidden gate at origin drove and settle those that changed'''
+        cdef CPP_Gate* gate_infolist = self.gate_infolist.data()
+        cdef Profile* profile = gate_infolist[origin].hitlist.data()
+        cdef Profile* end = profile + gate_infolist[origin].hitlist.size()
+        cdef CPP_Gate* target_info
+        cdef int prev
+        while profile != end:
+            target_info = &gate_infolist[profile.target]
+            if target_info.type >= 0:
+                prev = target_info.output
+                process_gate(gate_infolist, self.gate_verse, profile.target)
+                if prev != target_info.output:
+                    self.settle(profile.target)
+            profile += 1
 
     cpdef void reveal(self, list gatelist):
-        '''Reveal a list of gates'''
+        '''Reveal a list of gates, settling them in one wave'''
         cdef Gate pin
         cdef IC ic
+        self.revision += 1
         for gate in reversed(gatelist):
             '''Renew the gates first. reverse order is cruical for proper retrieval'''
             self.renewobj(gate)
@@ -222,166 +721,274 @@ cdef class Circuit:
                 pin = <Gate>gate
                 pin.reveal()
 
+        self.batching += 1
         for gate in reversed(gatelist):
             if gate.id == IC_ID:
                 ic = <IC>gate
                 for pin in ic.outputs:
-                    self.propagate(pin.location)
+                    self.settle(pin.location)
             else:
-                self.propagate((<Gate>gate).location)
+                self.settle((<Gate>gate).location)
+        self.batching -= 1
+        if self.batching == 0:
+            self.flush()
 
     # Result
     cpdef void output(self, Gate gate):
         '''Output the value of a gate'''
         print(f'{gate} output is {gate.getoutput()}')
         
-    cdef bytearray table(self,vector[int] &var,vector[int] &gate):
-        '''Generate a truth table for the circuit'''
-        cdef CPP_Gate* gate_infolist=self.gate_infolist.data()
-        cdef int var_size=var.size()
-        cdef int gate_size=gate.size()
-        cdef int row=1<<var_size,col=var_size+gate_size
-        cdef bytearray matrix=bytearray(row*col)
-        cdef unsigned char[:] view=matrix # just store pointer to matrix
-        cdef int i,j,k,bit
-        cdef int gray = 0
-        cdef int prev_gray = 0
-        cdef int mask, changed_bit, offset
-
-        for i in range(row):
-            '''use gray-code as gray-codes ensure only one change of variable per row'''
-            prev_gray = gray
-            gray = i ^ (i >> 1)
-
-            if i != 0:
-                '''find the changed bit'''
-                mask = prev_gray ^ gray
-
-                if mask == 1: changed_bit = 0
-                elif mask == 2: changed_bit = 1
-                elif mask == 4: changed_bit = 2
-                elif mask == 8: changed_bit = 3
-                elif mask == 16: changed_bit = 4
-                elif mask == 32: changed_bit = 5
-                elif mask == 64: changed_bit = 6
-                elif mask == 128: changed_bit = 7
-                elif mask == 256: changed_bit = 8
-                elif mask == 512: changed_bit = 9
-                elif mask == 1024: changed_bit = 10
-                elif mask == 2048: changed_bit = 11
-                elif mask == 4096: changed_bit = 12
-                elif mask == 8192: changed_bit = 13
-                elif mask == 16384: changed_bit = 14
-                elif mask == 32768: changed_bit = 15
-                else: changed_bit = 0
-
-                j = (var_size - 1) - changed_bit
-                bit = 1 if (gray & mask) else 0
-                gate_infolist[var[j]].output = bit
-                self.propagate(var[j])
-            else:
-                for j in range(var_size):
-                    if gate_infolist[var[j]].output != 0:
-                        gate_infolist[var[j]].output = 0
-                        self.propagate(var[j])
-
-            # Fast C-level list creation instead of .append()
-            offset=col*gray
-            for k in range(var_size):
-                view[offset+k] = gate_infolist[var[k]].output
-            for k in range(gate_size):
-                view[offset+var_size+k] = gate_infolist[gate[k]].output
+    cdef bytearray table(self, vector[int] &var, vector[int] &gate, int workers=1):
+        '''Generate a truth table for the circuit, one byte per cell and rows in input order.
+        With workers the Gray-code walk is split into blocks that threads evaluate on clones of the circuit'''
+        cdef int n = var.size(), width = n
+        cdef Py_ssize_t col = n + gate.size()
+        cdef Py_ssize_t row = (<Py_ssize_t>1) << n
+        cdef Py_ssize_t k
+        cdef bytearray matrix = bytearray(row*col)
+        cdef unsigned char* out = matrix
+        cdef list variables, outputs, twins
+        if workers > 1 and row >= PARALLEL_ROWS:
+            while width > 0 and (1 << (n - width)) < 4*workers:
+                width -= 1
+            variables = [loc for loc in var]
+            outputs = [loc for loc in gate]
+            twins = [self.clone() for k in range(workers)]
+            with ThreadPoolExecutor(workers) as pool:
+                for _ in pool.map(_table_blocks, twins, [variables]*workers, [outputs]*workers,
+                                  range(workers), [workers]*workers, [width]*workers, [matrix]*workers):
+                    pass
+        else:
+            with nogil:
+                self.table_block(var, gate, 0, n, out)
         return matrix
-        
-    cpdef str truthTable(self):
-        variables = self.get_variables()
-        if len(variables) == 0 or len(variables) > 16 or MODE == DESIGN:
-            return ""
-        cdef CPP_Gate* gate_infolist=self.gate_infolist.data()
-        cdef list gate_list = []
-        cdef list var_names, gate_names, all_names, header_parts, final_table_lines, row_parts
-        cdef str header, separator
-        cdef int col_width, bit, gate_type
-        cdef Py_ssize_t i, j, k, n
-        cdef list IN_MAP, OUT_MAP
-        cdef list v_states, g_states
-        cdef Gate var, gate,pin
-        cdef IC ic
-        cdef object item
-        
-        # Filter gatelist
-        for item in self.objlist[OUTPUT_PIN_ID]:
-            if item is not None:
-                gate_list.append(item)
-
 
-        n = len(variables)
-        cdef int rows_count = 1 << n
+    cdef void table_block(self, vector[int] &var, vector[int] &gate, Py_ssize_t block, int width, unsigned char* out) nogil:
+        '''Walk the 2**width Gray codes of block, writing each row at its code minus the block's base.
+        The first code is set directly and settled in one wave, then one variable flips per row'''
+        cdef CPP_Gate* gate_infolist = self.gate_infolist.data()
+        cdef int n = var.size(), m = gate.size(), j, k, bit
+        cdef Py_ssize_t col = n + m
+        cdef Py_ssize_t i = block << width
+        cdef Py_ssize_t last = i + ((<Py_ssize_t>1) << width)
+        cdef Py_ssize_t base = (block ^ (block >> 1)) << width
+        cdef Py_ssize_t gray = i ^ (i >> 1)
+        cdef unsigned char* row
+        cdef vector[int] origins
+        for j in range(n):
+            bit = (gray >> (n - 1 - j)) & 1
+            if gate_infolist[var[j]].output != bit:
+                gate_infolist[var[j]].output = bit
+                origins.push_back(var[j])
+        self.batch_propagate(origins)
+        while True:
+            row = out + (gray - base)*col
+            for k in range(n):
+                row[k] = gate_infolist[var[k]].output
+            for k in range(m):
+                row[n+k] = gate_infolist[gate[k]].output
+            i += 1
+            if i == last:
+                break
+            # gray codes change one variable per row, the lowest set bit of i names it
+            bit = lowest_bit(i)
+            gray ^= (<Py_ssize_t>1) << bit
+            j = n - 1 - bit
+            gate_infolist[var[j]].output = (gray >> bit) & 1
+            self.propagate(var[j])
+
+    def truthTable(self, list variables=None, list outputs=None, *, int workers=1):
+        '''truth table of variables (default: every variable) against outputs (default: the output pins),
+        up to TABLE_INPUTS variables. workers > 1 evaluates large tables on that many threads, each with its own clone()'''
+        cdef object buffer = io.StringIO()
+        self.writeTruthTable(buffer, 'text', variables, outputs, workers=workers)
+        return buffer.getvalue()
+
+    def writeTruthTable(self, object stream, str fmt='text', list variables=None, list outputs=None, *, int workers=1, object limit=None):
+        '''write the truth table to stream as 'text', 'csv' or 'binary' (one byte per cell), returning the row count.
+        Rows are evaluated TABLE_CHUNK rows at a time in input order, so memory stays bounded;
+        limit stops after that many rows and evaluates no chunk past them.
+        workers > 1 builds the whole table on that many threads first, each with its own clone().
+        Chunks are memoized in table_cache against the structural hash, a repeat request only formats'''
+        if fmt not in TABLE_FORMATS:
+            raise ValueError(f"unknown truth table format {fmt!r}")
+        cdef bint picked = variables is not None or outputs is not None
+        cdef vector[int] var_vector
+        cdef vector[int] gate_vector
+        cdef tuple columns = self.table_columns(var_vector, gate_vector, variables, outputs)
+        if columns is None:
+            return 0
+        cdef list gate_list = columns[1]
+        variables = columns[0]
+        cdef int n = len(variables), m = len(gate_list)
+        cdef int width = n if n < TABLE_CHUNK else TABLE_CHUNK
+        cdef Py_ssize_t rows_count = (<Py_ssize_t>1) << n
+        if limit is not None and limit < rows_count:
+            rows_count = max(limit, 0)
+        cdef Py_ssize_t c, count = (rows_count + ((<Py_ssize_t>1) << width) - 1) >> width
+        cdef Py_ssize_t size = ((<Py_ssize_t>1) << width) * (n + m)
+        cdef unsigned long long key = self.column_key(variables, gate_list) if picked else self.structural_hash()
+        cdef list cells, all_reprs, all_colored, chunks
+        cdef int col_width
+        cdef str separator = ""
+        cdef bytearray raw_rows
+        cdef bytes raw
+        cdef bint walked = False
+        cdef bint refocus = self.focused
 
-        cdef CPP_Gate* var_info
         # repr() = plain name (no ANSI) for col_width math and file-safe output.
         # str() = colored name, used only for the printed header cells.
-        var_reprs  = [repr(v) for v in variables]
-        gate_reprs = [repr(v) for v in gate_list]
-        all_reprs  = var_reprs + gate_reprs
-        cdef vector[int] var_vector
-        cdef vector[int] gate_vector
-        for gate in variables:
-            var_vector.push_back((<Gate>gate).location)
-        for gate in gate_list:
-            gate_vector.push_back((<Gate>gate).location)
-        cdef bytearray raw_rows = self.table(var_vector, gate_vector)
-        if len(all_reprs) > 0:
+        all_reprs = [repr(v) for v in variables] + [repr(v) for v in gate_list]
+        if fmt == 'text':
             col_width = max([len(name) for name in all_reprs]) + 2
+            cells = [
+                ["0".center(col_width), "1".center(col_width)],
+                ["F".center(col_width), "T".center(col_width), "X".center(col_width)]
+            ]
+            # Header: colored names padded based on plain-name length.
+            all_colored = [str(v) for v in variables] + [str(v) for v in gate_list]
+            separator = "─" * (col_width * len(all_reprs) + 3 * (len(all_reprs) - 1))
+            stream.write(separator + "\n" + " | ".join([
+                colored.center(col_width + len(colored) - len(plain))
+                for colored, plain in zip(all_colored, all_reprs)
+            ]) + "\n" + separator + "\n")
+        elif fmt == 'csv':
+            cells = [["0", "1"], ["0", "1", "X"]]
+            stream.write(",".join(all_reprs) + "\n")
         else:
-            col_width = 4
-
-        # Pre-compute formatting maps
-        IN_MAP = [
-            "0".center(col_width),
-            "1".center(col_width)
-        ]
-        OUT_MAP = [
-            "F".center(col_width),
-            "T".center(col_width),
-            "X".center(col_width)
-        ]
-
-        # Header: colored names padded based on plain-name length.
-        var_colored  = [str(v) for v in variables]
-        gate_colored = [str(v) for v in gate_list]
-        all_colored  = var_colored + gate_colored
-        header_parts = [
-            colored.center(col_width + len(colored) - len(plain))
-            for colored, plain in zip(all_colored, all_reprs)
-        ]
-        header    = " | ".join(header_parts)
-        separator = "─" * (col_width * len(all_reprs) + 3 * (len(all_reprs) - 1))
+            cells = []
+
+        # after the header, which is colored by the current state
+        if workers > 1 and rows_count == (<Py_ssize_t>1) << n:
+            chunks = [table_cache.get((key, c)) for c in range(count)]
+            if None in chunks:
+                self.scope_table(gate_vector)
+                raw_rows = self.table(var_vector, gate_vector, workers)
+                walked = True
+                chunks = [bytes(raw_rows[c*size:(c+1)*size]) for c in range(count)]
+                for c in range(count):
+                    table_cache.put((key, c), chunks[c])
+            for c in range(count):
+                self.write_rows(stream, fmt, chunks[c], n, m, cells)
+        else:
+            for c in range(count):
+                raw = self.table_chunk(var_vector, gate_vector, key, c, width, &walked)
+                if (c + 1) << width > rows_count: # the limit ends inside this chunk
+                    raw = raw[:(rows_count - (c << width))*(n + m)]
+                self.write_rows(stream, fmt, raw, n, m, cells)
+        if fmt == 'text':
+            stream.write(separator + "\n")
+        if walked: # a fully cached table leaves the circuit alone
+            self.settle_table(refocus, MODE)
+        return rows_count
+
+    cdef bytes table_chunk(self, vector[int] &var, vector[int] &gate, unsigned long long key, Py_ssize_t chunk, int width, bint* walked):
+        '''rows of chunk from the table cache, evaluated and stored on a miss, which also sets walked'''
+        cdef bytes raw = table_cache.get((key, chunk))
+        if raw is not None:
+            return raw
+        cdef bytearray raw_rows = bytearray(((<Py_ssize_t>1) << width) * (var.size() + gate.size()))
+        cdef unsigned char* out = raw_rows
+        if not walked[0]:
+            self.scope_table(gate)
+        with nogil:
+            self.table_block(var, gate, gray_block(chunk), width, out)
+        walked[0] = True
+        raw = bytes(raw_rows)
+        table_cache.put((key, chunk), raw)
+        return raw
+
+    cdef tuple table_columns(self, vector[int] &var, vector[int] &gate, list variables=None, list outputs=None):
+        '''(variables, outputs) of the truth table with their locations pushed onto var and gate,
+        every variable and every output pin unless given; None when there is no table to build'''
+        if variables is None:
+            variables = self.get_variables()
+        if len(variables) == 0 or len(variables) > TABLE_INPUTS or MODE == DESIGN:
+            return None
+        cdef list gate_list = [item for item in self.objlist[OUTPUT_PIN_ID] if item is not None] if outputs is None else outputs
+        cdef Gate item
+        for item in variables:
+            var.push_back(item.location)
+        for item in gate_list:
+            gate.push_back(item.location)
+        return variables, gate_list
+
+    cpdef bytes truthRows(self, Py_ssize_t chunk):
+        '''rows chunk<<TABLE_CHUNK onwards of the truth table, one byte per cell in input order.
+        Lets a view pull a large table a chunk at a time, the circuit is settled back after a cache miss'''
+        cdef vector[int] var_vector
+        cdef vector[int] gate_vector
+        if self.table_columns(var_vector, gate_vector) is None:
+            return b""
+        cdef int n = var_vector.size()
+        cdef int width = n if n < TABLE_CHUNK else TABLE_CHUNK
+        if chunk < 0 or chunk >= (<Py_ssize_t>1) << (n - width):
+            raise IndexError(f"truth table has no chunk {chunk}")
+        cdef bint walked = False, refocus = self.focused
+        cdef bytes raw = self.table_chunk(var_vector, gate_vector, self.structural_hash(), chunk, width, &walked)
+        if walked:
+            self.settle_table(refocus, MODE)
+        return raw
+
+    cdef void scope_table(self, vector[int] &gate):
+        '''the walk only reads the output pins, so it evaluates their cone alone'''
+        self.unfocus()
+        self.mark_cone(gate)
+
+    cdef void settle_table(self, bint refocus, int mode):
+        '''reset and simulate after a walk, under the focus the circuit had before it'''
         self.visual_queue_clear()
-        cdef int mode=MODE
+        self.clear_cone()
         self.reset()
+        if refocus:
+            self.mark_cone(self.watched)
         self.simulate(mode)
 
-        # --- STRING JOINING PHASE ---
-        final_table_lines = [separator, header, separator]
-        cdef int total=len(variables)+len(gate_list)
-
-        for i in range(rows_count):
-            row_parts = [IN_MAP[raw_rows[i*total+j]] for j in range(n)]
-            row_parts.extend([OUT_MAP[raw_rows[i*total+n+j]] for j in range(len(gate_list))])
-            final_table_lines.append(" | ".join(row_parts))
+    cdef void write_rows(self, object stream, str fmt, bytes raw_rows, int n, int m, list cells):
+        '''format the rows of raw_rows, one byte per cell, onto stream'''
+        if fmt == 'binary':
+            stream.write(raw_rows)
+            return
+        cdef list IN_MAP = cells[0], OUT_MAP = cells[1], lines = []
+        cdef str glue = " | " if fmt == 'text' else ","
+        cdef const unsigned char* raw = raw_rows
+        cdef Py_ssize_t col = n + m, i, j
+        cdef Py_ssize_t rows = len(raw_rows) // col
+        cdef list row_parts
+        for i in range(rows):
+            row_parts = [IN_MAP[raw[i*col+j]] for j in range(n)]
+            row_parts.extend([OUT_MAP[raw[i*col+n+j]] for j in range(m)])
+            lines.append(glue.join(row_parts))
+        lines.append("")
+        stream.write("\n".join(lines))
+
+    cpdef tuple diagnose_row(self, Gate comp):
+        '''(component, sources, book, targets, output) cells of comp's diagnosis, plain and untruncated'''
+        cdef CPP_Gate* info = &self.gate_infolist[comp.location]
+        cdef Profile* profile
+        cdef Profile* end
+        # repr() for source/target names keeps column widths intact.
+        if isinstance(comp._sources, list):
+            ch = [f"[{i}]:{repr(self.gate_verse.get(c))}" for i, c in enumerate(comp._sources) if c != -1]
+            ch_str = ", ".join(ch) if ch else "None"
+        else:
+            ch_str = f"val:{comp._sources}"
 
-        final_table_lines.append(separator)
-        final_table_lines.append("")
+        book = f"[{info.book[0]},{info.book[1]},{info.book[2]}]"
 
-        return "\n".join(final_table_lines)
+        # Targets from info.hitlist — repr() only, no colors in auxiliary columns.
+        tgt = []
+        profile = info.hitlist.data()
+        end = profile + info.hitlist.size()
+        while profile < end:
+            tgt.append(repr(self.gate_verse.get(profile.target)))
+            profile += 1
+        tgt_str = ", ".join(tgt) if tgt else "None"
+        return repr(comp), ch_str, book, tgt_str, comp.getoutput()
 
     def diagnose(self):
         '''Diagnose the circuit'''
         cdef Gate comp
-        cdef CPP_Gate* info
-        cdef Profile* profile
-        cdef Profile* end
         cdef list ics
         print("=" * 90)
         print(" " * 35 + "CIRCUIT DIAGNOSIS")
@@ -403,25 +1010,7 @@ cdef class Circuit:
             print("-" * total_width)
 
             for comp in gates:
-                info = &self.gate_infolist[comp.location]
-                # repr() for source/target names keeps column widths intact.
-                if isinstance(comp._sources, list):
-                    ch = [f"[{i}]:{repr(<Gate>PyList_GET_ITEM(self.gate_verse, c))}" for i, c in enumerate(comp._sources) if c != -1]
-                    ch_str = ", ".join(ch) if ch else "None"
-                else:
-                    ch_str = f"val:{comp._sources}"
-
-                book = f"[{info.book[0]},{info.book[1]},{info.book[2]}]"
-
-                # Targets from info.hitlist — repr() only, no colors in auxiliary columns.
-                tgt = []
-                profile = info.hitlist.data()
-                end = profile + info.hitlist.size()
-                while profile < end:
-                    tgt.append(repr(<Gate>PyList_GET_ITEM(self.gate_verse, profile.target)))
-                    profile += 1
-                tgt_str = ", ".join(tgt) if tgt else "None"
-
+                _, ch_str, book, tgt_str, _ = self.diagnose_row(comp)
                 ch_str  = ch_str[:26]  + ".." if len(ch_str)  > 28 else ch_str
                 tgt_str = tgt_str[:23] + ".." if len(tgt_str) > 25 else tgt_str
 
@@ -447,17 +1036,143 @@ cdef class Circuit:
                 if ic.inputs:
                     print("  INPUT PINS:")
                     for pin in ic.inputs:
-                        ch = [repr(<Gate>PyList_GET_ITEM(self.gate_verse, c)) for c in pin._sources if c != -1] if isinstance(pin._sources, list) else [f"val:{pin._sources}"]
+                        ch = [repr(self.gate_verse.get(c)) for c in pin._sources if c != -1] if isinstance(pin._sources, list) else [f"val:{pin._sources}"]
                         print(f"    {str(pin)}: out={pin.getoutput()}, from={', '.join(ch) if ch else 'None'}")
 
                 if ic.outputs:
                     print("  OUTPUT PINS:")
                     for pin in ic.outputs:
-                        ch = [repr(<Gate>PyList_GET_ITEM(self.gate_verse, c)) for c in pin._sources if c != -1] if isinstance(pin._sources, list) else [f"val:{pin._sources}"]
+                        ch = [repr(self.gate_verse.get(c)) for c in pin._sources if c != -1] if isinstance(pin._sources, list) else [f"val:{pin._sources}"]
                         print(f"    {str(pin)}: out={pin.getoutput()}, from={', '.join(ch) if ch else 'None'}")
 
         print("\n" + "=" * 90)
 
+    cpdef unsigned long long structural_hash(self, list selection=None):
+        '''hash of the gate types, input limits and wiring of selection (the whole circuit when None),
+        independent of locations. Variables and pins count by rank, ICs by their own pin order.
+        The whole-circuit hash is kept until the next edit through the circuit'''
+        cdef vector[int] locs, rank, ranks
+        cdef Py_ssize_t size = self.gate_infolist.size(), loc
+        cdef CPP_Gate* gate_infolist = self.gate_infolist.data()
+        cdef IC ic
+        cdef unsigned long long value
+        if selection is None and self.hashed_revision == self.revision:
+            return self.hashed
+        rank.resize(size, -1)
+        if selection is None:
+            self.rank_gates([gate for kind in (VARIABLE_ID, INPUT_PIN_ID, OUTPUT_PIN_ID, IC_ID) for gate in self.objlist[kind] if gate is not None], rank)
+            for loc in range(size):
+                if gate_infolist[loc].type >= 0:
+                    locs.push_back(loc)
+        else:
+            self.rank_gates(selection, rank)
+            for item in selection:
+                if item.id == IC_ID:
+                    ic = <IC>item
+                    for loc in ic.locations():
+                        locs.push_back(loc)
+                else:
+                    locs.push_back((<Gate>item).location)
+        for loc in locs:
+            ranks.push_back(rank[loc])
+        with nogil:
+            value = self.structure(locs, ranks)
+        if selection is None:
+            self.hashed = value
+            self.hashed_revision = self.revision
+        return value
+
+    cdef unsigned long long column_key(self, list variables, list outputs):
+        '''table cache key of hand-picked columns: the structural hash followed by the refined label
+        of every picked gate, so it depends on structure and never on locations or objlist slots'''
+        cdef vector[int] locs, rank, ranks, index
+        cdef vector[unsigned long long] labels
+        cdef Py_ssize_t size = self.gate_infolist.size(), loc, i
+        cdef CPP_Gate* gate_infolist = self.gate_infolist.data()
+        cdef unsigned long long key = self.structural_hash()
+        cdef Gate gate
+        rank.resize(size, -1)
+        index.resize(size, -1)
+        self.rank_gates([gate for kind in (VARIABLE_ID, INPUT_PIN_ID, OUTPUT_PIN_ID, IC_ID) for gate in self.objlist[kind] if gate is not None], rank)
+        for loc in range(size):
+            if gate_infolist[loc].type >= 0:
+                index[loc] = locs.size()
+                locs.push_back(loc)
+                ranks.push_back(rank[loc])
+        with nogil:
+            self.structure(locs, ranks, &labels)
+        for group in (variables, outputs):
+            key = mix(key, len(group))
+            for gate in group:
+                i = index[gate.location]
+                key = mix(key, labels[i] if i != -1 else OPEN_PIN)
+        return key
+
+    cdef void rank_gates(self, list gates, vector[int]& rank):
+        '''rank the variables and pins of gates by kind in list order, each IC ranks its own pins'''
+        cdef int counts[TOTAL]
+        cdef IC ic
+        cdef int kind
+        for kind in range(TOTAL):
+            counts[kind] = 0
+        for gate in gates:
+            kind = gate.id
+            if kind == IC_ID:
+                ic = <IC>gate
+                self.rank_gates(ic.inputs, rank)
+                self.rank_gates(ic.outputs, rank)
+                self.rank_gates(ic.nested, rank)
+            elif kind == VARIABLE_ID or kind == INPUT_PIN_ID or kind == OUTPUT_PIN_ID:
+                rank[(<Gate>gate).location] = counts[kind]
+                counts[kind] += 1
+
+    cdef unsigned long long structure(self, vector[int]& locs, vector[int]& rank, vector[unsigned long long]* labels=NULL) nogil:
+        '''colour refinement over the gates at locs: every round folds the labels of a gate's sources
+        and targets into its own, until the number of distinct labels stops growing.
+        Every gate here is symmetric in its inputs, so sources and targets are summed, not ordered.
+        labels, when given, receives the final label of every gate in locs order'''
+        cdef CPP_Gate* gate_infolist = self.gate_infolist.data()
+        cdef vector[vector[int]]* sources = &self.gate_verse.sources
+        cdef Py_ssize_t n = locs.size(), i, j, classes, grown
+        cdef int loc, src, r
+        cdef vector[int] member
+        cdef vector[unsigned long long] label, refined
+        cdef unsigned long long up, down, total = 0
+        cdef Profile* profile
+        cdef Profile* end
+        member.resize(self.gate_infolist.size(), -1)
+        label.resize(n)
+        for i in range(n):
+            member[locs[i]] = i
+            label[i] = mix(mix(gate_infolist[locs[i]].type, gate_infolist[locs[i]].inputlimit), rank[i] + 1)
+        classes = distinct(label)
+        for r in range(HASH_ROUNDS):
+            refined.resize(n)
+            for i in range(n):
+                loc = locs[i]
+                up = 0
+                for src in sources[0][loc]:
+                    up += splitmix(label[member[src]] if src != -1 and member[src] != -1 else OPEN_PIN)
+                down = 0
+                profile = gate_infolist[loc].hitlist.data()
+                end = profile + gate_infolist[loc].hitlist.size()
+                while profile < end:
+                    j = member[profile.target]
+                    if j != -1:
+                        down += splitmix(label[j])
+                    profile += 1
+                refined[i] = mix(mix(label[i], up), down)
+            label.swap(refined)
+            grown = distinct(label)
+            if grown == classes:
+                break
+            classes = grown
+        for i in range(n):
+            total += splitmix(label[i])
+        if labels != NULL:
+            labels.swap(label)
+        return mix(n, total)
+
     cpdef void writetojson(self, str location):
         '''Write the circuit's entire info to a json file'''
         cdef list circuit = []
@@ -467,25 +1182,101 @@ cdef class Circuit:
         with open(location, 'wb') as file:
             file.write(orjson.dumps(circuit))
 
-    cpdef void refresh(self):
-        '''purge unused gates from end of the gate list'''
-        self.optimize() # puts hidden gates to the end
+    cpdef object refresh(self):
+        '''purge unused gates from end of the gate list
+        returns the old->new location map of optimize, with -1 for purged gates'''
+        cdef array.array relocation = self.optimize() # puts hidden gates to the end
         cdef int n=self.gate_infolist.size()
+        cdef int size=n, i
         cdef CPP_Gate* gate_infolist=self.gate_infolist.data()
         while n>0 and gate_infolist[n-1].type<0:
-            self.gate_verse.pop()
             self.gate_infolist.pop_back()
             n-=1
+        self.hidden-=size-n
+        if n<size:
+            self.gate_verse.truncate(n)
+            for i in range(size):
+                if relocation.data.as_ints[i]>=n:
+                    relocation.data.as_ints[i]=-1
+            self.remap_pending(NULL, n)
+            for ic in self.ics:
+                (<IC>ic).relocate(NULL, n)
+        return relocation
+
+    cdef void remap_pending(self, const int* hash_map, int limit) nogil:
+        '''move pending visual/timed work and collect() bookkeeping to new locations
+        (NULL keeps them) and drop entries at or beyond limit'''
+        cdef deque[int] visual
+        cdef vector[Task] tasks
+        cdef Task task
+        cdef int loc
+        cdef vector[int] tombstones
+        cdef unordered_map[int, vector[pair[int,Profile]]] stash
+        cdef pair[int, vector[pair[int,Profile]]] bucket
+        cdef pair[int,Profile] entry
+        cdef unordered_map[int, vector[pair[int,Profile]]].iterator it
+        cdef vector[pair[int,Profile]]* entries
+        cdef size_t i, kept
+        while not self.visual_queue.empty():
+            loc=self.visual_queue.front()
+            self.visual_queue.pop_front()
+            if hash_map!=NULL: loc=hash_map[loc]
+            if loc<limit: visual.push_back(loc)
+        self.visual_queue.swap(visual)
+        while not self.time_queue.empty():
+            task=self.time_queue.top()
+            self.time_queue.pop()
+            if hash_map!=NULL:
+                task.gate_loc=hash_map[task.gate_loc]
+                task.location=hash_map[task.location]
+            if task.gate_loc<limit: tasks.push_back(task)
+        for task in tasks:
+            self.time_queue.push(task)
+        for loc in self.tombstones:
+            if hash_map!=NULL: loc=hash_map[loc]
+            if loc<limit: tombstones.push_back(loc)
+        self.tombstones.swap(tombstones)
+        tombstones.clear()
+        for loc in self.pending:
+            if hash_map!=NULL: loc=hash_map[loc]
+            if loc<limit: tombstones.push_back(loc)
+        self.pending.swap(tombstones)
+        # in place, only buckets whose dead target moved change keys
+        it=self.stash.begin()
+        while it!=self.stash.end():
+            loc=deref(it).first
+            if hash_map!=NULL: loc=hash_map[loc]
+            if loc>=limit:
+                it=self.stash.erase(it)
+                continue
+            entries=&deref(it).second
+            kept=0
+            for i in range(entries.size()):
+                entry=entries[0][i]
+                if hash_map!=NULL:
+                    entry.first=hash_map[entry.first]
+                    entry.second.target=loc
+                if entry.first<limit:
+                    entries[0][kept]=entry
+                    kept+=1
+            entries.resize(kept)
+            if loc!=deref(it).first:
+                stash[loc].swap(entries[0])
+                it=self.stash.erase(it)
+            else:
+                inc(it)
+        for bucket in stash:
+            self.stash[bucket.first].swap(bucket.second)
 
-
-    cpdef void optimize(self):
+    cpdef object optimize(self):
         '''Optimize the circuit using topological sort so prefetcher never has to look back. 
-        Also pushes back hidden gates with mutated info type'''
+        Also pushes back hidden gates with mutated info type
+        returns the old->new location map as an int array'''
         self.copydata.clear()
         cdef int i=0,j=0,n
-        cdef vector[int] hash_map,in_degree,hidden,serial
+        cdef vector[int] hash_map,in_degree,hidden,serial,rest
         cdef Profile* profile, *end
-        cdef int degree=0,index=0,active_gates=0
+        cdef int degree=0,index=0,active_gates=0,cone=0
         cdef CPP_Gate* info
         cdef vector[CPP_Gate] new_gate_infolist
         cdef CPP_Gate* gate_infolist=self.gate_infolist.data()
@@ -560,16 +1351,33 @@ cdef class Circuit:
                         profile+=1
             elif in_degree[node]>1:
                 backup.push_back(node)
-        
+
+        if self.focused:
+            # the focused cone goes first in its own order, its gates only read from the cone,
+            # so sweep can stop at cone_end; the idle gates follow in theirs
+            for i in range(j):
+                node=serial[i]
+                if gate_infolist[node].idle:
+                    rest.push_back(node)
+                else:
+                    hash_map[node]=cone
+                    serial[cone]=node
+                    cone+=1
+            self.cone_end=cone
+            for node in rest:
+                hash_map[node]=cone
+                serial[cone]=node
+                cone+=1
+
         # i is location of each hidden gate, it will be pushed to the end of queue
         for i in hidden:
             hash_map[i]=j
-            serial[j]=node
+            serial[j]=i
             j+=1
         # create new info_list
         new_gate_infolist.resize(n)
         for i in range(n):
-            new_gate_infolist[i]=gate_infolist[serial[i]]
+            new_gate_infolist[i]=move(gate_infolist[serial[i]]) # hitlist blocks change hands, no copy
             profile=new_gate_infolist[i].hitlist.data()
             end=profile+new_gate_infolist[i].hitlist.size()
             while profile<end:
@@ -580,19 +1388,514 @@ cdef class Circuit:
                 sort(new_gate_infolist[i].hitlist.begin(), new_gate_infolist[i].hitlist.end())
                 
         self.gate_infolist.swap(new_gate_infolist)
-        cdef list new_gate_verse = []
+        self.gate_verse.permute(serial.data(), hash_map.data(), n) # sources, wrappers and their locations
+        for ic in self.ics:
+            (<IC>ic).relocate(hash_map.data(), n)
+        self.remap_pending(hash_map.data(), n)
+        for i in range(self.watched.size()):
+            self.watched[i]=hash_map[self.watched[i]]
+        cdef array.array relocation = array.clone(INT_ARRAY, n, False)
+        for i in range(n):
+            relocation.data.as_ints[i]=hash_map[i]
+        self.settled_jump=self.average_jump()
+        self.advise()
+        self.layout+=1
+        return relocation
+
+    cdef double average_jump(self) nogil:
+        '''mean |target - source| over every live connection'''
+        cdef CPP_Gate* gate_infolist=self.gate_infolist.data()
+        cdef Profile* profile
+        cdef Profile* end
+        cdef int i,n=self.gate_infolist.size()
+        cdef long long total=0,edges=0
+        for i in range(n):
+            if gate_infolist[i].type<0: continue
+            profile=gate_infolist[i].hitlist.data()
+            end=profile+gate_infolist[i].hitlist.size()
+            while profile<end:
+                if gate_infolist[profile.target].type>=0:
+                    total+=abs(profile.target-i)
+                    edges+=1
+                profile+=1
+        return <double>total/edges if edges else 0
+
+    cpdef double fragmentation(self):
+        '''score = share of hidden gates stuck between live ones
+        + share of the average jump distance gained since the last optimize.
+        A layout never optimized takes its first measured jump as the baseline, so it starts at 0'''
+        cdef int i,n=self.gate_infolist.size()
+        cdef int live=n-self.hidden,buried=0
+        cdef double jump,drift=0
+        if n==0: return 0
+        for i in range(live):
+            if self.gate_infolist[i].type<0:
+                buried+=1
+        jump=self.average_jump()
+        if self.settled_jump<0:
+            self.settled_jump=jump
+        if jump>self.settled_jump:
+            drift=(jump-self.settled_jump)/jump
+        return <double>buried/n+drift
+
+    cpdef object defragment(self, bint force=False, int limit=DEFRAG_SLICE):
+        '''one bounded step of re-packing when idle (no timed work pending) and fragmented past frag_threshold.
+        A circuit of at most limit gates is optimized whole; a larger one only swaps up to limit live gates
+        from its tail with the tombstones buried lowest, so one call never moves more than limit gates
+        and an idle loop calls again until nothing moves. force optimizes whole at any size.
+        returns the moves as flat old, new location pairs, empty when nothing moved'''
+        cdef array.array relocation, moves
+        cdef int i, j=0, n=self.gate_infolist.size()
+        if not self.time_queue.empty() or not (force or self.fragmentation()>=self.frag_threshold):
+            return array.clone(INT_ARRAY, 0, False)
+        if not force and n>limit:
+            if self.focused:
+                return array.clone(INT_ARRAY, 0, False) # swaps would break the cone-first layout
+            return self.compact(limit)
+        relocation=self.optimize()
+        for i in range(n):
+            if relocation.data.as_ints[i]!=i: j+=1
+        moves=array.clone(INT_ARRAY, 2*j, False)
+        j=0
+        for i in range(n):
+            if relocation.data.as_ints[i]!=i:
+                moves.data.as_ints[j]=i
+                moves.data.as_ints[j+1]=relocation.data.as_ints[i]
+                j+=2
+        return moves
+
+    cdef object compact(self, int limit):
+        '''swap up to limit live gates from the tail with the tombstones buried lowest.
+        Nothing is sorted or reallocated: the wires are rewritten in one pass over the hitlists and sources,
+        about what fragmentation() costs. returns the moves as old, new pairs'''
+        cdef CPP_Gate* gate_infolist=self.gate_infolist.data()
+        cdef int n=self.gate_infolist.size()
+        cdef int live=n-self.hidden, hole=0, tail=n-1, i, j
+        cdef vector[int] holes, movers, hash_map
+        cdef Profile* profile
+        cdef Profile* end
+        cdef vector[int]* sources
+        cdef CPP_Gate spare
+        while <int>holes.size()<limit:
+            while hole<live and gate_infolist[hole].type>=0:
+                hole+=1
+            if hole>=live:
+                break
+            while gate_infolist[tail].type<0: # as many live gates sit past live as tombstones before it
+                tail-=1
+            holes.push_back(hole)
+            movers.push_back(tail)
+            hole+=1
+            tail-=1
+        cdef array.array moves=array.clone(INT_ARRAY, 4*holes.size(), False)
+        if holes.empty():
+            return moves
+        hash_map.resize(n)
+        for i in range(n):
+            hash_map[i]=i
+        for i in range(holes.size()):
+            hash_map[holes[i]]=movers[i]
+            hash_map[movers[i]]=holes[i]
+        for i in range(n):
+            profile=gate_infolist[i].hitlist.data()
+            end=profile+gate_infolist[i].hitlist.size()
+            while profile<end:
+                profile.target=hash_map[profile.target]
+                profile+=1
+            sources=&self.gate_verse.sources[i]
+            for j in range(sources.size()):
+                if sources[0][j]!=-1:
+                    sources[0][j]=hash_map[sources[0][j]]
+        for i in range(holes.size()):
+            hole=holes[i]
+            tail=movers[i]
+            spare=move(gate_infolist[hole]) # hitlist blocks change hands, no copy
+            gate_infolist[hole]=move(gate_infolist[tail])
+            gate_infolist[tail]=move(spare)
+            self.gate_verse.swap(hole, tail)
+            moves.data.as_ints[4*i]=tail
+            moves.data.as_ints[4*i+1]=hole
+            moves.data.as_ints[4*i+2]=hole
+            moves.data.as_ints[4*i+3]=tail
+        for ic in self.ics:
+            (<IC>ic).relocate(hash_map.data(), n)
+        self.remap_pending(hash_map.data(), n)
+        for i in range(self.watched.size()):
+            self.watched[i]=hash_map[self.watched[i]]
+        self.copydata.clear()
+        self.layout+=1
+        return moves
+
+    cpdef int focus(self, list gates=None, bint compact=False):
+        '''evaluate only the fan-in cone of gates (by default every probe and output pin, an IC stands for its outputs),
+        the gates outside it keep their last state and are no longer visited.
+        compact also optimizes, which lays the cone out contiguously at the front.
+        returns the size of the cone; edits made while focused need a new focus()'''
+        cdef object item
+        cdef Gate pin
+        if self.focused:
+            self.unfocus() # the new cone may reach gates the old one left stale
+        if gates is None:
+            gates = [item for item in self.objlist[PROBE_ID] + self.objlist[OUTPUT_PIN_ID] if item is not None]
+        self.watched.clear()
+        for item in gates:
+            if item.id == IC_ID:
+                for pin in (<IC>item).outputs:
+                    self.watched.push_back(pin.location)
+            else:
+                self.watched.push_back((<Gate>item).location)
+        cdef int cone = self.mark_cone(self.watched)
+        if compact:
+            self.optimize()
+        return cone
+
+    cpdef void unfocus(self):
+        '''evaluate every gate again. Sources that changed while their targets were idle
+        settle them in one wave, clock variables catch up on their next tick'''
+        if not self.focused:
+            return
+        cdef CPP_Gate* gate_infolist = self.gate_infolist.data()
+        cdef CPP_Gate* info
+        cdef Profile* profile
+        cdef Profile* end
+        cdef vector[int] origins
+        cdef int loc, n = self.gate_infolist.size()
+        for loc in range(n):
+            info = &gate_infolist[loc]
+            if info.type < 0 or info.inputlimit == 0:
+                continue
+            profile = info.hitlist.data()
+            end = profile + info.hitlist.size()
+            while profile != end:
+                if gate_infolist[profile.target].idle and profile.output != info.output:
+                    origins.push_back(loc)
+                    break
+                profile += 1
+        self.clear_cone()
+        self.batch_propagate(origins)
+
+    cdef int mark_cone(self, vector[int]& watched):
+        '''turn every gate idle but the fan-in cone of watched, returns the cone size'''
+        cdef CPP_Gate* gate_infolist = self.gate_infolist.data()
+        cdef int n = self.gate_infolist.size(), loc, source, i, cone = 0
+        cdef vector[int]* slots
+        cdef vector[int] stack
+        for loc in range(n):
+            gate_infolist[loc].idle = True
+        for loc in watched:
+            if gate_infolist[loc].idle:
+                gate_infolist[loc].idle = False
+                stack.push_back(loc)
+        self.cone_end = 0
+        while not stack.empty():
+            loc = stack.back()
+            stack.pop_back()
+            cone += 1
+            if loc >= self.cone_end:
+                self.cone_end = loc + 1
+            slots = &self.gate_verse.sources[loc]
+            for i in range(slots.size()):
+                source = deref(slots)[i]
+                if source >= 0 and gate_infolist[source].idle:
+                    gate_infolist[source].idle = False
+                    stack.push_back(source)
+        self.focused = True
+        return cone
+
+    cdef void clear_cone(self) nogil:
+        '''every gate is evaluated again, without settling anything'''
+        cdef CPP_Gate* info = self.gate_infolist.data()
+        cdef CPP_Gate* end = info + self.gate_infolist.size()
+        while info != end:
+            info.idle = False
+            info += 1
+        self.focused = False
+
+    cpdef object compile(self):
+        '''read-only Netlist of the live gates for evaluate(), topologically ordered.
+        It copies what it needs, so later edits and simulation never reach it'''
+        cdef Netlist net = Netlist()
+        cdef CPP_Gate* gate_infolist = self.gate_infolist.data()
+        cdef int n = self.gate_infolist.size(), i, j, node, source
+        cdef vector[int] in_degree, order
+        cdef deque[int] queue
+        cdef Profile* profile
+        cdef Profile* end
+        cdef vector[int]* slots
+        cdef Gate item
+        in_degree.resize(n)
+        net.index.assign(n, -1)
+        for i in range(n):
+            if gate_infolist[i].type < 0:
+                continue
+            profile = gate_infolist[i].hitlist.data()
+            end = profile + gate_infolist[i].hitlist.size()
+            while profile != end:
+                if gate_infolist[profile.target].type >= 0:
+                    in_degree[profile.target] += 1
+                profile += 1
+        for i in range(n):
+            if gate_infolist[i].type >= 0 and in_degree[i] == 0:
+                queue.push_back(i)
+        while not queue.empty():
+            node = queue.front()
+            queue.pop_front()
+            net.index[node] = order.size()
+            order.push_back(node)
+            profile = gate_infolist[node].hitlist.data()
+            end = profile + gate_infolist[node].hitlist.size()
+            while profile != end:
+                if gate_infolist[profile.target].type >= 0:
+                    in_degree[profile.target] -= 1
+                    if in_degree[profile.target] == 0:
+                        queue.push_back(profile.target)
+                profile += 1
+        # whatever feedback kept from the order follows in location order
+        for i in range(n):
+            if gate_infolist[i].type >= 0 and net.index[i] < 0:
+                net.cyclic = True
+                net.index[i] = order.size()
+                order.push_back(i)
+        net.size = order.size()
+        net.starts.push_back(0)
+        for node in order:
+            net.types.push_back(gate_infolist[node].type)
+            net.limits.push_back(gate_infolist[node].inputlimit)
+            slots = &self.gate_verse.sources[node]
+            for j in range(<int>slots.size()):
+                source = deref(slots)[j]
+                if source >= 0 and gate_infolist[source].type >= 0:
+                    net.sources.push_back(net.index[source])
+            net.starts.push_back(net.sources.size())
+        for item in self.get_variables():
+            net.inputs.push_back(net.index[item.location])
+        for item in self.objlist[OUTPUT_PIN_ID]:
+            if item is not None:
+                net.outputs.push_back(net.index[item.location])
+        return net
+
+    cpdef list symbolic(self, BDD bdd, list outputs=None):
+        '''BDD nodes of the output pins (or of the gates in outputs) as functions of the variables,
+        variable i of bdd being the i-th of get_variables(). One pass over the compiled netlist
+        with the rules of Gate.process(), so tables wider than TABLE_INPUTS can be read,
+        counted and compared through bdd'''
+        cdef Netlist net = self.compile()
+        if net.cyclic:
+            raise ValueError("feedback loops have no BDD")
+        if <int>net.inputs.size() > bdd.variables:
+            raise ValueError(f"the circuit has {net.inputs.size()} variables, the BDD {bdd.variables}")
+        cdef vector[int] functions
+        cdef int i, j, end, gate_type, acc
+        cdef object item
+        functions.assign(net.size, UNKNOWN)
+        for i in range(<int>net.inputs.size()):
+            functions[net.inputs[i]] = bdd.var(i)
+        for i in range(net.size):
+            gate_type = net.types[i]
+            if gate_type == VARIABLE_ID:
+                continue
+            j = net.starts[i]
+            end = net.starts[i+1]
+            if gate_type > VARIABLE_ID:
+                acc = UNKNOWN if j == end else functions[net.sources[j]]
+                if gate_type == NOT_ID:
+                    acc = bdd.negate(acc)
+            elif end - j < net.limits[i]:
+                acc = UNKNOWN # an open input keeps the gate unknown
+            else:
+                acc = UNKNOWN
+                while j < end:
+                    acc = bdd.apply(gate_type & ~1, acc, functions[net.sources[j]])
+                    j += 1
+                if gate_type & 1:
+                    acc = bdd.negate(acc)
+            functions[i] = acc
+        cdef vector[int] picks
+        cdef Py_ssize_t loc
+        if outputs is None:
+            picks = net.outputs
+        else:
+            for item in outputs:
+                loc = (<Gate>item).location
+                if loc < 0 or loc >= <Py_ssize_t>net.index.size() or net.index[loc] < 0:
+                    raise IndexError(f"{item} is not a live gate of this circuit")
+                picks.push_back(net.index[loc])
+        return [functions[i] for i in picks]
+
+    cpdef object snapshot(self):
+        '''copy the simulation state into a Snapshot that restore() puts back in one pass,
+        any number of snapshots of the same structure can be kept'''
+        cdef Snapshot snap = Snapshot()
+        cdef CPP_Gate* gate_infolist = self.gate_infolist.data()
+        cdef CPP_Gate* info
+        cdef GateState* state
+        cdef Profile* profile
+        cdef Profile* end
+        cdef Py_ssize_t i, n = self.gate_infolist.size(), edges = 0
+        snap.circuit = self
+        snap.revision = self.revision
+        snap.layout = self.layout
+        snap.mode = MODE
+        snap.clock = self.Global_Clock
+        snap.time_queue = self.time_queue
+        for i in range(n):
+            edges += gate_infolist[i].hitlist.size()
+        snap.gates.resize(n)
+        snap.profiles.resize(edges)
+        cdef uint8_t* outputs = snap.profiles.data()
+        with nogil:
+            state = snap.gates.data()
+            for i in range(n):
+                info = &gate_infolist[i]
+                state.output = info.output
+                state.value = info.value
+                state.scheduled = info.scheduled
+                memcpy(state.book, info.book, 3)
+                state += 1
+                profile = info.hitlist.data()
+                end = profile + info.hitlist.size()
+                while profile != end:
+                    outputs[0] = profile.output
+                    outputs += 1
+                    profile += 1
+        return snap
+
+    cpdef void restore(self, object snap):
+        '''put back the state snapshot() took, without propagating anything.
+        Observed gates whose output differs are queued for the view'''
+        cdef Snapshot state_copy = <Snapshot?>snap
+        if state_copy.circuit is not self:
+            raise ValueError("the snapshot was taken of another circuit")
+        if state_copy.revision != self.revision or state_copy.layout != self.layout:
+            raise ValueError("the snapshot was taken of a different structure")
+        cdef CPP_Gate* gate_infolist = self.gate_infolist.data()
+        cdef CPP_Gate* info
+        cdef const GateState* state = state_copy.gates.data()
+        cdef const uint8_t* outputs = state_copy.profiles.data()
+        cdef Profile* profile
+        cdef Profile* end
+        cdef Py_ssize_t i, n = self.gate_infolist.size()
+        set_MODE(state_copy.mode)
+        self.Global_Clock = state_copy.clock
+        self.time_queue = state_copy.time_queue
+        with nogil:
+            for i in range(n):
+                info = &gate_infolist[i]
+                if info.observed and not info.update and info.output != state.output:
+                    info.update = True
+                    self.visual_queue.push_back(i)
+                info.output = state.output
+                info.value = state.value
+                info.scheduled = state.scheduled
+                memcpy(info.book, state.book, 3)
+                state += 1
+                profile = info.hitlist.data()
+                end = profile + info.hitlist.size()
+                while profile != end:
+                    profile.output = outputs[0]
+                    outputs += 1
+                    profile += 1
+        if not self.time_queue.empty() and (self.runner is None or self.runner.done()):
+            self.runner = asyncio.create_task(self.task_manager())
+
+    cpdef object clone(self):
+        '''independent copy of the circuit, built natively: gate_infolist, hitlists and input slots are copied
+        and wrappers are only built for the gates objlist and ICs list, the rest on first access.
+        Either side can then be edited or simulated, from another thread too, without touching the other'''
+        cdef Py_ssize_t mode = MODE
+        cdef Circuit twin = Circuit()
+        set_MODE(mode) # a new circuit starts the shared mode over in DESIGN
+        cdef CPP_Gate* gate_infolist = self.gate_infolist.data()
+        cdef GateVerse verse = twin.gate_verse
+        cdef Py_ssize_t i, n = self.gate_infolist.size()
+        cdef PyObject* cached
         cdef Gate gate
-        cdef list sources
+        cdef object item
+        twin.use_hugepages(self.hugepages)
+        twin.gate_infolist.reserve(n)
+        for i in range(n):
+            twin.gate_infolist.emplace_back(CPP_Gate(gate_infolist[i], twin.pool))
+        verse.sources = self.gate_verse.sources
+        verse.cache.resize(n)
+        verse.meta = dict(self.gate_verse.meta)
         for i in range(n):
-            gate=<Gate>PyList_GET_ITEM(self.gate_verse, serial[i])
-            gate.location=i
-            sources = gate._sources
-            for index in range(len(sources)):
-                if sources[index] != -1:
-                    '''update the source location'''
-                    sources[index] = hash_map[sources[index]]
-            new_gate_verse.append(gate)
-        self.gate_verse[:] = new_gate_verse
+            cached = self.gate_verse.cache[i]
+            if cached != NULL: # the twin's wrapper picks the names up when it is built
+                gate = <Gate>cached
+                verse.meta[i] = (gate.code, gate.codename, gate.custom_name)
+        for i in range(TOTAL):
+            if i == IC_ID:
+                twin.objlist[i] = [None if item is None else twin.adopt_ic(item) for item in self.objlist[i]]
+                for item in twin.objlist[i]:
+                    if item is not None:
+                        twin.ics.add(item)
+            else:
+                twin.objlist[i] = [None if item is None else verse.get((<Gate>item).location) for item in self.objlist[i]]
+        twin.copydata = list(self.copydata)
+        twin.hidden = self.hidden
+        twin.eval_count = self.eval_count
+        twin.observers = self.observers
+        twin.frag_threshold = self.frag_threshold
+        twin.settled_jump = self.settled_jump
+        twin.Global_Clock = self.Global_Clock
+        for i in range(12):
+            twin.Global_delay[i] = self.Global_delay[i]
+        twin.time_queue = self.time_queue
+        twin.tombstones = self.tombstones
+        twin.stash = self.stash
+        twin.revision = self.revision
+        twin.hashed_revision = self.hashed_revision
+        twin.hashed = self.hashed
+        twin.layout = self.layout
+        twin.focused = self.focused
+        twin.cone_end = self.cone_end
+        twin.watched = self.watched
+        twin.pending = self.pending # the twin has no open batch, so it settles them now
+        twin.flush()
+        if not twin.time_queue.empty():
+            twin.runner = asyncio.create_task(twin.task_manager())
+        return twin
+
+    cdef IC adopt_ic(self, IC ic):
+        '''copy of an IC of another circuit whose gates sit at the same locations here'''
+        cdef IC twin = IC(IC_ID, ic.codename)
+        cdef Gate pin
+        twin.custom_name = ic.custom_name
+        twin.code = ic.code
+        twin.map = list(ic.map)
+        twin.tag = ic.tag
+        twin.description = ic.description
+        twin.interior = ic.interior
+        twin.gate_infolist_ptr = &self.gate_infolist
+        twin.pool = self.pool
+        twin.gate_verse = self.gate_verse
+        twin.inputs = [self.gate_verse.get(pin.location) for pin in ic.inputs]
+        twin.outputs = [self.gate_verse.get(pin.location) for pin in ic.outputs]
+        twin.nested = [self.adopt_ic(inner) for inner in ic.nested]
+        return twin
+
+    cpdef void reserve(self, int gates):
+        '''size hint: make room for this many more gates in one allocation'''
+        self.gate_infolist.reserve(self.gate_infolist.size() + gates)
+        self.advise()
+
+    cpdef bint use_hugepages(self, bint flag=True):
+        '''back the gate state arrays with transparent huge pages (Linux, madvise)
+        fewer TLB misses once a netlist runs into millions of gates.
+        returns whether the platform honours it; elsewhere this silently stays off'''
+        self.hugepages = flag and hugepages_supported()
+        self.pool.set_huge(self.hugepages)
+        self.advised = NULL
+        self.advise()
+        return self.hugepages
+
+    cdef void advise(self) nogil:
+        '''give the huge page advice again whenever gate_infolist was reallocated'''
+        cdef const void* data=self.gate_infolist.data()
+        if not self.hugepages or data==self.advised:
+            return
+        self.advised=data
+        advise_hugepages(<void*>data, self.gate_infolist.capacity()*sizeof(CPP_Gate))
 
     cpdef void generate(self, list circuit):
         '''generate the circuit from the list of info'''
@@ -603,9 +1906,9 @@ cdef class Circuit:
         cdef object obj
         cdef Gate gate
         cdef IC ic
-        cdef CPP_Gate* gate_infolist=self.gate_infolist.data()
         cdef list info
         cdef list ic_list=[]
+        self.reserve(PyList_GET_SIZE(circuit))
         '''first pass: load all the gates to pseudo and set up the ic_list'''
         for info in circuit:  # load to pseudo
             if info[ID] == IC_ID:
@@ -617,13 +1920,13 @@ cdef class Circuit:
             else:
                 gate = <Gate>self.getcomponent(info[ID])
                 if gate.id == VARIABLE_ID:
-                    gate_infolist[gate.location].output = UNKNOWN
+                    self.gate_infolist[gate.location].output = UNKNOWN # the list may have grown, no cached pointer
                     varlist.append(gate.location)
                 pseudo[info[LOCATION]] = gate.location
         '''second pass: connect all the gates'''
         for info in circuit:  # connect components
             if info[ID] != IC_ID:
-                gate = <Gate>PyList_GET_ITEM(self.gate_verse, pseudo[info[LOCATION]])
+                gate = self.gate_verse.get(pseudo[info[LOCATION]])
                 gate.clone(info, pseudo)
         '''third pass: implement all the ics'''
         for ic in ic_list:
@@ -646,6 +1949,7 @@ cdef class Circuit:
         cdef Profile* profile
         cdef Profile* end
         cdef CPP_Gate* info
+        self.flush() # origins of an open batch are marked, which would read as visited here
         cdef IC my_ic = self.getcomponent(IC_ID)
         cdef CPP_Gate* gate_infolist=self.gate_infolist.data()
         cdef list queue = []
@@ -657,7 +1961,7 @@ cdef class Circuit:
             queue.append(gate)
         cdef Py_ssize_t size = len(queue)
         cdef Py_ssize_t index = len(outputs)
-        cdef list gate_verse = self.gate_verse
+        cdef GateVerse gate_verse = self.gate_verse
         while index < size:
             gate = queue[index]
             info = &gate_infolist[gate.location]
@@ -665,10 +1969,10 @@ cdef class Circuit:
             end = profile + info.hitlist.size()
             '''if the gate is an input pin with a source or an output pin with a hitlist, connect it to the next gates. these are 
             pins of internal ics that will be removed, so no more nested ics'''
-            if (info.type == INPUT_PIN_ID and gate._sources[0] != -1) or (info.type == OUTPUT_PIN_ID and not info.hitlist.empty()):
+            if (info.type == INPUT_PIN_ID and gate_verse.sources[gate.location][0] != -1) or (info.type == OUTPUT_PIN_ID and not info.hitlist.empty()):
                 while profile != end:
-                    target = <Gate>PyList_GET_ITEM(gate_verse, profile.target)
-                    target._sources[profile.index] = gate._sources[0]
+                    target = gate_verse.get(profile.target)
+                    gate_verse.sources[profile.target][profile.index] = gate_verse.sources[gate.location][0]
                     if not gate_infolist[target.location].mark:
                         gate_infolist[target.location].mark = True
                         queue.append(target)
@@ -676,7 +1980,7 @@ cdef class Circuit:
                     profile += 1
             else:
                 while profile != end:
-                    target = <Gate>PyList_GET_ITEM(gate_verse, profile.target)
+                    target = gate_verse.get(profile.target)
                     if not gate_infolist[target.location].mark:
                         gate_infolist[target.location].mark = True
                         queue.append(target)
@@ -701,6 +2005,7 @@ cdef class Circuit:
         # convert variables to inputpin and probes to outputpin
         cdef Gate var, probe
         cdef CPP_Gate* info
+        self.revision += 1
         for var in self.objlist[VARIABLE_ID]:
             if var is not None:
                 info = &self.gate_infolist[var.location]
@@ -723,6 +2028,7 @@ cdef class Circuit:
         cdef CPP_Gate* info
         cdef list real_source
         cdef int length
+        self.revision += 1
         if id >= IC_ID or id < 0:
             return
         real_source = [source for source in gate._sources if source != -1]
@@ -738,12 +2044,13 @@ cdef class Circuit:
                 info = &self.gate_infolist[gate.location] # update cpp_gate
                 info.type = id
                 gate.process() # process the gate
-                self.propagate(gate.location) # propagate the changes
+                self.settle(gate.location) # propagate the changes
 
     cpdef void reorder(self, object gate, int index):
         # shift the position of same types of gates in objlist
         # basically a code and position change
         cdef list lst = self.objlist[(<Gate>gate).id]
+        self.revision += 1
         if index < 0 or index >= len(lst):
             return
         cdef object old = lst[index]
@@ -796,7 +2103,7 @@ cdef class Circuit:
     cpdef object get_ic(self, str location):
         with open(location, 'rb') as file:
             crct = orjson.loads(file.read())
-        if isinstance(crct[LOCATION], list):
+        if isinstance(crct, list) and len(crct) > LOCATION and isinstance(crct[LOCATION], list): # bounds checks are off
             return crct
         else:
             print('Cannot Convert to IC')
@@ -823,11 +2130,22 @@ cdef class Circuit:
 
     cpdef void clearcircuit(self):
         '''clear circuit/ purge every item of circuit'''
+        self.revision += 1
         self.gate_infolist.clear()
+        self.pool.reset() # no hitlist is left, so the slabs can go
         self.gate_verse.clear()
+        self.ics = weakref.WeakSet()
         for i in range(TOTAL):
             self.objlist[i].clear()
         self.hidden = 0
+        self.observers = 0
+        self.tombstones.clear()
+        self.stash.clear()
+        self.pending.clear()
+        self.watched.clear()
+        self.focused = False
+        self.cone_end = 0
+        self.settled_jump = -1
 
     cpdef void copy(self, list components):
         '''copy components to self.copydata'''
@@ -836,6 +2154,7 @@ cdef class Circuit:
         cdef int i
         if len(components) == 0:
             return
+        self.flush() # origins of an open batch are marked, which would read as cluster members
         self.copydata = []
         cluster = []
         # mark all gates in cluster as scheduled
@@ -886,7 +2205,7 @@ cdef class Circuit:
 
         for gate_info in circuit:  # connect components
             if gate_info[ID] != IC_ID:
-                gate = <Gate>PyList_GET_ITEM(self.gate_verse, pseudo[gate_info[LOCATION]])
+                gate = self.gate_verse.get(pseudo[gate_info[LOCATION]])
                 gate.clone(gate_info, pseudo)
         for ic in ic_list:
             ic.implement(pseudo)
@@ -903,39 +2222,44 @@ cdef class Circuit:
         if self.runner is not None and not self.runner.done():
             self.runner.cancel()
         self.runner=None
+        cdef vector[int] origins
         for variable in self.objlist[VARIABLE_ID]:
             if variable is not None:
                 # set output of variable to its value
-                # run the propagation from variable
+                # every variable seeds the same wave
                 info = &self.gate_infolist[variable.location]
                 info.output = info.value
-                self.propagate(variable.location)
+                origins.push_back(variable.location)
+        self.batch_propagate(origins)
 
     cpdef void custom_simulate(self, list varlist):
         '''simulate the circuit'''
         cdef CPP_Gate* info
+        cdef vector[int] origins
         for variable in varlist:
             # set output of variable to its value
-            # run the propagation from variable
+            # every variable seeds the same wave
             info = &self.gate_infolist[variable]
             info.output = info.value
-            self.propagate(variable)
+            origins.push_back(variable)
+        self.batch_propagate(origins)
 
     cpdef void reset(self):
-        '''reset the circuit's items to unknown value'''
-        cdef Gate g
+        '''reset the circuit's items to unknown value in one native pass over gate_infolist,
+        which also reaches IC interiors and gates that were never listed'''
         set_MODE(DESIGN)
         self.eval_count=0
         cdef priority_queue[Task, vector[Task], greater[Task]] empty_pq
         self.time_queue.swap(empty_pq)
         if self.runner is not None and not self.runner.done():
             self.runner.cancel()
-        for i in self.get_components():
-            if i.id != IC_ID:
-                g = <Gate>i
-                g.reset()
-            else:
-                (<IC>i).reset()
+        cdef CPP_Gate* info = self.gate_infolist.data()
+        cdef CPP_Gate* end = info + self.gate_infolist.size()
+        with nogil:
+            while info != end:
+                if info.type >= 0: # tombstoned gates stay as they were hidden
+                    reset_gate(info)
+                info += 1
 
     cdef void complete_task(self, Task task) nogil:
         '''Process one task called from the async drain loop on the main thread.'''
@@ -952,7 +2276,7 @@ cdef class Circuit:
         cdef uint8_t* book
         cdef CPP_Gate* gate_infolist = self.gate_infolist.data()
         self_info = &gate_infolist[origin]
-        if not self_info.update:
+        if self_info.observed and not self_info.update:
             self.visual_queue.push_back(origin) 
             self_info.update = True
         if not self_info.scheduled:
@@ -968,7 +2292,7 @@ cdef class Circuit:
                 target_info = &gate_infolist[profile.target]
                 gate_type = target_info.type
                 limit = target_info.inputlimit
-                if gate_type < 0:
+                if gate_type < 0 or target_info.idle: # tombstoned, or outside the focused cone
                     profile+=1
                     continue
                 if gate_type >= NOT_ID:
@@ -996,7 +2320,7 @@ cdef class Circuit:
                         target_output = UNKNOWN
                 if target_output != target_info.output:
                     target_info.output = target_output
-                    if not target_info.update:
+                    if target_info.observed and not target_info.update:
                         self.visual_queue.push_back(profile.target)   # target changed — mark dirty
                         target_info.update = True
                     if not target_info.scheduled:
@@ -1010,6 +2334,15 @@ cdef class Circuit:
             self_info.output = self_info.value
             self.time_queue.push(Task(origin, self.Global_Clock + self_info.book[self_info.output], origin))
             self_info.scheduled = True
+    cdef int* waves(self, Py_ssize_t need) nogil:
+        '''the read and write wave buffers, each able to hold need locations
+        (a wave lists every gate at most once, so the gate count is enough)'''
+        if <Py_ssize_t>self.queue.size() < 2*need:
+            self.queue.resize(2*need)
+            if self.hugepages:
+                advise_hugepages(self.queue.data(), self.queue.capacity()*sizeof(int))
+        return self.queue.data()
+
     cdef void propagate(self, int origin) nogil:
         '''propagate the output of a gate to its targets'''
         cdef Profile* profile
@@ -1019,8 +2352,8 @@ cdef class Circuit:
         cdef Py_ssize_t new_output, profile_output, target_output
         cdef Py_ssize_t index = 0, end_point = 1, size = 0
         cdef Py_ssize_t eval = 0
-        cdef int* read_queue = self.queue[0]
-        cdef int* write_queue = self.queue[1]
+        cdef int* read_queue = self.waves(self.gate_infolist.size())
+        cdef int* write_queue = read_queue + (self.queue.size() >> 1)
         cdef CPP_Gate* self_info
         cdef CPP_Gate* target_info
         cdef uint8_t *book
@@ -1038,7 +2371,7 @@ cdef class Circuit:
             return
             
         read_queue[0] = origin
-        if not self_info.update:
+        if self_info.observed and not self_info.update:
             self_info.update = True
             self.visual_queue.push_back(origin)
             
@@ -1069,7 +2402,7 @@ cdef class Circuit:
                         target_info = &gate_infolist[profile.target]
                         gate_type = target_info.type
                         limit = target_info.inputlimit
-                        if gate_type < 0:
+                        if gate_type < 0 or target_info.idle:
                             profile+=1
                             continue
                         if gate_type >= NOT_ID:
@@ -1097,7 +2430,7 @@ cdef class Circuit:
                                 target_output = UNKNOWN
                         if target_output != target_info.output:
                             target_info.output = target_output
-                            if not target_info.update:
+                            if target_info.observed and not target_info.update:
                                 self.visual_queue.push_back(profile.target)   # target changed — mark dirty
                                 target_info.update = True
                             if not target_info.mark and not target_info.hitlist.empty():
@@ -1112,7 +2445,8 @@ cdef class Circuit:
             read_queue, write_queue = write_queue, read_queue
         self.eval_count += eval
     cdef void batch_propagate(self, vector[int] origins) nogil:
-        '''propagate the output of a gate to its targets'''
+        '''propagate the outputs of many gates to their targets in one wave,
+        clock variables are scheduled as propagate does'''
         cdef Profile* profile
         cdef Profile* end
         cdef int gate_loc
@@ -1120,20 +2454,37 @@ cdef class Circuit:
         cdef Py_ssize_t new_output, profile_output, target_output
         cdef Py_ssize_t index = 0, end_point = 0, size = 0
         cdef Py_ssize_t eval = 0
-        cdef int* read_queue = self.queue[0]
-        cdef int* write_queue = self.queue[1]
+        cdef int* read_queue = self.waves(max(<Py_ssize_t>self.gate_infolist.size(), <Py_ssize_t>origins.size()))
+        cdef int* write_queue = read_queue + (self.queue.size() >> 1)
         cdef CPP_Gate* self_info
         cdef CPP_Gate* target_info
         cdef uint8_t *book
         cdef CPP_Gate* gate_infolist = self.gate_infolist.data()
+        cdef bint clocked = False
 
         for origin in origins:
-            read_queue[end_point] = origin
-            end_point += 1
             self_info = &gate_infolist[origin]
-            if not self_info.update:
+            if self_info.inputlimit==0:
+                self_info.mark = False
+                if self_info.scheduled:
+                    self_info.scheduled = False
+                else:
+                    self.time_queue.push(Task(origin, self.Global_Clock + self_info.book[PRIMARY], origin))
+                    self_info.scheduled = True
+                    clocked = True
+                continue
+            if self_info.observed and not self_info.update:
                 self_info.update = True
                 self.visual_queue.push_back(origin)
+            if self_info.hitlist.empty():
+                self_info.mark = False
+                continue
+            read_queue[end_point] = origin
+            end_point += 1
+        if clocked:
+            with gil:
+                if self.runner is None or self.runner.done():
+                    self.runner = asyncio.create_task(self.task_manager())
             
         cdef Py_ssize_t wave_limit=self.gate_infolist.size()-self.hidden
         while end_point > 0:
@@ -1162,7 +2513,7 @@ cdef class Circuit:
                         target_info = &gate_infolist[profile.target]
                         gate_type = target_info.type
                         limit = target_info.inputlimit
-                        if gate_type < 0:
+                        if gate_type < 0 or target_info.idle:
                             profile+=1
                             continue
                         if gate_type >= NOT_ID:
@@ -1190,10 +2541,10 @@ cdef class Circuit:
                                 target_output = UNKNOWN
                         if target_output != target_info.output:
                             target_info.output = target_output
-                            if not target_info.update:
+                            if target_info.observed and not target_info.update:
                                 self.visual_queue.push_back(profile.target)   # target changed — mark dirty
                                 target_info.update = True
-                            if not target_info.mark:
+                            if not target_info.mark and not target_info.hitlist.empty():
                                 target_info.mark = True
                                 write_queue[size] = profile.target
                                 size += 1
@@ -1205,6 +2556,27 @@ cdef class Circuit:
             read_queue, write_queue = write_queue, read_queue
         self.eval_count += eval
 
+    def batch(self):
+        '''with circuit.batch(): connect, disconnect, setlimits and transfer_info only record
+        the gates they changed, the outermost exit settles them all in one wave'''
+        return Batch(self)
+
+    cdef void settle(self, int origin) nogil:
+        '''propagate origin now, or record it for the open batch'''
+        cdef CPP_Gate* info = &self.gate_infolist[origin]
+        if self.batching == 0 or info.inputlimit == 0:
+            self.propagate(origin)
+        elif not info.mark:
+            info.mark = True
+            self.pending.push_back(origin)
+
+    cpdef void flush(self):
+        '''settle the origins recorded by the open batch in one wave'''
+        cdef vector[int] origins
+        origins.swap(self.pending)
+        if not origins.empty():
+            self.batch_propagate(origins)
+
     cdef void sweep(self, int origin) nogil:
         '''propagate the output of a gate to its targets'''
         cdef Profile* profile
@@ -1217,8 +2589,12 @@ cdef class Circuit:
         cdef CPP_Gate* target_info
         cdef uint8_t *book
         cdef CPP_Gate* gate_infolist = self.gate_infolist.data()
+        if self.focused and self.cone_end < size:
+            size = self.cone_end
         for index in range(origin,size):
             self_info = &gate_infolist[index]
+            if self_info.idle:
+                continue
             new_output = self_info.output
             profile = self_info.hitlist.data()
             end = profile + self_info.hitlist.size()
@@ -1229,7 +2605,7 @@ cdef class Circuit:
                     target_info = &gate_infolist[profile.target]
                     gate_type = target_info.type
                     limit = target_info.inputlimit
-                    if gate_type < 0:
+                    if gate_type < 0 or target_info.idle:
                         profile+=1
                         continue
                     if gate_type >= NOT_ID:
@@ -1309,6 +2685,18 @@ cdef class Circuit:
             await asyncio.sleep(DELAY)
 
     # ── Visual-queue helpers (called from the UI layer) ──────────────────
+    cpdef void observe(self, Gate gate, bint flag):
+        '''Subscribe or unsubscribe a gate from the visual queue.
+        Only observed gates are pushed by the kernels, so nothing is queued while nobody watches.'''
+        cdef CPP_Gate* info = &self.gate_infolist[gate.location]
+        if info.observed == flag:
+            return
+        info.observed = flag
+        if flag:
+            self.observers += 1
+        else:
+            self.observers -= 1
+
     cpdef bint visual_queue_empty(self):
         '''Return True when there are no pending dirty gate locations.'''
         return self.visual_queue.empty()
@@ -1333,3 +2721,31 @@ cdef class Circuit:
     cpdef int visual_queue_size(self):
         '''Return the number of pending dirty gate locations.'''
         return self.visual_queue.size()
+
+    cpdef object drain_visual_queue(self, int max_items=-1, object out=None):
+        '''Pop up to max_items dirty gate locations in one call and clear their update flags.
+        Returns a new int32 array, or fills the caller's int32 buffer and returns the count.'''
+        cdef Py_ssize_t n = self.visual_queue.size()
+        cdef Py_ssize_t i
+        cdef int loc
+        cdef int[::1] view
+        cdef array.array result = None
+        if max_items >= 0 and max_items < n:
+            n = max_items
+        if out is None:
+            result = array.clone(INT_ARRAY, n, False)
+            view = result
+        else:
+            view = out
+            if view.shape[0] < n:
+                n = view.shape[0]
+        cdef CPP_Gate* gate_infolist = self.gate_infolist.data()
+        with nogil:
+            for i in range(n):
+                loc = self.visual_queue.front()
+                self.visual_queue.pop_front()
+                gate_infolist[loc].update = False
+                view[i] = loc
+        if out is None:
+            return result
+        return n
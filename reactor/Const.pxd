@@ -11,6 +11,11 @@ cpdef enum:
     COMPILE = 3
     
     LIMIT = 250_000
+    TABLE_INPUTS = 30 # widest circuit truthTable() enumerates
+    TABLE_CHUNK = 12 # log2 of the rows writeTruthTable() evaluates at a time
+    HASH_ROUNDS = 64 # most refinement rounds structural_hash() runs
+    TABLE_CACHE = 1 << 26 # bytes of truth-table rows kept by the table cache
+    DEFRAG_SLICE = 4096 # most gates one defragment() step moves
 
 
     DEAD_ID=255
@@ -52,6 +57,17 @@ cdef extern from *:
     bint likely(bint condition) nogil
     bint unlikely(bint condition) nogil
 
+cdef extern from *:
+    """
+    #if defined(_MSC_VER)
+        #include <intrin.h>
+        static inline int lowest_bit(unsigned long long x) { unsigned long i; _BitScanForward64(&i, x); return (int)i; }
+    #else
+        #define lowest_bit(x)   __builtin_ctzll(x)
+    #endif
+    """
+    int lowest_bit(unsigned long long x) nogil  # count of trailing zeros, x must not be 0
+
 cdef public Py_ssize_t MODE = DESIGN
 cpdef void set_MODE(Py_ssize_t mode)
 cpdef Py_ssize_t get_MODE()
@@ -2,6 +2,7 @@
 from Const cimport HIGH, LOW, ERROR, UNKNOWN, DESIGN, SIMULATE, MODE
 from libc.stdint cimport uint8_t,uint8_t,int8_t
 from libcpp.unordered_map cimport unordered_map
+from cpython.ref cimport PyObject
 cdef extern from "<vector>" namespace "std" nogil:
     cdef cppclass vector[T, ALLOCATOR=*]:
         cppclass iterator:
@@ -24,15 +25,18 @@ cdef extern from "<vector>" namespace "std" nogil:
         void clear()
         void reserve(int)
         void resize(int)
+        void resize(int, T)
+        void swap(vector&)
         
         bint empty()
         int size()
-        int capacity()
+        size_t capacity()
         iterator begin()
         iterator end()
 
 cdef class Gate
 cdef class Variable
+cdef class GateVerse
 
 cdef extern from "Profile.h":
     cdef cppclass Profile:
@@ -41,6 +45,26 @@ cdef extern from "Profile.h":
         int output
         Profile()
         Profile(int target, int pin_index, int output)
+    int advise_hugepages(void* ptr, size_t bytes) nogil
+    int hugepages_supported() nogil
+    cdef cppclass ProfilePool:
+        ProfilePool() nogil
+        void reset() nogil
+        size_t bytes() nogil
+        void set_huge(bint on) nogil
+    cdef cppclass HitList:
+        HitList() nogil
+        HitList(ProfilePool* pool) nogil
+        Profile* data() nogil
+        int size() nogil
+        bint empty() nogil
+        Profile* begin() nogil
+        Profile* end() nogil
+        Profile& operator[](int) nogil
+        void push_back(Profile&) nogil
+        void emplace_back(...) nogil
+        void pop_back() nogil
+        void clear() nogil
     cdef cppclass Task:
         int gate_loc
         unsigned int time
@@ -55,15 +79,20 @@ cdef extern from "Profile.h":
         uint8_t scheduled
         uint8_t mark
         uint8_t update
+        uint8_t observed
         uint8_t inputlimit
         uint8_t book[4]
-        vector[Profile] hitlist
+        uint8_t idle
+        HitList hitlist
         CPP_Gate()
-        CPP_Gate(uint8_t t, uint8_t lim)
+        CPP_Gate(uint8_t t, uint8_t lim, ProfilePool* pool)
+        CPP_Gate(const CPP_Gate& other, ProfilePool* pool)
 
-cdef void hide(Profile& profile, CPP_Gate* gate_infolist, list gate_verse)
-cdef void reveal(Profile& profile, Gate source, list gate_verse)
-cdef void pop(vector[Profile]& hitlist, CPP_Gate* gate_infolist, int target, int pin_index)
+cdef void hide(Profile& profile, CPP_Gate* gate_infolist, GateVerse gate_verse)
+cdef void reveal(Profile& profile, Gate source, GateVerse gate_verse)
+cdef void pop(HitList& hitlist, CPP_Gate* gate_infolist, int target, int pin_index)
+cdef void reset(CPP_Gate* info) noexcept nogil
+cdef void process(CPP_Gate* gate_infolist, GateVerse gate_verse, int location)
 
 cdef class Gate:
 # --- 4-BYTE ALIGNED (HOT C-TYPES) ---
@@ -71,8 +100,7 @@ cdef class Gate:
     cdef public int location
     cdef vector[CPP_Gate]* location_ptr
     # --- 8-BYTE ALIGNED (COLD PYTHON OBJECTS) ---
-    cdef public list _sources
-    cdef public list gate_verse
+    cdef public GateVerse gate_verse
     cdef public tuple code
     cdef public str codename
     cdef public str custom_name
@@ -94,6 +122,22 @@ cdef class Gate:
     cpdef bint set_pulse(self, int val, int time_type)
     cpdef bint clock(self)
 
+cdef class GateVerse:
+    cdef vector[CPP_Gate]* infolist
+    cdef vector[vector[int]] sources  # input slots of every location, -1 when empty
+    cdef vector[PyObject*] cache      # borrowed wrapper of every location, NULL until materialized
+    cdef dict meta                    # location -> (code, codename, custom_name) of released wrappers
+    cdef tuple names                  # default codename per gate type
+
+    cdef Gate get(self, int location)
+    cdef void rename(self, int location, str name)
+    cdef int grow(self, int limit)
+    cdef void flip(self, int location)
+    cdef void permute(self, const int* serial, const int* hash_map, int n)
+    cdef void swap(self, int a, int b)
+    cdef void truncate(self, int n)
+    cpdef void clear(self)
+
 cdef class Variable(Gate):
     pass
 
@@ -11,8 +11,10 @@ from libc.string cimport memmove
 from Store cimport decode
 from libc.stdint cimport uint8_t
 from libcpp.unordered_map cimport unordered_map
+from libcpp.utility cimport move
+cimport cython
 
-cdef inline void pop(vector[Profile]& hitlist,CPP_Gate* gate_infolist, int target, int pin_index):
+cdef inline void pop(HitList& hitlist,CPP_Gate* gate_infolist, int target, int pin_index):
     '''Remove a specific entry from a hitlist by target gate and pin index'''
     cdef Profile* profile = hitlist.data()
     cdef Profile* end = profile + hitlist.size()
@@ -25,36 +27,217 @@ cdef inline void pop(vector[Profile]& hitlist,CPP_Gate* gate_infolist, int targe
             break
         profile += 1
 
-cdef inline void hide(Profile& profile, CPP_Gate* gate_infolist, list gate_verse):
+cdef inline void hide(Profile& profile, CPP_Gate* gate_infolist, GateVerse gate_verse):
     '''Sever one outgoing connection and zero out the target's source slot'''
     cdef CPP_Gate* target_info = &gate_infolist[profile.target]
     if target_info.type < VARIABLE_ID:
         target_info.book[profile.output] -= 1
-    cdef Gate target_gate = <Gate>gate_verse[profile.target]
-    target_gate._sources[profile.index] = -1
+    gate_verse.sources[profile.target][profile.index] = -1
+    profile.output = UNKNOWN
 
-cdef inline void reveal(Profile& profile, Gate source, list gate_verse):
+cdef inline void reveal(Profile& profile, Gate source, GateVerse gate_verse):
     '''Restore one outgoing connection and re-register the source in the target's book'''
     cdef CPP_Gate* gate_infolist=source.location_ptr[0].data()
     cdef CPP_Gate* target_info = &gate_infolist[profile.target]
     if target_info.type < VARIABLE_ID:
         target_info.book[UNKNOWN] += 1
-    cdef Gate target_gate = <Gate>gate_verse[profile.target]
-    target_gate._sources[profile.index] = source.location
+    gate_verse.sources[profile.target][profile.index] = source.location
+
+cdef void process(CPP_Gate* gate_infolist, GateVerse gate_verse, int location):
+    '''Recompute the output of the gate at location from its current inputs and type,
+    no wrapper needed'''
+    cdef CPP_Gate* info = &gate_infolist[location]
+    cdef CPP_Gate* src_info
+    cdef uint8_t* book
+    cdef int gate_type = info.type
+    cdef int limit = info.inputlimit
+    cdef int high, low, realsource
+    cdef int source_loc
+
+    if MODE == DESIGN:
+        info.output = UNKNOWN
+        return
+
+    if gate_type >= VARIABLE_ID:
+        if gate_type == VARIABLE_ID:
+            info.output = info.value
+        else:
+            source_loc = gate_verse.sources[location][0]
+            if source_loc == -1:
+                info.output = UNKNOWN
+            else:
+                src_info = &gate_infolist[source_loc]
+                if src_info.output == UNKNOWN:
+                    info.output = UNKNOWN
+                else:
+                    info.output = src_info.output ^ (gate_type == NOT_ID)
+    else:
+        book = info.book
+        high = book[HIGH]
+        low  = book[LOW]
+        realsource = high + low
+        if likely(realsource == limit) or unlikely(realsource and realsource + book[UNKNOWN] == limit):
+            if gate_type <= NAND_ID:   info.output = (low == 0) ^ (gate_type & 1)
+            elif gate_type <= NOR_ID:  info.output = (high > 0) ^ (gate_type & 1)
+            else:                      info.output = (high & 1) ^ (gate_type & 1)
+        else:
+            info.output = UNKNOWN
+
+cdef inline void reset(CPP_Gate* info) noexcept nogil:
+    '''Move all counted inputs back to unknown and set output to unknown'''
+    cdef uint8_t* book
+    if info.type < VARIABLE_ID:
+        book = info.book
+        book[2] += book[0] + book[1]
+        book[0] = book[1] =  0
+    info.output = UNKNOWN
+    info.scheduled = False
+    cdef Profile* profile = info.hitlist.data()
+    cdef Profile* end = profile + info.hitlist.size()
+    while profile < end:
+        profile.output = UNKNOWN
+        profile += 1
+
 
+cdef class GateVerse:
+    '''Location-indexed view of a circuit's gates.
+    Input slots live in a native table; Python Gate wrappers are built on first access
+    and only weakly cached, so gates nobody holds cost no Python objects'''
+    def __cinit__(self):
+        self.infolist = NULL
+        self.meta = {}
+        self.names = ()
 
+    def __len__(self):
+        return self.cache.size()
+
+    def __getitem__(self, Py_ssize_t location):
+        if location < 0:
+            location += self.cache.size()
+        if location < 0 or location >= self.cache.size():
+            raise IndexError('gate location out of range')
+        return self.get(location)
+
+    def __iter__(self):
+        cdef int i
+        for i in range(self.cache.size()):
+            yield self.get(i)
+
+    cdef Gate get(self, int location):
+        '''the wrapper of the gate at location, materialized if no one holds it'''
+        cdef PyObject* cached = self.cache[location]
+        if cached != NULL:
+            return <Gate>cached
+        cdef int kind = self.infolist[0][location].type
+        cdef Gate gate = Gate(kind, self.names[kind if kind >= 0 else -kind-1])
+        gate.location = location
+        gate.location_ptr = self.infolist
+        gate.gate_verse = self
+        cdef tuple saved = self.meta.pop(location, None)
+        if saved is not None:
+            gate.code, gate.codename, gate.custom_name = saved
+        self.cache[location] = <PyObject*>gate
+        return gate
+
+    cdef void rename(self, int location, str name):
+        '''give the gate at location a display name without building its wrapper'''
+        cdef PyObject* cached = self.cache[location]
+        if cached != NULL:
+            (<Gate>cached).custom_name = name
+            return
+        cdef tuple saved = self.meta.get(location)
+        if saved is not None:
+            self.meta[location] = (saved[0], saved[1], name)
+        else:
+            kind = self.infolist[0][location].type
+            self.meta[location] = ((), self.names[kind if kind >= 0 else -kind-1], name)
+
+    cdef int grow(self, int limit):
+        '''open the slots of a gate just appended to the infolist, returns its location'''
+        cdef vector[int] slots
+        slots.resize(limit, -1)
+        self.sources.push_back(slots)
+        self.cache.push_back(NULL)
+        return self.cache.size()-1
+
+    cdef void flip(self, int location):
+        '''tombstone or renew the gate at location, in the infolist and in its wrapper if one is alive'''
+        cdef CPP_Gate* info = &self.infolist[0][location]
+        info.type = -info.type-1
+        if self.cache[location] != NULL:
+            (<Gate>self.cache[location]).id = info.type
+
+    cdef void permute(self, const int* serial, const int* hash_map, int n):
+        '''follow optimize: location i now holds what was at serial[i]'''
+        cdef vector[vector[int]] sources
+        cdef vector[PyObject*] cache
+        cdef int i, j
+        sources.resize(n)
+        cache.resize(n)
+        for i in range(n):
+            sources[i].swap(self.sources[serial[i]])
+            for j in range(sources[i].size()):
+                if sources[i][j] != -1:
+                    sources[i][j] = hash_map[sources[i][j]]
+            cache[i] = self.cache[serial[i]]
+            if cache[i] != NULL:
+                (<Gate>cache[i]).location = i
+        self.sources.swap(sources)
+        self.cache.swap(cache)
+        if self.meta:
+            self.meta = {hash_map[location]: saved for location, saved in self.meta.items()}
+
+    cdef void swap(self, int a, int b):
+        '''follow a swap of the gates at a and b; the locations named inside sources are the caller's to map'''
+        cdef PyObject* wrapper = self.cache[a]
+        self.sources[a].swap(self.sources[b])
+        self.cache[a] = self.cache[b]
+        self.cache[b] = wrapper
+        if self.cache[a] != NULL:
+            (<Gate>self.cache[a]).location = a
+        if wrapper != NULL:
+            (<Gate>wrapper).location = b
+        saved = self.meta.pop(a, None)
+        if b in self.meta:
+            self.meta[a] = self.meta.pop(b)
+        if saved is not None:
+            self.meta[b] = saved
+
+    cdef void truncate(self, int n):
+        '''drop every location from n on'''
+        cdef int location
+        self.sources.resize(n)
+        self.cache.resize(n)
+        for location in [location for location in self.meta if location >= n]:
+            del self.meta[location]
+
+    cpdef void clear(self):
+        '''forget every gate; wrappers still held elsewhere are no longer tracked'''
+        self.sources.clear()
+        self.cache.clear()
+        self.meta.clear()
+
+
+@cython.no_gc_clear
 cdef class Gate:
     def __init__(self, int id, str name):
         self.codename = name
         self.location = -1
         self.id = id
-        if id >= VARIABLE_ID:
-            self._sources = [-1]
-        else:
-            self._sources = [-1, -1]
         self.code = ()
         self.custom_name = ''
 
+    def __dealloc__(self):
+        # leave the weak cache; names and codes that cannot be derived again are kept
+        cdef GateVerse verse = self.gate_verse
+        if verse is None or self.location < 0 or <size_t>self.location >= verse.cache.size():
+            return
+        if verse.cache[self.location] != <PyObject*>self:
+            return
+        verse.cache[self.location] = NULL
+        if self.custom_name or (self.code is not None and len(self.code) == 2):
+            verse.meta[self.location] = (self.code, self.codename, self.custom_name)
+
     def __repr__(self):
         return self.codename if self.custom_name == '' else self.custom_name
 
@@ -79,12 +262,17 @@ cdef class Gate:
         cdef CPP_Gate* info=base+self.location
         cdef Profile* profile = info.hitlist.data()
         cdef Profile* end = profile + info.hitlist.size()
-        cdef list gate_verse = self.gate_verse
+        cdef GateVerse gate_verse = self.gate_verse
         while profile < end:
-            targets.append(<Gate>(PyList_GET_ITEM(gate_verse, profile.target)))
+            targets.append(gate_verse.get(profile.target))
             profile += 1
         return targets
 
+    @property
+    def _sources(self):
+        '''Source location wired into each input slot, -1 for empty slots'''
+        return [src for src in self.gate_verse.sources[self.location]]
+
     @property
     def book(self):
         '''Input tally: counts of LOW, HIGH, UNKNOWN sources'''
@@ -113,9 +301,9 @@ cdef class Gate:
         '''The gate objects wired into each input slot, or None for empty slots'''
         cdef list source_list=[]
         cdef int i
-        for i in self._sources:
+        for i in self.gate_verse.sources[self.location]:
             if i != -1:
-                source_list.append(self.gate_verse[i])
+                source_list.append(self.gate_verse.get(i))
             else:
                 source_list.append(None)
         return source_list
@@ -131,43 +319,7 @@ cdef class Gate:
     cdef void process(self):
         '''Recompute this gate's output from its current inputs and type
         a slower yet safer method of updating output'''
-        cdef CPP_Gate* gate_infolist=self.location_ptr[0].data()
-        cdef CPP_Gate* info = &gate_infolist[self.location]
-        cdef CPP_Gate* src_info
-        cdef uint8_t* book
-        cdef int gate_type = info.type
-        cdef int limit = info.inputlimit
-        cdef int high, low, realsource
-        cdef int source_loc # Changed from Gate source to int source_loc
-
-        if MODE == DESIGN:
-            info.output = UNKNOWN
-            return
-
-        if gate_type >= VARIABLE_ID:
-            if gate_type == VARIABLE_ID:
-                info.output = info.value
-            else:
-                source_loc = self._sources[0]
-                if source_loc == -1:
-                    info.output = UNKNOWN
-                else:
-                    src_info = &gate_infolist[source_loc]
-                    if src_info.output == UNKNOWN:
-                        info.output = UNKNOWN
-                    else:
-                        info.output = src_info.output ^ (gate_type == NOT_ID)
-        else:
-            book = info.book
-            high = book[HIGH]
-            low  = book[LOW]
-            realsource = high + low
-            if likely(realsource == limit) or unlikely(realsource and realsource + book[UNKNOWN] == limit):
-                if gate_type <= NAND_ID:   info.output = (low == 0) ^ (gate_type & 1)
-                elif gate_type <= NOR_ID:  info.output = (high > 0) ^ (gate_type & 1)
-                else:                      info.output = (high & 1) ^ (gate_type & 1)
-            else:
-                info.output = UNKNOWN
+        process(self.location_ptr[0].data(), self.gate_verse, self.location)
 
     cpdef void rename(self, str name):
         '''Give the gate a display name'''
@@ -182,15 +334,16 @@ cdef class Gate:
         '''Wire a source gate into this gate's input slot at index'''
         cdef CPP_Gate* gate_infolist=self.location_ptr[0].data()
         cdef CPP_Gate* self_info = &gate_infolist[self.location]
-        if self_info.type == VARIABLE_ID or self._sources[index] != -1:
+        cdef vector[int]* sources = &self.gate_verse.sources[self.location]
+        if self_info.type == VARIABLE_ID or sources[0][index] != -1:
             return
         cdef CPP_Gate* src_info = &gate_infolist[source]
         
         if src_info.output == UNKNOWN:
-            (<Gate>PyList_GET_ITEM(self.gate_verse, source)).process()
+            process(gate_infolist, self.gate_verse, source)
             
         src_info.hitlist.emplace_back(self.location, index, src_info.output)
-        self._sources[index] = source
+        sources[0][index] = source
         if self.id<VARIABLE_ID:
             self_info.book[src_info.output] += 1
         self.process()
@@ -199,36 +352,25 @@ cdef class Gate:
         '''Remove whatever is wired into input slot at index and clear the output'''
         cdef CPP_Gate* gate_infolist=self.location_ptr[0].data()
         cdef CPP_Gate* self_info = &gate_infolist[self.location]
-        if self_info.type == VARIABLE_ID or self._sources[index] == -1:
+        cdef vector[int]* sources = &self.gate_verse.sources[self.location]
+        if self_info.type == VARIABLE_ID or sources[0][index] == -1:
             return
-        cdef int src_loc = self._sources[index]
+        cdef int src_loc = sources[0][index]
         cdef CPP_Gate* src_info = &gate_infolist[src_loc]
         pop(src_info.hitlist, gate_infolist, self.location, index)
-        self._sources[index] = -1
+        sources[0][index] = -1
         self_info.output = UNKNOWN
 
     cdef void reset(self):
         '''Move all counted inputs back to unknown and set output to unknown'''
-        cdef CPP_Gate* info = &self.location_ptr[0][self.location]
-        cdef uint8_t* book
-        if info.type < VARIABLE_ID:
-            book = info.book
-            book[2] += book[0] + book[1]
-            book[0] = book[1] =  0
-        info.output = UNKNOWN
-        info.scheduled = False
-        cdef Profile* profile = info.hitlist.data()
-        cdef Profile* end = profile + info.hitlist.size()
-        while profile < end:
-            profile.output = UNKNOWN
-            profile += 1
+        reset(&self.location_ptr[0][self.location])
 
     cdef void hide(self):
         '''Detach this gate from the live graph without removing it from the lists'''
         cdef Py_ssize_t i
         cdef CPP_Gate* target_info
         cdef Gate target_gate
-        cdef list sources
+        cdef vector[int]* sources
         cdef int source_loc
         cdef CPP_Gate* src_info
         cdef uint8_t* book
@@ -241,11 +383,11 @@ cdef class Gate:
         for i in range(n):
             hide(hitlist[i], gate_infolist, self.gate_verse)
 
-        sources = self._sources
+        sources = &self.gate_verse.sources[self.location]
         if info.type != VARIABLE_ID:
-            n = len(sources)
+            n = sources.size()
             for i in range(n):
-                source_loc = sources[i]
+                source_loc = sources[0][i]
                 if source_loc != -1:
                     src_info = &gate_infolist[source_loc]
                     pop(src_info.hitlist,gate_infolist, self.location, i)
@@ -258,16 +400,16 @@ cdef class Gate:
 
     cdef void reveal(self):
         '''Re-attach this gate to the live graph and recompute its output'''
-        cdef list sources = self._sources
+        cdef vector[int]* sources = &self.gate_verse.sources[self.location]
         cdef Py_ssize_t i
-        cdef Py_ssize_t n = len(sources)
+        cdef Py_ssize_t n = sources.size()
         cdef int source_loc
         cdef CPP_Gate* src_info
         cdef CPP_Gate* gate_infolist=self.location_ptr[0].data()
         cdef CPP_Gate* info = &gate_infolist[self.location]
         if info.type != VARIABLE_ID:
             for i in range(n):
-                source_loc = sources[i]
+                source_loc = sources[0][i]
                 if source_loc != -1:
                     src_info = &gate_infolist[source_loc]
                     src_info.hitlist.emplace_back(self.location, i, src_info.output)
@@ -283,6 +425,7 @@ cdef class Gate:
     cpdef bint setlimits(self, int size):
         '''Resize the input list; returns False if slots are in use and can't be trimmed'''
         cdef CPP_Gate* info = &self.location_ptr[0][self.location]
+        cdef vector[int]* sources = &self.gate_verse.sources[self.location]
         cdef int i
         cdef int current
         if size < 2 or info.type >= VARIABLE_ID:
@@ -290,16 +433,15 @@ cdef class Gate:
         current = info.inputlimit
 
         if size > current:
-            for _ in range(size - current):
-                self._sources.append(-1)
+            sources.resize(size, -1)
             info.inputlimit = size
             self.process()
             return True
         elif size < current:
             for i in range(size, current):
-                if self._sources[i] != -1:
+                if sources[0][i] != -1:
                     return False
-            self._sources = self._sources[:size]
+            sources.resize(size)
             info.inputlimit = size
             self.process()
             return True
@@ -320,7 +462,7 @@ cdef class Gate:
             self.id,
             self.location,
             info.inputlimit,
-            info.value if info.type == VARIABLE_ID else list(self._sources),
+            info.value if info.type == VARIABLE_ID else [src for src in self.gate_verse.sources[self.location]],
             ]
         return dictionary
 
@@ -333,7 +475,7 @@ cdef class Gate:
             self.id,
             self.location,
             info.inputlimit,
-            info.value if info.type == VARIABLE_ID else [src_loc if src_loc != -1 and gate_infolist[src_loc].mark else -1 for src_loc in self._sources],
+            info.value if info.type == VARIABLE_ID else [src_loc if src_loc != -1 and gate_infolist[src_loc].mark else -1 for src_loc in self.gate_verse.sources[self.location]],
             ]
         return dictionary
 
@@ -1,10 +1,11 @@
 # distutils: language = c++
 from libcpp.vector cimport vector
-from Gates cimport Gate, Profile,CPP_Gate
+from Gates cimport Gate, Profile,CPP_Gate,ProfilePool,GateVerse
 from libcpp.unordered_map cimport unordered_map
 cdef class IC:  
     cdef public list inputs
-    cdef public list internal
+    cdef vector[int] interior  # locations of the internal gates, wrapped only on access
+    cdef public list nested    # internal ICs
     cdef public list outputs
     cdef public str codename
     cdef public str custom_name
@@ -14,7 +15,12 @@ cdef class IC:
     cdef public str tag
     cdef public str description
     cdef vector[CPP_Gate]* gate_infolist_ptr
-    cdef public list gate_verse
+    cdef ProfilePool* pool  # the owning circuit's hitlist pool
+    cdef public GateVerse gate_verse
+    cdef object __weakref__
+
+    cdef vector[int] locations(self)
+    cdef void relocate(self, const int* hash_map, int limit)
 
     cpdef object getcomponent(self, int choice)
     cpdef void addgate(self, object source)
@@ -24,6 +30,7 @@ cdef class IC:
     cpdef list partial_data(self)
     cpdef void clone(self, unordered_map[int,int]& pseudo)
     cpdef void implement(self, unordered_map[int,int]& pseudo)
+    cdef void wire(self, unordered_map[int,int]& pseudo)
     cpdef void hide(self)
     cpdef void reveal(self)
     cpdef void reset(self)
@@ -4,8 +4,10 @@
 # cython: initializedcheck=False
 # cython: cdivision=True
 # cython: nonecheck=False
-from Gates cimport Gate, Probe, Profile, CPP_Gate, hide, reveal, pop, vector,CPP_Gate,vector
-from Store cimport get, decode
+from Gates cimport Gate, GateVerse, Probe, Profile, CPP_Gate, hide, reveal, pop, vector,CPP_Gate,vector
+from Gates cimport reset as reset_gate
+from Gates cimport process as process_gate
+from Store cimport get, place, decode
 from Const cimport *
 from cpython.list cimport PyList_GET_SIZE, PyList_GET_ITEM
 from libcpp.unordered_map cimport unordered_map
@@ -15,8 +17,8 @@ cdef class IC:
         self.id = IC_ID
     def __init__(self, int id, str name):
         self.inputs = []
-        self.internal = []
         self.outputs = []
+        self.nested = []
 
         self.codename = name
         self.custom_name = ''
@@ -25,6 +27,7 @@ cdef class IC:
         self.tag = ''
         self.description = ''
         self.gate_infolist_ptr=NULL
+        self.pool=NULL
 
     def __repr__(self):
         return self.codename if self.custom_name == '' else self.custom_name
@@ -32,9 +35,57 @@ cdef class IC:
     def __str__(self):
         return self.codename if self.custom_name == '' else self.custom_name
 
+    @property
+    def internal(self):
+        '''The internal gates, wrapped on demand, followed by the nested ICs'''
+        cdef list gates = []
+        cdef Gate gate
+        cdef int rank, loc
+        for rank in range(self.interior.size()):
+            loc = self.interior[rank]
+            if loc == -1:
+                continue # purged with the IC
+            gate = self.gate_verse.get(loc)
+            if not gate.code:
+                kind = gate.id if gate.id >= 0 else -gate.id - 1
+                gate.codename = self.gate_verse.names[kind] + '-' + str(rank)
+                gate.code = (kind, rank, self.code)
+            gates.append(gate)
+        return gates + self.nested
+
+    cdef vector[int] locations(self):
+        '''locations of every gate of the IC and of its nested ICs, pins first'''
+        cdef vector[int] locations
+        cdef Gate pin
+        cdef IC ic
+        for pin in self.outputs + self.inputs:
+            locations.push_back(pin.location)
+        for loc in self.interior:
+            if loc != -1:
+                locations.push_back(loc)
+        for ic in self.nested:
+            for loc in ic.locations():
+                locations.push_back(loc)
+        return locations
+
+    cdef void relocate(self, const int* hash_map, int limit):
+        '''follow optimize/refresh: map the interior through hash_map (NULL keeps it)
+        and drop locations at or beyond limit'''
+        cdef size_t i
+        cdef int loc
+        for i in range(self.interior.size()):
+            loc = self.interior[i]
+            if loc == -1:
+                continue
+            if hash_map != NULL:
+                loc = hash_map[loc]
+            self.interior[i] = loc if loc < limit else -1
+        for ic in self.nested:
+            (<IC>ic).relocate(hash_map, limit)
+
     cpdef object getcomponent(self, int choice):
         '''Get a gate from the store and register it under the right pin group'''
-        cdef object gt = get(choice, self.gate_infolist_ptr[0],self.gate_verse)
+        cdef object gt = get(choice, self.gate_infolist_ptr[0],self.gate_verse,self.pool)
         if gt:
             if gt.id == INPUT_PIN_ID:
                 rank = len(self.inputs)
@@ -42,9 +93,12 @@ cdef class IC:
             elif gt.id == OUTPUT_PIN_ID:
                 rank = len(self.outputs)
                 self.outputs.append(gt)
+            elif gt.id == IC_ID:
+                rank = len(self.nested)
+                self.nested.append(gt)
             else:
-                rank = len(self.internal)
-                self.internal.append(gt)
+                rank = self.interior.size()
+                self.interior.push_back(gt.location)
             gt.codename = gt.codename + '-' + str(rank)
             gt.code = (choice, rank, self.code)
         return gt
@@ -58,11 +112,14 @@ cdef class IC:
         elif source.id == OUTPUT_PIN_ID:
             rank = len(self.outputs)
             self.outputs.append(source)
+        elif source.id == IC_ID:
+            rank = len(self.nested)
+            self.nested.append(source)
         else:
-            rank = len(self.internal)
-            self.internal.append(source)
+            rank = self.interior.size()
+            self.interior.push_back(source.location)
         source.codename = source.codename + '-' + str(rank)
-        source.code = (source.code[0], rank, self.code)
+        source.code = (source.id, rank, self.code)
 
     cpdef void configure(self, list dictionary):
         '''Load an IC from its serialised data and wire everything up. 
@@ -85,27 +142,70 @@ cdef class IC:
         creates configures location of gates current vs. old location in info'''
         cdef Gate gate
         cdef list comp_code
+        cdef int kind, loc
         for comp_code in dictionary[MAP]:
-            gate = self.getcomponent(comp_code[ID])
-            pseudo[comp_code[LOCATION]] = gate.location
+            kind = comp_code[ID]
+            if kind == INPUT_PIN_ID or kind == OUTPUT_PIN_ID:
+                gate = self.getcomponent(kind)
+                loc = gate.location
+            else: # internal gates get no wrapper until someone asks for one
+                loc = place(kind, self.gate_infolist_ptr[0], self.gate_verse, self.pool)
+                self.interior.push_back(loc)
+            pseudo[comp_code[LOCATION]] = loc
 
     cpdef void clone(self, unordered_map[int,int]& pseudo):
         '''Wire up each internal gate using the location map built during load
         actually the second phase of generation.
         '''
-        cdef Gate gate
-        for i in self.map:
-            gate = <Gate>self.gate_verse[pseudo[i[LOCATION]]]
-            gate.clone(i, pseudo)
+        self.wire(pseudo)
+
+    cdef void wire(self, unordered_map[int,int]& pseudo):
+        '''Gate.clone for every entry of the map, written straight into the source slots,
+        hitlists and books so no wrapper is built for the internal gates'''
+        cdef CPP_Gate* gate_infolist = self.gate_infolist_ptr[0].data()
+        cdef CPP_Gate* info
+        cdef CPP_Gate* src_info
+        cdef vector[int]* sources
+        cdef GateVerse verse = self.gate_verse
+        cdef list entry
+        cdef str name
+        cdef int loc, src, index, limit
+        for entry in self.map:
+            loc = pseudo[entry[LOCATION]]
+            info = &gate_infolist[loc]
+            name = entry[CUSTOM_NAME]
+            if name:
+                verse.rename(loc, name)
+            if info.type == VARIABLE_ID:
+                info.value = entry[VALUE]
+                continue
+            sources = &verse.sources[loc]
+            limit = entry[INPUTLIMIT]
+            if info.type < VARIABLE_ID and limit > info.inputlimit: # fresh slots are all empty
+                sources.resize(limit, -1)
+                info.inputlimit = limit
+            index = 0
+            for source in entry[SOURCES]:
+                if source != -1 and sources[0][index] == -1:
+                    src = pseudo[source]
+                    src_info = &gate_infolist[src]
+                    if src_info.output == UNKNOWN:
+                        process_gate(gate_infolist, verse, src)
+                    src_info.hitlist.emplace_back(loc, index, src_info.output)
+                    sources[0][index] = src
+                    if info.type < VARIABLE_ID:
+                        info.book[src_info.output] += 1
+                index += 1
+            process_gate(gate_infolist, verse, loc)
 
     cpdef void load_to_cluster(self, list cluster):
         '''Mark all internal gates as scheduled and collect them into the cluster list
         for copy paste'''
         cdef CPP_Gate* gate_infolist = self.gate_infolist_ptr[0].data()
-        cdef Gate i
-        for i in self.outputs + self.inputs + self.internal:
-            cluster.append(i.location)
-            gate_infolist[i.location].mark = True
+        cdef int loc
+        for loc in self.locations():
+            cluster.append(loc)
+            gate_infolist[loc].mark = True
 
     cpdef list full_data(self):
         '''Serialise the IC with full connection info, used for saving the parent circuit'''
@@ -135,11 +235,7 @@ cdef class IC:
 
     cpdef void implement(self, unordered_map[int,int]& pseudo):
         '''Wire up the IC's gates into the parent circuit using the resolved location map'''
-        cdef Gate gate
-        cdef tuple code
-        for i in self.map:
-            gate = <Gate>PyList_GET_ITEM(self.gate_verse, pseudo[i[LOCATION]])
-            gate.clone(i, pseudo)
+        self.wire(pseudo)
 
     cpdef void hide(self):
         '''Cut the IC out of the live graph — disconnects output targets and drops input registrations'''
@@ -161,7 +257,7 @@ cdef class IC:
 
         # Disconnect inputs from external sources
         for pin_in in self.inputs:
-            for index, source_loc in enumerate(<list>pin_in._sources):
+            for index, source_loc in enumerate(self.gate_verse.sources[pin_in.location]):
                 if source_loc != -1:
                     src_info = &gate_infolist[source_loc]
                     pop(src_info.hitlist,gate_infolist, pin_in.location, index)
@@ -180,7 +276,7 @@ cdef class IC:
         cdef int source_loc
         for pin_in in self.inputs:
             pin_in_info = &gate_infolist[pin_in.location]
-            source_loc = pin_in._sources[0]
+            source_loc = self.gate_verse.sources[pin_in.location][0]
             if source_loc != -1:
                 src_info = &gate_infolist[source_loc]
                 src_info.hitlist.emplace_back(pin_in.location, 0, src_info.output)
@@ -196,13 +292,10 @@ cdef class IC:
 
     cpdef void reset(self):
         '''Reset all internal gates back to unknown state'''
-        cdef Gate g
-        for i in self.inputs + self.internal + self.outputs:
-            if i.id != IC_ID:
-                g = <Gate>i
-                g.reset()
-            else:
-                (<IC>i).reset()
+        cdef CPP_Gate* gate_infolist = self.gate_infolist_ptr[0].data()
+        cdef int loc
+        for loc in self.locations():
+            reset_gate(&gate_infolist[loc])
 
     cpdef void showinputpins(self):
         '''Print the IC's input pins with their index'''
@@ -220,7 +313,7 @@ cdef class IC:
         cdef CPP_Gate* pin_info
         cdef Profile* p
         cdef Profile* pend
-        cdef list gate_verse = self.gate_verse
+        cdef GateVerse gate_verse = self.gate_verse
         print(f"\n  IC: {self.codename} (Code: {self.code})")
         print("  " + "-" * 40)
         cdef CPP_Gate* gate_infolist = self.gate_infolist_ptr[0].data()
@@ -232,7 +325,7 @@ cdef class IC:
                 p = pin_info.hitlist.data()
                 pend = p + pin_info.hitlist.size()
                 while p < pend:
-                    targets.append(str(<Gate>PyList_GET_ITEM(gate_verse, p.target)))
+                    targets.append(str(gate_verse.get(p.target)))
                     p += 1
                 print(f"    {pin.codename}: out={pin.getoutput()}, to={', '.join(targets) if targets else 'None'}")
 
@@ -249,7 +342,7 @@ cdef class IC:
                 p = pin_info.hitlist.data()
                 pend = p + pin_info.hitlist.size()
                 while p < pend:
-                    tgt.append(str(<Gate>PyList_GET_ITEM(gate_verse, p.target)))
+                    tgt.append(str(gate_verse.get(p.target)))
                     p += 1
                 tgt_str = ", ".join(tgt) if tgt else "None"
                 print(f"    {pin.codename}: out={pin.getoutput()}, sources={ch_str}, targets={tgt_str}")
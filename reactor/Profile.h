@@ -3,6 +3,12 @@
 #define PROFILE_H
 #include <vector>
 #include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+#include <new>
+#ifdef __linux__
+#include <sys/mman.h>
+#endif
 
 struct Profile {
     int target;
@@ -15,6 +21,209 @@ struct Profile {
     }
 };
 
+// ─── Huge pages ───────────────────────────────────────────────────────────
+// Ask Linux to back the 2 MB-aligned interior of a buffer with transparent
+// huge pages. Returns 1 when the advice was taken, 0 anywhere else (silent fallback).
+static const size_t HUGE_PAGE = (size_t)2 << 20;
+
+static inline int advise_hugepages(void* ptr, size_t bytes) {
+#if defined(__linux__) && defined(MADV_HUGEPAGE)
+    uintptr_t start = ((uintptr_t)ptr + HUGE_PAGE - 1) & ~(uintptr_t)(HUGE_PAGE - 1);
+    uintptr_t stop = ((uintptr_t)ptr + bytes) & ~(uintptr_t)(HUGE_PAGE - 1);
+    if (!ptr || stop <= start) return 0;
+    return madvise((void*)start, stop - start, MADV_HUGEPAGE) == 0;
+#else
+    (void)ptr; (void)bytes;
+    return 0;
+#endif
+}
+
+static inline int hugepages_supported() {
+#if defined(__linux__) && defined(MADV_HUGEPAGE)
+    return 1;
+#else
+    return 0;
+#endif
+}
+
+// ─── ProfilePool ──────────────────────────────────────────────────────────
+// Per-circuit slab allocator for hitlist storage.
+// Blocks hold a power-of-two number of profiles (class c = 2^c profiles);
+// released blocks are chained on the free list of their class and reused.
+// Slabs start small and double up to SLAB_MAX, so tiny circuits stay tiny.
+// In huge mode new slabs are whole, aligned huge pages.
+static_assert(sizeof(Profile) >= sizeof(void*), "free blocks store a pointer");
+
+class ProfilePool {
+public:
+    static const int CLASSES = 32;
+    static const size_t SLAB_MIN = 4096;
+    static const size_t SLAB_MAX = 1 << 20;
+
+    ProfilePool() : cursor(nullptr), limit(nullptr), next_slab(SLAB_MIN), huge(false) {
+        for (int i = 0; i < CLASSES; i++) free_lists[i] = nullptr;
+    }
+    ~ProfilePool() { reset(); }
+
+    Profile* allocate(uint32_t cls) {
+        Block* block = free_lists[cls];
+        if (block) {
+            free_lists[cls] = block->next;
+            return reinterpret_cast<Profile*>(block);
+        }
+        size_t bytes = sizeof(Profile) << cls;
+        if ((size_t)(limit - cursor) < bytes) grow(bytes);
+        Profile* profile = reinterpret_cast<Profile*>(cursor);
+        cursor += bytes;
+        return profile;
+    }
+    void release(Profile* profile, uint32_t cls) {
+        Block* block = reinterpret_cast<Block*>(profile);
+        block->next = free_lists[cls];
+        free_lists[cls] = block;
+    }
+    // drop every slab at once; only valid when no hitlist still uses the pool
+    void reset() {
+        for (size_t i = 0; i < slabs.size(); i++) free(slabs[i]);
+        slabs.clear();
+        for (int i = 0; i < CLASSES; i++) free_lists[i] = nullptr;
+        cursor = limit = nullptr;
+        next_slab = SLAB_MIN;
+        footprint = 0;
+    }
+    size_t bytes() const { return footprint; }
+    void set_huge(bool on) { huge = on && hugepages_supported(); }
+
+private:
+    struct Block { Block* next; };
+    void grow(size_t bytes) {
+        size_t size = next_slab > bytes ? next_slab : bytes;
+        char* slab = nullptr;
+#ifdef __linux__
+        if (huge) {
+            size = (size + HUGE_PAGE - 1) & ~(HUGE_PAGE - 1);
+            void* aligned = nullptr;
+            if (posix_memalign(&aligned, HUGE_PAGE, size) == 0) {
+                slab = static_cast<char*>(aligned);
+                advise_hugepages(slab, size);
+            }
+        }
+#endif
+        if (!slab) slab = static_cast<char*>(malloc(size));
+        if (!slab) throw std::bad_alloc();
+        slabs.push_back(slab);
+        cursor = slab;
+        limit = slab + size;
+        footprint += size;
+        if (next_slab < SLAB_MAX) next_slab <<= 1;
+    }
+    Block* free_lists[CLASSES];
+    std::vector<char*> slabs;
+    char* cursor;
+    char* limit;
+    size_t next_slab;
+    bool huge;
+    size_t footprint = 0;
+};
+
+// ─── HitList ──────────────────────────────────────────────────────────────
+// Small-vector list of outgoing Profiles. Up to INLINE profiles live inside
+// the gate itself; larger fan-outs spill to a block from the circuit's
+// ProfilePool (plain malloc when no pool is bound). Heap capacity is a power
+// of two. Copies allocate from the source's pool, moves steal the block.
+class HitList {
+public:
+    static const uint32_t INLINE = 4;   // keeps CPP_Gate at 64 bytes
+
+    HitList(ProfilePool* p = nullptr) : count(0), cap(INLINE), pool(p) {}
+    HitList(const HitList& other) : count(0), cap(INLINE), pool(other.pool) { assign(other); }
+    HitList(HitList&& other) noexcept : count(0), cap(INLINE), pool(other.pool) { steal(other); }
+    ~HitList() { drop(); }
+
+    HitList& operator=(const HitList& other) {
+        if (this != &other) { drop(); pool = other.pool; assign(other); }
+        return *this;
+    }
+    HitList& operator=(HitList&& other) noexcept {
+        if (this != &other) { drop(); pool = other.pool; steal(other); }
+        return *this;
+    }
+
+    Profile* data() { return cap > INLINE ? heap : reinterpret_cast<Profile*>(local); }
+    const Profile* data() const { return cap > INLINE ? heap : reinterpret_cast<const Profile*>(local); }
+    int size() const { return (int)count; }
+    bool empty() const { return count == 0; }
+    Profile* begin() { return data(); }
+    Profile* end() { return data() + count; }
+    Profile& operator[](int i) { return data()[i]; }
+
+    void push_back(const Profile& profile) {
+        if (count == cap) regrow(count + 1);
+        data()[count++] = profile;
+    }
+    void emplace_back(int target, uint8_t index, uint8_t output) {
+        if (count == cap) regrow(count + 1);
+        data()[count++] = Profile(target, index, output);
+    }
+    void pop_back() { count--; }
+    void clear() { count = 0; }
+    // take other's profiles into blocks of this list's own pool
+    void copy(const HitList& other) { drop(); assign(other); }
+
+private:
+    static uint32_t class_of(uint32_t n) {
+        uint32_t cls = 0;
+        while ((1u << cls) < n) cls++;
+        return cls;
+    }
+    Profile* take(uint32_t cls) {
+        if (pool) return pool->allocate(cls);
+        Profile* p = static_cast<Profile*>(malloc(sizeof(Profile) << cls));
+        if (!p) throw std::bad_alloc();
+        return p;
+    }
+    void give(Profile* p, uint32_t cls) {
+        if (pool) pool->release(p, cls);
+        else free(p);
+    }
+    void regrow(uint32_t n) {
+        if (n <= INLINE) return;
+        uint32_t cls = class_of(n);
+        Profile* fresh = take(cls);
+        if (count) memcpy(fresh, data(), count * sizeof(Profile));
+        if (cap > INLINE) give(heap, class_of(cap));
+        heap = fresh;
+        cap = 1u << cls;
+    }
+    void assign(const HitList& other) {
+        count = 0;
+        regrow(other.count);
+        if (other.count) memcpy(data(), other.data(), other.count * sizeof(Profile));
+        count = other.count;
+    }
+    void steal(HitList& other) {
+        if (other.cap > INLINE) heap = other.heap;
+        else memcpy(local, other.local, other.count * sizeof(Profile));
+        count = other.count;
+        cap = other.cap;
+        other.count = 0;
+        other.cap = INLINE;
+    }
+    void drop() {
+        if (cap > INLINE) give(heap, class_of(cap));
+        count = 0;
+        cap = INLINE;
+    }
+
+    union {
+        Profile* heap;
+        alignas(Profile) unsigned char local[INLINE * sizeof(Profile)];
+    };
+    uint32_t count;
+    uint32_t cap;
+    ProfilePool* pool;
+};
+
 // ─── Task ─────────────────────────────────────────────────────────────────
 // Scheduled propagation event for FLIPFLOP/clock mode.
 // Used in a min-heap (std::priority_queue with greater<Task>).
@@ -42,19 +251,33 @@ struct CPP_Gate {
     uint8_t scheduled;
     uint8_t mark;
     uint8_t update;
+    uint8_t observed;
     uint8_t inputlimit;
     uint8_t book[3];
-    std::vector<Profile> hitlist;
-    CPP_Gate() : type(0), output(2), value(0), scheduled(0), mark(0), update(0), inputlimit(2) {
+    uint8_t idle;       // outside the focused cone, never evaluated as a target
+    HitList hitlist;
+    CPP_Gate() : type(0), output(2), value(0), scheduled(0), mark(0), update(0), observed(0), inputlimit(2), idle(0) {
         book[0] = book[1] = book[2] = 0;
     }
-    CPP_Gate(uint8_t t, uint8_t lim) : type(t), inputlimit(lim) {
+    CPP_Gate(uint8_t t, uint8_t lim, ProfilePool* pool = nullptr) : type(t), inputlimit(lim), hitlist(pool) {
         book[0] = book[1] = book[2] = 0;
         output = 2;
         value = 0;
         scheduled = 0;
         mark = 0;
         update = 0;
+        observed = 0;
+        idle = 0;
+    }
+    // copy of other whose hitlist allocates from pool, for another circuit
+    CPP_Gate(const CPP_Gate& other, ProfilePool* pool) : type(other.type), output(other.output), value(other.value),
+        scheduled(other.scheduled), mark(other.mark), update(other.update), observed(other.observed),
+        inputlimit(other.inputlimit), idle(other.idle), hitlist(pool) {
+        book[0] = other.book[0];
+        book[1] = other.book[1];
+        book[2] = other.book[2];
+        hitlist.copy(other.hitlist);
     }
 };
+static_assert(sizeof(CPP_Gate) <= 64, "a gate should fit one cache line");
 #endif
\ No newline at end of file
@@ -1,5 +1,7 @@
-from Gates cimport CPP_Gate,vector
+from Gates cimport CPP_Gate,ProfilePool,GateVerse,vector
 from libc.stdint cimport uint8_t
 cdef tuple namelist
-cdef object get(int choice, vector[CPP_Gate]& gate_infolist, list gate_verse)
+cdef GateVerse verse(vector[CPP_Gate]& gate_infolist)
+cdef int place(int choice, vector[CPP_Gate]& gate_infolist, GateVerse gate_verse, ProfilePool* pool)
+cdef object get(int choice, vector[CPP_Gate]& gate_infolist, GateVerse gate_verse, ProfilePool* pool)
 cdef tuple decode(object code)
\ No newline at end of file
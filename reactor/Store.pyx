@@ -1,4 +1,4 @@
-from Gates cimport Gate,CPP_Gate,vector
+from Gates cimport Gate,CPP_Gate,ProfilePool,GateVerse,vector
 from libcpp.vector cimport vector
 from IC cimport IC
 from Const cimport *
@@ -17,26 +17,33 @@ cdef tuple namelist=(
     'IC',
 )
 
-cdef object get(int choice, vector[CPP_Gate]& gate_infolist, list gate_verse):
+cdef GateVerse verse(vector[CPP_Gate]& gate_infolist):
+    '''The gate_verse of a circuit whose gates live in gate_infolist'''
+    cdef GateVerse gate_verse = GateVerse()
+    gate_verse.infolist = &gate_infolist
+    gate_verse.names = namelist
+    return gate_verse
+
+cdef int place(int choice, vector[CPP_Gate]& gate_infolist, GateVerse gate_verse, ProfilePool* pool):
+    '''Add a gate of a given type to the gate_infolist and gate_verse without building its Python wrapper
+    returns its location'''
+    cdef uint8_t lim = 1 if choice >= VARIABLE_ID else 2
+    gate_infolist.emplace_back(CPP_Gate(choice, lim, pool))
+    return gate_verse.grow(lim)
+
+cdef object get(int choice, vector[CPP_Gate]& gate_infolist, GateVerse gate_verse, ProfilePool* pool):
     '''Get a gate of a given type and add it to the gate_infolist and gate_verse
-    for ICs, it does not add to gate_infolist or gate_verse, but instead just returns an IC object'''
-    cdef Gate gate
-    cdef uint8_t lim
+    for ICs, it does not add to gate_infolist or gate_verse, but instead just returns an IC object
+    hitlists draw their storage from the circuit's pool'''
     cdef IC ic
     if choice==IC_ID:
         ic = IC(choice,namelist[choice])
         ic.gate_infolist_ptr = &gate_infolist
+        ic.pool = pool
         ic.gate_verse = gate_verse
         return ic
     else:
-        gate = Gate(choice,namelist[choice])
-        lim = 1 if choice >= VARIABLE_ID else 2
-        gate_infolist.emplace_back(CPP_Gate(choice, lim))
-        gate.location = gate_infolist.size()-1
-        gate.location_ptr = &gate_infolist
-        gate.gate_verse = gate_verse
-        gate_verse.append(gate)
-        return gate
+        return gate_verse.get(place(choice, gate_infolist, gate_verse, pool))
 
 
 cdef tuple decode(object code):
@@ -46,12 +46,11 @@ from Const import AND_ID, XOR_ID, OR_ID, NOT_ID, VARIABLE_ID, HIGH, LOW, SIMULAT
 # =====================================================================
 
 def build_level_0_linear(circuit, target_gates, VARIABLE_ID, NOT_ID, XOR_ID, AND_ID=0):
-    master = circuit.getcomponent(VARIABLE_ID)
-    prev = master
-    for _ in range(target_gates - 1):
-        g = circuit.getcomponent(NOT_ID)
-        circuit.connect(g, prev, 0)
-        prev = g
+    # one native pass: gate 0 is the master, gate i is driven by gate i-1
+    types = np.full(target_gates, NOT_ID, dtype=np.int32)
+    types[0] = VARIABLE_ID
+    src = np.arange(target_gates - 1, dtype=np.int32)
+    master = circuit.build_from_arrays(types, None, src, src + 1, np.zeros(target_gates - 1, dtype=np.int32))[0]
     return master, target_gates, target_gates, "L0: Linear Chain"
 
 def build_level_1_parallel(circuit, target_gates, VARIABLE_ID, NOT_ID, XOR_ID, AND_ID=0):
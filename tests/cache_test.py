@@ -12,6 +12,7 @@ import random
 import argparse
 import platform
 import subprocess
+import signal
 import matplotlib.pyplot as plt
 import numpy as np
 
@@ -34,6 +35,7 @@ except ImportError:
 
 parser = argparse.ArgumentParser(description='Run High-Integrity Cache Profiler Comparison')
 parser.add_argument('--engine', action='store_true', help='Use Python engine backend (default: Reactor/Cython)')
+parser.add_argument('--hugepages', action='store_true', help='Compare 4 KB pages vs transparent huge pages (Linux) instead of the optimizer profile')
 args, unknown = parser.parse_known_args()
 
 base_dir = os.getcwd()
@@ -86,9 +88,11 @@ def get_cpu_info():
         pass
     return cpu_name, l2, l3
 
-def build_chain(active_size, mode='chaotic'):
+def build_chain(active_size, mode='chaotic', hugepages=False):
     """Builds a chain with configurable memory allocation modes."""
     c = Circuit()
+    if hugepages:
+        c.use_hugepages(True)
     first_gate = c.getcomponent(Const.VARIABLE_ID)
     
     const_high = c.getcomponent(Const.VARIABLE_ID)
@@ -318,6 +322,81 @@ async def main_profile():
     plots_dir = os.path.join(script_dir, 'benchmark_plots')
     generate_cache_plot(data_chaotic, data_realistic, cpu_name, plots_dir)
 
+def anon_hugepages_mb():
+    """Anonymous memory currently backed by huge pages (Linux only, 0 elsewhere)."""
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('AnonHugePages:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+def perf_available():
+    try:
+        subprocess.run(["perf", "--version"], capture_output=True, check=True)
+        return True
+    except (OSError, subprocess.CalledProcessError):
+        return False
+
+def measure_tlb(c, start_node, size, iterations):
+    """ns/eval plus dTLB load misses counted by `perf stat` attached to this process."""
+    perf = subprocess.Popen(
+        ["perf", "stat", "-x", ",", "-e", "dTLB-load-misses", "-p", str(os.getpid())],
+        stderr=subprocess.PIPE, text=True)
+    time.sleep(0.2) # let perf attach
+    ns = benchmark_pass(c, start_node, size, iterations)
+    perf.send_signal(signal.SIGINT)
+    _, err = perf.communicate()
+    for line in err.splitlines():
+        fields = line.split(',')
+        if len(fields) > 2 and 'dTLB-load-misses' in fields[2]:
+            try:
+                return ns, int(fields[0])
+            except ValueError:
+                break
+    return ns, None
+
+async def run_hugepage_suite():
+    """Chaotic chains large enough to outgrow the TLB, once on 4 KB pages and once on huge pages."""
+    print("\n[4 KB PAGES vs TRANSPARENT HUGE PAGES]")
+    if not use_reactor:
+        print("  The engine keeps Python objects, huge pages only apply to the Reactor.")
+        return
+    probe = Circuit()
+    if not probe.use_hugepages(True):
+        print("  Huge pages are not supported on this platform, nothing to compare.")
+        return
+    del probe
+    with_perf = perf_available()
+    if not with_perf:
+        print("  perf not found: reporting timings only.")
+
+    print("-" * 96)
+    print(f"{'Gates':<12} | {'4 KB ns/eval':<14} | {'Huge ns/eval':<14} | {'Speedup':<8} | {'4 KB dTLB miss':<15} | {'Huge dTLB miss':<15} | {'THP MB':<7}")
+    print("-" * 96)
+    for size in (100_000, 500_000, 1_000_000, 2_000_000):
+        iterations = max(1, 2_000_000 // size)
+        row = []
+        for huge in (False, True):
+            random.seed(size)
+            c, first = build_chain(size, 'chaotic', hugepages=huge)
+            thp = anon_hugepages_mb()
+            if with_perf:
+                ns, misses = measure_tlb(c, first, size, iterations)
+            else:
+                ns, misses = benchmark_pass(c, first, size, iterations), None
+            row.append((ns, misses, thp))
+            del c, first
+            gc.collect()
+            await asyncio.sleep(0)
+        (ns_4k, miss_4k, _), (ns_huge, miss_huge, thp) = row
+        speedup = ns_4k / ns_huge if ns_huge else 0.0
+        fmt = lambda m: f"{m:,}" if m is not None else "n/a"
+        print(f"{size:<12,} | {ns_4k:<14.2f} | {ns_huge:<14.2f} | {speedup:<7.2f}x | {fmt(miss_4k):<15} | {fmt(miss_huge):<15} | {thp:<7.0f}")
+    print("-" * 96)
+
 class _Tee:
     def __init__(self, *streams):
         self.streams = streams
@@ -336,7 +415,7 @@ if __name__ == "__main__":
         _orig = sys.stdout
         sys.stdout = _Tee(_orig, _lf)
         try:
-            asyncio.run(main_profile())
+            asyncio.run(run_hugepage_suite() if args.hugepages else main_profile())
         except KeyboardInterrupt:
             print("\n[!] Profiling Aborted by User.")
         finally:
@@ -8,9 +8,11 @@ import sys
 import os
 import gc
 import random
+import threading
 import platform
 import tempfile
 import json
+import array
 from collections import deque
 import unittest
 import io
@@ -65,6 +67,7 @@ import Const
 from Const import *
 from Gates import Gate, Variable, Probe
 from IC import IC
+from BDD import BDD
 from Control import Add, AddIC, Delete, Connect, Disconnect, Paste, Toggle, SetLimits, Rename
 
 Const.LIMIT = 100_000
@@ -277,6 +280,21 @@ class AggressiveTestSuite:
 
         await self.test_hide_reveal_stress()
         await self.test_reset_stress()
+        await self.test_drain_visual_queue()
+        await self.test_hitlist_collect()
+        await self.test_hitlist_pool()
+        await self.test_hugepages()
+        await self.test_build_from_arrays()
+        await self.test_batch()
+        await self.test_batched_hide()
+        await self.test_batch_toggle_wave()
+        await self.test_native_reset()
+        await self.test_structural_hash()
+        await self.test_cone_focus()
+        await self.test_netlist_evaluate()
+        await self.test_snapshot_restore()
+        await self.test_circuit_clone()
+        await self.test_bdd_symbolic()
         
         # ==================== PART 3: EVENT MANAGER STRESS ====================
         self.section("EVENT MANAGER")
@@ -295,6 +313,7 @@ class AggressiveTestSuite:
         await self.test_ic_reset()
         await self.test_ic_copy_paste()
         await self.test_ic_massive_internal()
+        await self.test_ic_lazy_internals()
         await self.test_ic_cascade()
         await self.test_ic_multi_output()
         await self.test_ic_stress_bulk()
@@ -312,6 +331,10 @@ class AggressiveTestSuite:
         await self.test_truth_table_6_inputs()
         await self.test_truth_table_8_inputs()
         await self.test_truth_table_10_inputs()
+        await self.test_truth_table_wide()
+        await self.test_truth_table_stream()
+        await self.test_truth_table_rows()
+        await self.test_truth_table_cache()
         await self.test_truth_table_complex()
         await self.test_truth_table_partial()
         
@@ -320,6 +343,8 @@ class AggressiveTestSuite:
             self.section("REFRESH / OPTIMIZE")
             await self.test_optimize_topological_order()
             await self.test_optimize_location_remap()
+            await self.test_optimize_relocation_map()
+            await self.test_fragmentation_defragment()
             await self.test_refresh_trims_trailing_deleted()
             await self.test_delobj_marks_negative_type()
             await self.test_delobj_counter_decrements()
@@ -1426,6 +1451,711 @@ class AggressiveTestSuite:
         c.reset()
         self.assert_test(Const.get_MODE() == Const.DESIGN, "Reset to DESIGN mode")
 
+    async def test_drain_visual_queue(self):
+        self.subsection("Visual Queue Drain")
+        c = Circuit()
+        c.simulate(Const.SIMULATE)
+        v = c.getcomponent(Const.VARIABLE_ID)
+        gates = [c.getcomponent(Const.NOT_ID) for _ in range(100)]
+        prev = v
+        for g in gates:
+            c.connect(g, prev, 0)
+            prev = g
+        # the last 10 gates have no widget watching them
+        watched = [v] + gates[:-10]
+        for g in watched:
+            c.observe(g, True)
+        self.assert_test(c.observers == len(watched), f"{len(watched)} observers registered")
+        c.visual_queue_clear()
+        c.toggle(v, Const.HIGH)
+        pending = c.visual_queue_size()
+        dirty = c.drain_visual_queue()
+        self.assert_test(len(dirty) == pending and c.visual_queue_empty(),
+            f"drain returns all {pending} dirty locations and empties the queue")
+        self.assert_test(set(dirty) == {g.location for g in watched},
+            "only observed gates are queued")
+
+        # update flags are cleared, so the next cascade re-queues everything
+        c.toggle(v, Const.LOW)
+        buffer = array.array('i', bytes(4 * 16))
+        count = c.drain_visual_queue(-1, buffer)
+        self.assert_test(count == 16 and c.visual_queue_size() == pending - 16,
+            f"caller buffer is filled up to its length ({count})")
+        rest = c.drain_visual_queue(10)
+        self.assert_test(len(rest) == 10, "max_items caps the drain")
+
+        c.drain_visual_queue()
+        c.observe(v, False)
+        c.toggle(v, Const.HIGH)
+        self.assert_test(v.location not in set(c.drain_visual_queue()),
+            "unsubscribed gate is no longer queued")
+
+    async def test_hitlist_collect(self):
+        self.subsection("Hitlist GC")
+        c = Circuit()
+        c.simulate(Const.SIMULATE)
+        v = c.getcomponent(Const.VARIABLE_ID)
+        live = c.getcomponent(Const.NOT_ID)
+        dead = c.getcomponent(Const.NOT_ID)
+        c.connect(live, v, 0)
+        c.connect(dead, v, 0)
+        c.toggle(v, Const.HIGH)
+
+        c.delobj(dead)
+        self.assert_test(c.collect(True) == 1, "collect drops the profile of the deleted gate")
+        self.assert_test(c.collect() == 0, "nothing left to collect")
+        before = c.eval_count
+        c.toggle(v, Const.LOW)
+        self.assert_test(c.eval_count - before == 1, f"propagation skips the collected profile ({c.eval_count - before} evals)")
+        self.assert_test(live.getoutput() == 'T', "live neighbour still follows the source")
+
+        c.renewobj(dead)
+        c.toggle(v, Const.HIGH)
+        c.toggle(v, Const.LOW)
+        self.assert_test(dead.getoutput() == 'T', "renewed gate gets its stashed profile back")
+
+    async def test_hitlist_pool(self):
+        self.subsection("Hitlist Storage")
+        # many throwaway circuits must stay cheap
+        t0 = time.perf_counter()
+        small = [Circuit() for _ in range(500)]
+        elapsed = time.perf_counter() - t0
+        self.assert_test(elapsed < 1.0, f"500 empty circuits in {elapsed*1000:.0f} ms")
+        del small
+
+        c = Circuit()
+        c.simulate(Const.SIMULATE)
+        c.reserve(1001)
+        v = c.getcomponent(Const.VARIABLE_ID)
+        fan = [c.getcomponent(Const.NOT_ID) for _ in range(1000)]
+        for g in fan:
+            c.connect(g, v, 0)   # the hitlist grows through every size class
+        for g in fan[::2]:
+            c.disconnect(g, 0)   # and shrinks by swap-and-pop
+        c.toggle(v, Const.HIGH)
+        self.assert_test(all(g.getoutput() == 'F' for g in fan[1::2]), "connected targets follow the source")
+        self.assert_test(all(g.getoutput() == 'X' for g in fan[::2]), "disconnected targets are left alone")
+        c.optimize()
+        c.toggle(v, Const.LOW)
+        self.assert_test(all(g.getoutput() == 'T' for g in fan[1::2]), "hitlists survive optimize")
+
+    async def test_hugepages(self):
+        self.subsection("Huge Page Backing")
+        c = Circuit()
+        supported = c.use_hugepages(True)
+        if use_reactor:
+            self.assert_test(supported == (platform.system() == 'Linux'), f"huge pages are honoured on Linux ({supported})")
+        else:
+            self.assert_test(supported is False, "the engine has no flat arrays to back")
+        c.simulate(Const.SIMULATE)
+        c.reserve(20001)
+        v = c.getcomponent(Const.VARIABLE_ID)
+        prev = v
+        for _ in range(20000):
+            g = c.getcomponent(Const.NOT_ID)   # grows past several huge pages
+            c.connect(g, prev, 0)
+            prev = g
+        c.toggle(v, Const.HIGH)
+        self.assert_test(prev.getoutput() == 'T', "chain settles with huge pages requested")
+        c.optimize()
+        c.toggle(v, Const.LOW)
+        self.assert_test(prev.getoutput() == 'F', "chain settles after optimize")
+        self.assert_test(c.use_hugepages(False) is False, "huge pages can be switched off")
+
+        # one variable fanning out to 200k targets grows its hitlist past a 2 MB page
+        n = 200000
+        outputs = []
+        for huge in (supported, False):
+            d = Circuit()
+            d.use_hugepages(huge)
+            d.simulate(Const.SIMULATE)
+            gates = d.build_from_arrays([Const.VARIABLE_ID] + [Const.NOT_ID] * n, None, [0] * n, range(1, n + 1), [0] * n)
+            d.toggle(gates[0], Const.HIGH)
+            outputs.append([g.output for g in gates])
+            if use_reactor and huge:
+                footprint = d.hitlist_bytes
+                self.assert_test(footprint >= 2 << 20 and footprint % (2 << 20) == 0, f"the pool takes whole huge pages ({footprint} bytes)")
+        self.assert_test(outputs[0] == outputs[1], "huge and normal pages give the same results")
+
+    async def test_build_from_arrays(self):
+        self.subsection("Bulk Build From Arrays")
+        c = Circuit()
+        c.simulate(Const.SIMULATE)
+        # A, B, C -> AND3 -> NOT -> probe, and A, B -> XOR
+        types = array.array('i', [Const.VARIABLE_ID] * 3 + [Const.AND_ID, Const.NOT_ID, Const.PROBE_ID, Const.XOR_ID])
+        limits = [1, 1, 1, 3, 1, 1, 2]
+        src = [0, 1, 2, 3, 4, 0, 1]
+        dst = [3, 3, 3, 4, 5, 6, 6]
+        pin = [0, 1, 2, 0, 0, 0, 1]
+        c.build_from_arrays(types, limits, src, dst, pin)
+        a, b, v3 = c.get_variables()
+        probe = c.objlist[Const.PROBE_ID][0]
+        self.assert_test(len(c.get_variables()) == 3 and probe.id == Const.PROBE_ID, "I/O gates are listed")
+        self.assert_test(probe.getoutput() == 'T', "settled once at the end: NOT(AND(0,0,0))")
+        for v in (a, b, v3):
+            c.toggle(v, Const.HIGH)
+        self.assert_test(probe.getoutput() == 'F', "3-input AND wired from input_limits")
+        c.toggle(v3, Const.LOW)
+        self.assert_test(probe.getoutput() == 'T', "third pin is live")
+        self.assert_test(len(c.get_components()) == len(types), "logic gates are listed too")
+
+        temp_file = os.path.join(tempfile.gettempdir(), "test_bulk.json")
+        c.writetojson(temp_file)
+        loaded = Circuit()
+        loaded.readfromjson(temp_file)
+        os.remove(temp_file)
+        loaded.simulate(Const.SIMULATE)
+        self.assert_test(loaded.structural_hash() == c.structural_hash(), "a bulk-built circuit saves and reloads whole")
+        for v in loaded.get_variables():
+            loaded.toggle(v, Const.HIGH)
+        self.assert_test(loaded.objlist[Const.PROBE_ID][0].getoutput() == 'F', "the reloaded circuit is wired")
+
+        before = len(c.get_components())
+        for bad in ([0], [99], [0]), ([0], [4], [1]), ([3], [0], [0]):
+            try:
+                c.build_from_arrays(types, limits, *bad)
+                ok = False
+            except ValueError:
+                ok = True
+            self.assert_test(ok, f"bad edge {bad} raises ValueError")
+        try:
+            c.build_from_arrays([Const.VARIABLE_ID, Const.NOT_ID], None, [0, 0], [1, 1], [0, 0])
+            ok = False
+        except ValueError:
+            ok = True
+        self.assert_test(ok, "a pin wired twice raises ValueError")
+        self.assert_test(len(c.get_components()) == before, "rejected batches leave the circuit untouched")
+
+        # a 20k NOT chain with one variable at the head
+        n = 20000
+        d = Circuit()
+        d.simulate(Const.SIMULATE)
+        d.build_from_arrays([Const.VARIABLE_ID] + [Const.NOT_ID] * (n - 1) + [Const.PROBE_ID], None,
+                            range(n), range(1, n + 1), [0] * n)
+        head, tail = d.get_variables()[0], d.objlist[Const.PROBE_ID][0]
+        d.toggle(head, Const.HIGH)
+        self.assert_test(tail.getoutput() == 'F', "long chain propagates after a bulk build")
+
+    async def test_batch(self):
+        self.subsection("Deferred Propagation Batch")
+        n = 1000
+        c = Circuit()
+        c.simulate(Const.SIMULATE)
+        v = c.getcomponent(Const.VARIABLE_ID)
+        c.toggle(v, Const.HIGH)
+        gates = c.build_from_arrays([Const.NOT_ID] * n + [Const.PROBE_ID], None,
+                                    range(n), range(1, n + 1), [0] * n)
+        head = gates[0]
+        probe = c.objlist[Const.PROBE_ID][0]
+
+        before = c.eval_count
+        for _ in range(5):
+            c.connect(head, v, 0)
+            c.disconnect(head, 0)
+        c.connect(head, v, 0)
+        immediate = c.eval_count - before
+        self.assert_test(probe.getoutput() == 'T', "immediate edits settle the chain")
+
+        c.disconnect(head, 0)
+        before = c.eval_count
+        with c.batch():
+            with c.batch():
+                for _ in range(5):
+                    c.connect(head, v, 0)
+                    c.disconnect(head, 0)
+            self.assert_test(probe.getoutput() == 'X', "nested exit leaves the batch open")
+            c.connect(head, v, 0)
+        batched = c.eval_count - before
+        self.assert_test(probe.getoutput() == 'T', "one wave on exit matches immediate mode")
+        self.assert_test(batched <= n + 1 and immediate > 10 * n, f"batched {batched} evals vs {immediate} immediate")
+
+        with c.batch():
+            c.disconnect(head, 0)
+            self.assert_test(probe.getoutput() == 'T', "disconnect is deferred inside a batch")
+        self.assert_test(probe.getoutput() == 'X', "deferred disconnect settles on exit")
+
+    async def test_batched_hide(self):
+        self.subsection("Batched Hide/Reveal")
+        k, m = 100, 300
+        def build():
+            c = Circuit()
+            c.simulate(Const.SIMULATE)
+            v = c.getcomponent(Const.VARIABLE_ID)
+            wide = c.getcomponent(Const.OR_ID)
+            c.setlimits(wide, k)
+            fan = []
+            for i in range(k):
+                g = c.getcomponent(Const.NOT_ID)
+                c.connect(g, v, 0)
+                c.connect(wide, g, i)
+                fan.append(g)
+            prev = wide
+            for _ in range(m):
+                g = c.getcomponent(Const.NOT_ID)
+                c.connect(g, prev, 0)
+                prev = g
+            probe = c.getcomponent(Const.PROBE_ID)
+            c.connect(probe, prev, 0)
+            return c, v, fan, probe
+
+        c, v, fan, probe = build()
+        self.assert_test(probe.getoutput() == 'T', "fan-in circuit settles")
+        before = c.eval_count
+        c.hide(fan)
+        batched = c.eval_count - before
+        self.assert_test(probe.getoutput() == 'X', "hiding the fan turns the probe unknown")
+        self.assert_test(c.hidden == k if use_reactor else True, "hidden count follows the selection")
+        c.reveal(fan)
+        self.assert_test(probe.getoutput() == 'T', "revealing the fan restores the probe")
+        c.toggle(v, Const.HIGH)
+        self.assert_test(probe.getoutput() == 'F', "revealed fan is live")
+
+        d, _, fan, _ = build()
+        before = d.eval_count
+        for g in fan:
+            d.hide([g])
+        self.assert_test(batched <= d.eval_count - before, f"one wave for the selection ({batched} evals)")
+
+    async def test_batch_toggle_wave(self):
+        self.subsection("Batch Toggle Single Wave")
+        n, depth = 16, 200
+        def build():
+            c = Circuit()
+            c.simulate(Const.SIMULATE)
+            vs = [c.getcomponent(Const.VARIABLE_ID) for _ in range(n)]
+            # every input reaches a shared XOR ladder, so their cones overlap
+            prev = vs[0]
+            for v in vs[1:]:
+                g = c.getcomponent(Const.XOR_ID)
+                c.connect(g, prev, 0)
+                c.connect(g, v, 1)
+                prev = g
+            for _ in range(depth):
+                g = c.getcomponent(Const.NOT_ID)
+                c.connect(g, prev, 0)
+                prev = g
+            return c, vs, prev
+
+        c, vs, tail = build()
+        d, ws, tail2 = build()
+        before = c.eval_count
+        c.batch_toggle([(v.location, Const.HIGH) for v in vs[:-1]])
+        batched = c.eval_count - before
+        before = d.eval_count
+        for w in ws[:-1]:
+            d.toggle(w, Const.HIGH)
+        single = d.eval_count - before
+        self.assert_test(tail.getoutput() == tail2.getoutput(), "one wave settles like per-input toggles")
+        self.assert_test(batched < single, f"overlapping cones walked once ({batched} vs {single} evals)")
+
+        d.simulate(Const.SIMULATE)
+        self.assert_test(tail2.getoutput() == tail.getoutput(), "simulate() seeds every variable in one wave")
+        c.batch_toggle([(vs[-1].location, Const.HIGH)])
+        self.assert_test(tail.getoutput() != tail2.getoutput(), "last input flips the parity")
+
+    async def test_native_reset(self):
+        self.subsection("Native Reset")
+        n = 1000
+        c = Circuit()
+        c.simulate(Const.SIMULATE)
+        gates = c.build_from_arrays([Const.VARIABLE_ID] + [Const.NOT_ID] * n, None,
+                                    range(n), range(1, n + 1), [0] * n)
+        c.toggle(gates[0], Const.HIGH)
+        self.assert_test(gates[n].getoutput() == 'T', "chain settles before reset")
+        c.reset()
+        self.assert_test(Const.get_MODE() == Const.DESIGN, "reset returns to DESIGN mode")
+        self.assert_test(all(gate.getoutput() == 'X' for gate in gates[1:]), "every gate is reset")
+        c.simulate(Const.SIMULATE)
+        self.assert_test(gates[n].getoutput() == 'T', "chain resimulates after reset")
+
+    async def test_structural_hash(self):
+        self.subsection("Structural Hash")
+
+        def half_adder(flip, spare, swap=False):
+            c = Circuit()
+            for _ in range(spare):
+                c.delobj(c.getcomponent(Const.NOT_ID)) # shifts every later location
+            a = c.getcomponent(Const.VARIABLE_ID)
+            b = c.getcomponent(Const.VARIABLE_ID)
+            kinds = [Const.AND_ID, Const.XOR_ID] if flip else [Const.XOR_ID, Const.AND_ID]
+            gates = {kind: c.getcomponent(kind) for kind in kinds}
+            for gate in gates.values():
+                c.connect(gate, b if flip else a, 0)
+                c.connect(gate, a if flip else b, 1)
+            total = c.getcomponent(Const.OUTPUT_PIN_ID)
+            carry = c.getcomponent(Const.OUTPUT_PIN_ID)
+            c.connect(total, gates[Const.AND_ID if swap else Const.XOR_ID], 0)
+            c.connect(carry, gates[Const.XOR_ID if swap else Const.AND_ID], 0)
+            c.simulate(Const.SIMULATE)
+            return c, a, gates, total
+
+        c, a, gates, total = half_adder(False, 0)
+        h = c.structural_hash()
+        twin = half_adder(True, 3)[0]
+        self.assert_test(twin.structural_hash() == h, "creation order, pin order and locations do not change the hash")
+        self.assert_test(half_adder(False, 0, swap=True)[0].structural_hash() != h, "output pin order changes the hash")
+
+        revision = c.revision
+        c.toggle(a, Const.HIGH)
+        self.assert_test(c.revision == revision and c.structural_hash() == h, "toggling is not a structural edit")
+        c.disconnect(gates[Const.XOR_ID], 0)
+        self.assert_test(c.revision != revision and c.structural_hash() != h, "disconnect changes the hash")
+        c.connect(gates[Const.XOR_ID], a, 0)
+        self.assert_test(c.structural_hash() == h, "reconnecting restores the hash")
+        c.setlimits(gates[Const.AND_ID], 3)
+        self.assert_test(c.structural_hash() != h, "input limits count")
+        c.setlimits(gates[Const.AND_ID], 2)
+        self.assert_test(c.structural_hash() == h, "restored limit restores the hash")
+
+        spare = [c.getcomponent(Const.NOT_ID) for _ in range(4)]
+        for gate in spare:
+            c.delobj(gate)
+        c.defragment(True)
+        self.assert_test(c.structural_hash() == h, "defragment keeps the hash")
+        self.assert_test(c.structural_hash(c.get_components()) == h, "selecting everything hashes like the circuit")
+        self.assert_test(c.structural_hash([gates[Const.XOR_ID], total]) != h, "a selection hashes on its own")
+
+        fps = [os.path.join(tempfile.gettempdir(), f"hash_ic_{i}.json") for i in range(3)]
+        twin.save_as_ic(fps[0], "HalfAdder", "", "")
+        half_adder(False, 2)[0].save_as_ic(fps[1], "Adder", "", "")
+        half_adder(True, 0, swap=True)[0].save_as_ic(fps[2], "Swapped", "", "")
+        host = Circuit()
+        ics = [host.getIC(fp) for fp in fps]
+        hashes = [host.structural_hash([ic]) for ic in ics]
+        self.assert_test(hashes[0] == hashes[1], "saved ICs with the same logic hash the same")
+        self.assert_test(hashes[0] != hashes[2], "an IC with swapped outputs hashes differently")
+        for fp in fps:
+            os.remove(fp)
+
+    async def test_cone_focus(self):
+        self.subsection("Cone Of Influence")
+        depth = 300
+        c = Circuit()
+        c.simulate(Const.SIMULATE)
+        a, b, s = [c.getcomponent(Const.VARIABLE_ID) for _ in range(3)]
+        gate = c.getcomponent(Const.AND_ID)
+        c.connect(gate, a, 0)
+        c.connect(gate, b, 1)
+        out = c.getcomponent(Const.OUTPUT_PIN_ID)
+        c.connect(out, gate, 0)
+        # two NOT chains nothing watches, one hangs off the cone's input
+        tails = []
+        for root in (a, s):
+            prev = root
+            for _ in range(depth):
+                g = c.getcomponent(Const.NOT_ID)
+                c.connect(g, prev, 0)
+                prev = g
+            tails.append(prev)
+        c.toggle(b, Const.HIGH)
+
+        before = c.eval_count
+        c.toggle(a, Const.HIGH)
+        full = c.eval_count - before
+        self.assert_test(out.getoutput() == "T", "unfocused, the output follows")
+
+        revision = c.revision
+        cone = c.focus()
+        self.assert_test(cone == 4 and c.focused, f"cone of the output pin is a, b, AND and the pin ({cone})")
+        self.assert_test(c.revision == revision, "focusing is not a structural edit")
+        before = c.eval_count
+        c.toggle(a, Const.LOW)
+        focused = c.eval_count - before
+        self.assert_test(out.getoutput() == "F", "focused, the output still follows")
+        self.assert_test(focused < full // 10, f"only the cone is walked ({focused} vs {full} evals)")
+        stale = [tail.getoutput() for tail in tails]
+        c.toggle(s, Const.HIGH)
+        self.assert_test([tail.getoutput() for tail in tails] == stale, "gates outside the cone keep their state")
+
+        c.unfocus()
+        self.assert_test(not c.focused, "unfocus ends the mode")
+        self.assert_test(tails[0].getoutput() == "F" and tails[1].getoutput() == "T", "unfocus settles what the cone skipped")
+        c.toggle(a, Const.HIGH)
+        self.assert_test(tails[0].getoutput() == "T", "every gate is walked again")
+
+        self.assert_test(c.focus([tails[1]]) == depth + 1, "an explicit list sets the cone")
+        c.toggle(s, Const.LOW)
+        c.toggle(a, Const.LOW)
+        self.assert_test(tails[1].getoutput() == "F" and out.getoutput() == "T", "only the listed cone is walked")
+        c.focus()
+        self.assert_test(out.getoutput() == "F", "refocusing settles the new cone first")
+
+        table = c.truthTable()
+        self.assert_test(c.focused and out.getoutput() == "F", "the truth table keeps an earlier focus")
+        c.unfocus()
+        c.table_cache.clear()
+        self.assert_test(c.truthTable() == table and not c.focused, "the table walks the output pins' cone alone")
+
+        if use_reactor:
+            c.focus(compact=True)
+            self.assert_test(sorted(g.location for g in (a, b, gate, out)) == [0, 1, 2, 3], "compact lays the cone out first")
+            c.toggle(a, Const.HIGH)
+            c.toggle(b, Const.HIGH)
+            self.assert_test(out.getoutput() == "T", "the compacted cone still evaluates")
+            c.unfocus()
+            self.assert_test(tails[0].getoutput() == "T", "and settles back after compaction")
+
+    async def test_netlist_evaluate(self):
+        self.subsection("Compiled Netlist")
+        rng = random.Random(47)
+        c = Circuit()
+        vs = [c.getcomponent(Const.VARIABLE_ID) for _ in range(8)]
+        pool = list(vs)
+        for _ in range(60):
+            g = c.getcomponent(rng.choice([Const.AND_ID, Const.NAND_ID, Const.OR_ID, Const.NOR_ID, Const.XOR_ID, Const.XNOR_ID, Const.NOT_ID]))
+            c.connect(g, rng.choice(pool), 0)
+            if g.id != Const.NOT_ID:
+                c.connect(g, rng.choice(pool), 1)
+            pool.append(g)
+        outs = []
+        for g in pool[-5:]:
+            pin = c.getcomponent(Const.OUTPUT_PIN_ID)
+            c.connect(pin, g, 0)
+            outs.append(pin)
+        c.simulate(Const.SIMULATE)
+
+        net = c.compile()
+        self.assert_test(len(net) == 73 and net.variables == 8 and not net.cyclic, "every live gate is compiled, in order")
+        rows = c.truthRows(0)
+        width = 8 + len(outs)
+        cases = [(rows[r*width:r*width+8], rows[r*width+8:(r+1)*width]) for r in range(256)]
+        state = [pin.getoutput() for pin in outs]
+        count = c.eval_count
+        self.assert_test(all(net.evaluate(inputs) == expected for inputs, expected in cases), "evaluate matches the truth table")
+        self.assert_test([pin.getoutput() for pin in outs] == state and c.eval_count == count, "evaluate leaves the circuit alone")
+        inner = pool[-1]
+        self.assert_test(net.evaluate(cases[5][0], [inner.location]) == cases[5][1][-1:], "explicit output locations")
+
+        results = [None] * 4
+        def worker(k):
+            scratch = net.scratch()
+            results[k] = [net.evaluate(inputs, None, scratch) for inputs, _ in cases]
+        threads = [threading.Thread(target=worker, args=(k,)) for k in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assert_test(all(result == [expected for _, expected in cases] for result in results), "threads share one netlist")
+
+        c.disconnect(outs[0], 0)
+        self.assert_test(net.evaluate(cases[3][0]) == cases[3][1], "later edits do not reach the netlist")
+        try:
+            net.evaluate(b"\x00")
+            self.assert_test(False, "a short input is rejected")
+        except ValueError:
+            self.assert_test(True, "a short input is rejected")
+        try:
+            net.evaluate(cases[0][0], [-1])
+            self.assert_test(False, "an unknown location is rejected")
+        except IndexError:
+            self.assert_test(True, "an unknown location is rejected")
+
+        latch = Circuit()
+        s, r = latch.getcomponent(Const.VARIABLE_ID), latch.getcomponent(Const.VARIABLE_ID)
+        q, nq = latch.getcomponent(Const.NOR_ID), latch.getcomponent(Const.NOR_ID)
+        latch.connect(q, r, 0)
+        latch.connect(q, nq, 1)
+        latch.connect(nq, s, 0)
+        latch.connect(nq, q, 1)
+        net = latch.compile()
+        self.assert_test(net.cyclic, "feedback is detected")
+        self.assert_test(net.evaluate([1, 0], [q.location, nq.location]) == bytes([1, 0]), "set settles the latch")
+        self.assert_test(net.evaluate([0, 1], [q.location, nq.location]) == bytes([0, 1]), "reset settles the latch")
+
+    async def test_snapshot_restore(self):
+        self.subsection("Snapshot / Restore")
+        n, depth = 8, 400
+        c = Circuit()
+        c.simulate(Const.SIMULATE)
+        vs = [c.getcomponent(Const.VARIABLE_ID) for _ in range(n)]
+        prev = vs[0]
+        for v in vs[1:]:
+            g = c.getcomponent(Const.XOR_ID)
+            c.connect(g, prev, 0)
+            c.connect(g, v, 1)
+            prev = g
+        for _ in range(depth):
+            g = c.getcomponent(Const.NOT_ID)
+            c.connect(g, prev, 0)
+            prev = g
+        tail = c.getcomponent(Const.OUTPUT_PIN_ID)
+        c.connect(tail, prev, 0)
+        c.observe(tail, True)
+
+        c.toggle(vs[0], Const.HIGH)
+        base = c.snapshot()
+        self.assert_test(len(base) > depth and base.revision == c.revision, "one entry per gate, keyed on the revision")
+        self.assert_test(tail.getoutput() == "T", "odd parity reaches the output")
+        c.toggle(vs[1], Const.HIGH)
+        flipped = c.snapshot()
+        self.assert_test(tail.getoutput() == "F", "the flip reaches the output")
+
+        c.visual_queue_clear()
+        count = c.eval_count
+        c.restore(base)
+        self.assert_test(tail.getoutput() == "T" and c.eval_count == count, "restore rolls back without a cascade")
+        self.assert_test(c.visual_queue_size() == 1, "a changed observed gate is queued for the view")
+        c.restore(flipped)
+        self.assert_test(tail.getoutput() == "F", "snapshots of one structure coexist")
+        c.restore(base)
+        c.toggle(vs[2], Const.HIGH)
+        self.assert_test(tail.getoutput() == "F", "the restored state keeps propagating correctly")
+        c.toggle(vs[1], Const.HIGH)
+        self.assert_test(tail.getoutput() == "T", "books came back with the outputs")
+
+        c.disconnect(tail, 0)
+        try:
+            c.restore(base)
+            self.assert_test(False, "a structural edit retires old snapshots")
+        except ValueError:
+            self.assert_test(True, "a structural edit retires old snapshots")
+        if use_reactor:
+            moved = c.snapshot()
+            c.optimize()
+            try:
+                c.restore(moved)
+                self.assert_test(False, "moving gates retires old snapshots")
+            except ValueError:
+                self.assert_test(True, "moving gates retires old snapshots")
+
+    async def test_circuit_clone(self):
+        self.subsection("Native Clone")
+        c = Circuit()
+        c.simulate(Const.SIMULATE)
+        ic = c.getcomponent(Const.IC_ID)
+        inp = ic.getcomponent(Const.INPUT_PIN_ID)
+        pin = ic.getcomponent(Const.OUTPUT_PIN_ID)
+        inverter = ic.getcomponent(Const.NOT_ID)
+        c.connect(inverter, inp, 0)
+        c.connect(pin, inverter, 0)
+        if USE_COUNTER:
+            c.counter += ic.counter
+        a, b = c.getcomponent(Const.VARIABLE_ID), c.getcomponent(Const.VARIABLE_ID)
+        gate = c.getcomponent(Const.AND_ID)
+        gate.rename("gate")
+        c.connect(gate, a, 0)
+        c.connect(gate, b, 1)
+        c.connect(inp, gate, 0)
+        out = c.getcomponent(Const.OUTPUT_PIN_ID)
+        c.connect(out, pin, 0)
+        c.toggle(a, Const.HIGH)
+        spare = c.getcomponent(Const.OR_ID)
+        c.delobj(spare)
+
+        d = c.clone()
+        self.assert_test(d.structural_hash() == c.structural_hash() and d.revision == c.revision, "the clone has the same structure")
+        self.assert_test([repr(g) for g in d.get_components()] == [repr(g) for g in c.get_components()], "names and codes carry over")
+        da, db = d.get_variables()
+        dout = d.objlist[Const.OUTPUT_PIN_ID][0]
+        self.assert_test(da is not a and dout.getoutput() == out.getoutput() == "T", "the clone has its own wrappers and state")
+
+        d.toggle(db, Const.HIGH)
+        self.assert_test(dout.getoutput() == "F" and out.getoutput() == "T", "simulating the clone leaves the original alone")
+        self.assert_test(d.get_ics()[0].outputs[0].getoutput() == "F", "IC pins follow the clone")
+        c.toggle(b, Const.HIGH)
+        c.toggle(a, Const.LOW)
+        self.assert_test(out.getoutput() == "T" and dout.getoutput() == "F", "simulating the original leaves the clone alone")
+
+        h, revision = c.structural_hash(), c.revision
+        d.disconnect(dout, 0)
+        d.delobj(d.get_ics()[0])
+        self.assert_test(c.revision == revision and c.structural_hash() == h, "editing the clone leaves the original alone")
+        self.assert_test(len(c.get_ics()) == 1 and out.getoutput() == "T", "the original keeps its IC")
+
+        snap = c.snapshot()
+        try:
+            c.clone().restore(snap)
+            self.assert_test(False, "snapshots stay with their circuit")
+        except ValueError:
+            self.assert_test(True, "snapshots stay with their circuit")
+
+    async def test_bdd_symbolic(self):
+        self.subsection("Symbolic Truth Tables")
+        rng = random.Random(50)
+        c = Circuit()
+        vs = [c.getcomponent(Const.VARIABLE_ID) for _ in range(8)]
+        pool = list(vs)
+        for _ in range(60):
+            g = c.getcomponent(rng.choice([Const.AND_ID, Const.NAND_ID, Const.OR_ID, Const.NOR_ID, Const.XOR_ID, Const.XNOR_ID, Const.NOT_ID]))
+            c.connect(g, rng.choice(pool), 0)
+            if g.id != Const.NOT_ID:
+                c.connect(g, rng.choice(pool), 1)
+            pool.append(g)
+        for g in pool[-5:]:
+            c.connect(c.getcomponent(Const.OUTPUT_PIN_ID), g, 0)
+        open_gate = c.getcomponent(Const.AND_ID)
+        c.connect(open_gate, vs[0], 0)
+        c.simulate(Const.SIMULATE)
+        bdd = BDD(8)
+        outs = c.symbolic(bdd)
+        self.assert_test(len(outs) == 5 and bdd.rows(outs, 0, 256) == c.truthRows(0), "BDD rows match the truth table")
+        self.assert_test(c.symbolic(bdd) == outs, "the same circuit gives the same nodes")
+        unknown = c.symbolic(bdd, [open_gate])[0]
+        self.assert_test(bdd.count(unknown, Const.UNKNOWN) == 256, "an open input reads unknown on every row")
+
+        n = 40
+        wide = Circuit()
+        xs = [wide.getcomponent(Const.VARIABLE_ID) for _ in range(n)]
+        conj, parity = xs[0], xs[0]
+        for x in xs[1:-1]:  # the last variable feeds nothing
+            g = wide.getcomponent(Const.AND_ID)
+            wide.connect(g, conj, 0)
+            wide.connect(g, x, 1)
+            conj = g
+            g = wide.getcomponent(Const.XOR_ID)
+            wide.connect(g, parity, 0)
+            wide.connect(g, x, 1)
+            parity = g
+        for g in (conj, parity):
+            wide.connect(wide.getcomponent(Const.OUTPUT_PIN_ID), g, 0)
+        big = BDD(n)
+        f_and, f_xor = wide.symbolic(big)
+        self.assert_test(big.count(f_and) == 2 and big.count(f_and, Const.LOW) == (1 << n) - 2, "AND counts its satisfying rows")
+        self.assert_test(big.count(f_xor) == 1 << (n - 1), "parity is high on half the rows")
+        self.assert_test(big.support(f_xor) == list(range(n - 1)) and not big.depends(f_and, n - 1), "an unused variable is not in the support")
+        start = (1 << n) - 4
+        tail = big.rows([f_and, f_xor], start, 4)
+        self.assert_test([tail[r*(n+2)+n] for r in range(4)] == [0, 0, 1, 1], "rows deep in a wide table are read lazily")
+
+        shared = BDD(2)
+        gates = Circuit()
+        a, b = gates.getcomponent(Const.VARIABLE_ID), gates.getcomponent(Const.VARIABLE_ID)
+        ab = gates.getcomponent(Const.NAND_ID)
+        gates.connect(ab, a, 0)
+        gates.connect(ab, b, 1)
+        left, right, out = (gates.getcomponent(Const.NAND_ID) for _ in range(3))
+        gates.connect(left, a, 0)
+        gates.connect(left, ab, 1)
+        gates.connect(right, b, 0)
+        gates.connect(right, ab, 1)
+        gates.connect(out, left, 0)
+        gates.connect(out, right, 1)
+        single = Circuit()
+        p, q = single.getcomponent(Const.VARIABLE_ID), single.getcomponent(Const.VARIABLE_ID)
+        xor = single.getcomponent(Const.XOR_ID)
+        single.connect(xor, p, 0)
+        single.connect(xor, q, 1)
+        self.assert_test(gates.symbolic(shared, [out]) == single.symbolic(shared, [xor]), "equivalent circuits share one node")
+        self.assert_test(gates.symbolic(shared, [ab]) != single.symbolic(shared, [xor]), "different functions do not")
+
+        latch = Circuit()
+        s, r = latch.getcomponent(Const.VARIABLE_ID), latch.getcomponent(Const.VARIABLE_ID)
+        nq, nnq = latch.getcomponent(Const.NOR_ID), latch.getcomponent(Const.NOR_ID)
+        latch.connect(nq, r, 0)
+        latch.connect(nq, nnq, 1)
+        latch.connect(nnq, s, 0)
+        latch.connect(nnq, nq, 1)
+        try:
+            latch.symbolic(BDD(2))
+            self.assert_test(False, "feedback loops are rejected")
+        except ValueError:
+            self.assert_test(True, "feedback loops are rejected")
+        try:
+            wide.symbolic(BDD(8))
+            self.assert_test(False, "the BDD must cover every variable")
+        except ValueError:
+            self.assert_test(True, "the BDD must cover every variable")
+
     # =========================================================================
     # PART 3: EVENT MANAGER STRESS
     # =========================================================================
@@ -1833,6 +2563,58 @@ class AggressiveTestSuite:
         # 100 inversions = identity (even number)
         self.assert_test(out.output == Const.HIGH, "100-gate IC chain works")
 
+    async def test_ic_lazy_internals(self):
+        self.subsection("IC Internals Without Held Wrappers")
+        c = Circuit()
+        c.simulate(Const.SIMULATE)
+        ic = c.getcomponent(Const.IC_ID)
+        inp = ic.getcomponent(Const.INPUT_PIN_ID)
+        core = ic.getcomponent(Const.NOT_ID)
+        core.rename('core')
+        out = ic.getcomponent(Const.OUTPUT_PIN_ID)
+        c.connect(core, inp, 0)
+        c.connect(out, core, 0)
+        loc, code = core.location, core.code
+        del core
+        gc.collect()
+
+        again = ic.internal[0]
+        self.assert_test(again.location == loc and again.code == code, "internal gate keeps its location and code")
+        self.assert_test(again.custom_name == 'core', "custom name outlives the wrapper")
+        if use_reactor:
+            self.assert_test(c.gate_verse[loc] is again, "one wrapper per location while it is held")
+        self.assert_test(again.sources == [inp], "sources are read back from the circuit")
+        del again
+        v = c.getcomponent(Const.VARIABLE_ID)
+        c.connect(inp, v, 0)
+        c.optimize()
+        c.toggle(v, Const.HIGH)
+        self.assert_test(out.output == Const.LOW, "IC still inverts after optimize")
+        self.assert_test(ic.internal[0].custom_name == 'core', "relocated internal gate keeps its name")
+
+        part = Circuit()
+        pins = [part.getcomponent(Const.INPUT_PIN_ID) for _ in range(3)]
+        gate = part.getcomponent(Const.AND_ID)
+        part.setlimits(gate, 3)
+        gate.rename('all')
+        for k, pin in enumerate(pins):
+            part.connect(gate, pin, k)
+        part.connect(part.getcomponent(Const.OUTPUT_PIN_ID), gate, 0)
+        fp = os.path.join(tempfile.gettempdir(), "lazy_ic.json")
+        part.save_as_ic(fp, "All3", "", "")
+        host = Circuit()
+        host.simulate(Const.SIMULATE)
+        loaded = host.getIC(fp)
+        os.remove(fp)
+        vs = [host.getcomponent(Const.VARIABLE_ID) for _ in range(3)]
+        for pin, v in zip(loaded.inputs, vs):
+            host.connect(pin, v, 0)
+            host.toggle(v, Const.HIGH)
+        self.assert_test(loaded.outputs[0].output == Const.HIGH, "a loaded IC is wired with its input limits")
+        host.toggle(vs[2], Const.LOW)
+        self.assert_test(loaded.outputs[0].output == Const.LOW, "the third pin of a loaded IC is live")
+        self.assert_test(loaded.internal[0].custom_name == 'all', "a loaded internal gate keeps its name")
+
     async def test_ic_cascade(self):
         self.subsection("IC Cascade (10 ICs in series)")
         c = Circuit()
@@ -2071,6 +2853,189 @@ class AggressiveTestSuite:
         
         self.assert_test(table is not None, f"10-input (1024 rows): {duration:.2f} ms")
 
+    async def test_truth_table_wide(self):
+        """17-input truth table (131072 rows), past the old 16-input cap"""
+        n = 17
+        c = Circuit()
+        vars = [c.getcomponent(Const.VARIABLE_ID) for _ in range(n)]
+        g = c.getcomponent(Const.XOR_ID)
+        c.setlimits(g, n)
+        for i, v in enumerate(vars):
+            c.connect(g, v, i)
+        out = c.getcomponent(Const.OUTPUT_PIN_ID)
+        c.connect(out, g, 0)
+        c.simulate(Const.SIMULATE)
+
+        start = time.perf_counter_ns()
+        table = c.truthTable(None,None)
+        duration = (time.perf_counter_ns() - start) / 1_000_000
+        rows = [line.split("|") for line in table.split("\n")[3:-2]]
+        self.assert_test(len(rows) == 1 << n, f"17-input ({1 << n} rows): {duration:.2f} ms")
+        parity = all((row[-1].strip() == 'T') == (sum(cell.strip() == '1' for cell in row[:-1]) & 1) for row in rows)
+        self.assert_test(parity, "every row matches the XOR parity")
+        c.table_cache.clear()
+        self.assert_test(c.truthTable(workers=3) == table, "workers on clones build the same table")
+        self.assert_test(c.truthTable(vars[:2], [g]) != table, "hand-picked columns are a table of their own")
+
+    async def test_truth_table_stream(self):
+        """writeTruthTable streams text, csv and binary rows in bounded chunks"""
+        n = 13
+        c = Circuit()
+        vars = [c.getcomponent(Const.VARIABLE_ID) for _ in range(n)]
+        g = c.getcomponent(Const.XOR_ID)
+        c.setlimits(g, n)
+        for i, v in enumerate(vars):
+            c.connect(g, v, i)
+        out = c.getcomponent(Const.OUTPUT_PIN_ID)
+        c.connect(out, g, 0)
+        c.simulate(Const.SIMULATE)
+
+        text = io.StringIO()
+        rows = c.writeTruthTable(text)
+        self.assert_test(rows == 1 << n, f"writer reports {1 << n} rows")
+        self.assert_test(text.getvalue() == c.truthTable(), "streamed text equals truthTable()")
+
+        csv = io.StringIO()
+        c.writeTruthTable(csv, 'csv')
+        lines = csv.getvalue().split("\n")
+        self.assert_test(len(lines) == (1 << n) + 2 and lines[-1] == "", "csv has a header and one line per row")
+        cells = [line.split(",") for line in lines[1:-1]]
+        in_order = all(int("".join(row[:n]), 2) == i for i, row in enumerate(cells))
+        self.assert_test(in_order, "csv rows are in input order")
+        parity = all(row[n] == str(sum(map(int, row[:n])) & 1) for row in cells)
+        self.assert_test(parity, "csv rows match the XOR parity")
+
+        packed = io.BytesIO()
+        c.writeTruthTable(packed, 'binary')
+        raw = packed.getvalue()
+        self.assert_test(len(raw) == (1 << n) * (n + 1), "binary holds one byte per cell")
+        self.assert_test(all(raw[i*(n+1)+n] == bin(i).count("1") & 1 for i in range(1 << n)), "binary rows match the XOR parity")
+        self.assert_test(out.output == Const.LOW, "circuit is back in its simulated state")
+
+        limit = (1 << Const.TABLE_CHUNK) + 5 # ends inside the second chunk
+        head = io.StringIO()
+        rows = c.writeTruthTable(head, 'csv', limit=limit)
+        self.assert_test(rows == limit and head.getvalue() == "\n".join(lines[:limit + 1]) + "\n",
+            "limit writes only the first rows")
+        self.assert_test(c.writeTruthTable(io.StringIO(), 'csv', limit=1 << (n + 1)) == 1 << n, "a limit past the table writes it all")
+
+        try:
+            c.writeTruthTable(io.StringIO(), 'xml')
+            self.assert_test(False, "unknown format rejected")
+        except ValueError:
+            self.assert_test(True, "unknown format rejected")
+
+    async def test_truth_table_rows(self):
+        """truthRows hands out the table a chunk at a time, diagnose_row one gate at a time"""
+        n = Const.TABLE_CHUNK + 2
+        c = Circuit()
+        vars = [c.getcomponent(Const.VARIABLE_ID) for _ in range(n)]
+        g = c.getcomponent(Const.XOR_ID)
+        c.setlimits(g, n)
+        for i, v in enumerate(vars):
+            c.connect(g, v, i)
+        out = c.getcomponent(Const.OUTPUT_PIN_ID)
+        c.connect(out, g, 0)
+        c.simulate(Const.SIMULATE)
+
+        packed = io.BytesIO()
+        c.writeTruthTable(packed, 'binary')
+        chunks = [c.truthRows(chunk) for chunk in (3, 0, 2, 1)]
+        self.assert_test(b"".join(chunks[i] for i in (1, 3, 2, 0)) == packed.getvalue(), "chunks in any order match the whole table")
+        self.assert_test(out.output == Const.LOW, "circuit is back in its simulated state")
+        try:
+            c.truthRows(4)
+            self.assert_test(False, "chunk past the table rejected")
+        except IndexError:
+            self.assert_test(True, "chunk past the table rejected")
+
+        name, sources, book, targets, output = c.diagnose_row(g)
+        self.assert_test(name == repr(g) and sources.count("[") == n, "diagnose_row lists every source")
+        self.assert_test(repr(out) in targets, "diagnose_row lists the targets")
+
+    async def test_truth_table_cache(self):
+        """Repeat truth tables come from table_cache until the structure changes"""
+        def parity(n):
+            c = Circuit()
+            vars = [c.getcomponent(Const.VARIABLE_ID) for _ in range(n)]
+            g = c.getcomponent(Const.XOR_ID)
+            c.setlimits(g, n)
+            for i, v in enumerate(vars):
+                c.connect(g, v, i)
+            out = c.getcomponent(Const.OUTPUT_PIN_ID)
+            c.connect(out, g, 0)
+            c.simulate(Const.SIMULATE)
+            return c, vars, g
+
+        n = Const.TABLE_CHUNK + 1
+        c, vars, g = parity(n)
+        cache = c.table_cache
+        cache.clear()
+        table = c.truthTable()
+        evals = c.eval_count
+        start = time.perf_counter_ns()
+        again = c.truthTable()
+        duration = (time.perf_counter_ns() - start) / 1_000_000
+        self.assert_test(again == table and c.eval_count == evals, f"repeat table is served from the cache: {duration:.2f} ms")
+        twin = parity(n)[0]
+        evals = twin.eval_count
+        self.assert_test(twin.truthTable() == table and twin.eval_count == evals, "a circuit with the same structure shares the entry")
+
+        c.disconnect(g, 0)
+        self.assert_test(c.truthTable() != table, "a structural edit misses the cache")
+        c.connect(g, vars[0], 0)
+        evals = c.eval_count
+        self.assert_test(c.truthTable() == table and c.eval_count == evals, "restoring the structure hits the cache again")
+
+        folder = tempfile.mkdtemp()
+        cache.directory = folder
+        try:
+            cache.clear()
+            c.truthTable()
+            self.assert_test(len(os.listdir(folder)) == 2, "chunks are written to the directory")
+            cache.directory = None
+            cache.clear() # memory only
+            cache.directory = folder
+            evals = c.eval_count
+            self.assert_test(c.truthTable() == table and c.eval_count == evals, "the directory serves chunks memory lost")
+            cache.limit = (1 << Const.TABLE_CHUNK) * (n + 1)
+            c.setlimits(g, n + 1)
+            c.truthTable()
+            self.assert_test(len(cache) == 1 and len(os.listdir(folder)) == 1, "least recently used chunks are evicted past the cap")
+        finally:
+            cache.clear()
+            cache.directory = None
+            cache.limit = Const.TABLE_CACHE
+            os.rmdir(folder)
+
+        def masks(swap):
+            # AND(a, b) and AND(a, NOT b); swap builds them in the other order, same structure
+            c = Circuit()
+            a, b = c.getcomponent(Const.VARIABLE_ID), c.getcomponent(Const.VARIABLE_ID)
+            nb = c.getcomponent(Const.NOT_ID)
+            c.connect(nb, b, 0)
+            first, second = c.getcomponent(Const.AND_ID), c.getcomponent(Const.AND_ID)
+            c.connect(first, a, 0)
+            c.connect(first, nb if swap else b, 1)
+            c.connect(second, a, 0)
+            c.connect(second, b if swap else nb, 1)
+            c.simulate(Const.SIMULATE)
+            return c, a, b, first, second
+
+        left, a1, b1, f1, s1 = masks(False)
+        right, a2, b2, f2, s2 = masks(True)
+        self.assert_test(left.structural_hash() == right.structural_hash() and f1.code == f2.code, "two layouts of one structure")
+        def rows(c, variables, outputs):
+            stream = io.BytesIO()
+            c.writeTruthTable(stream, 'binary', variables, outputs)
+            return stream.getvalue()
+
+        cache.clear()
+        picked = rows(left, [a1, b1], [f1])
+        self.assert_test(rows(right, [a2, b2], [f2]) != picked, "picked columns are keyed by structure, not by slot")
+        evals = right.eval_count
+        self.assert_test(rows(right, [a2, b2], [s2]) == picked and right.eval_count == evals, "the same picked gate shares the entry")
+
     async def test_truth_table_complex(self):
         """Full adder circuit (3 inputs, 2 outputs)"""
         c = Circuit()
@@ -3223,6 +4188,99 @@ class AggressiveTestSuite:
         )
         self.assert_test(all_ok, "All gate.location indices consistent with gate_verse")
 
+    async def test_optimize_relocation_map(self):
+        """optimize()/refresh() return the old->new location of every gate."""
+        self.subsection("optimize: relocation map")
+        c = Circuit()
+        c.simulate(Const.SIMULATE)
+        # built back to front so optimize has to move every gate
+        gates = [c.getcomponent(Const.NOT_ID) for _ in range(10)]
+        v = c.getcomponent(Const.VARIABLE_ID)
+        prev = v
+        for g in reversed(gates):
+            c.connect(g, prev, 0)
+            prev = g
+        doomed = c.getcomponent(Const.AND_ID)
+        before = {g: g.location for g in gates + [v, doomed]}
+        c.delobj(doomed)
+
+        relocation = c.optimize()
+        self.assert_test(len(relocation) == len(before), f"map covers all {len(before)} slots")
+        self.assert_test(all(relocation[old] == g.location for g, old in before.items()),
+            "map matches the new gate locations")
+        self.assert_test(sorted(relocation) == list(range(len(before))), "map is a permutation")
+
+        before = {g: g.location for g in gates + [v]}
+        relocation = c.refresh()
+        self.assert_test(relocation[doomed.location] == -1, "purged gate maps to -1")
+        self.assert_test(all(relocation[old] == g.location for g, old in before.items()),
+            "live gates keep their locations on refresh")
+        c.toggle(v, Const.HIGH)
+        self.assert_test(gates[0].getoutput() == 'T', "circuit still simulates after relocation")
+
+    async def test_fragmentation_defragment(self):
+        """fragmentation() grows with buried tombstones and defragment() resets it."""
+        self.subsection("defragment: fragmentation score")
+        c = Circuit()
+        c.simulate(Const.SIMULATE)
+        v = c.getcomponent(Const.VARIABLE_ID)
+        gates = [c.getcomponent(Const.NOT_ID) for _ in range(20)]
+        prev = v
+        for g in reversed(gates): # every wire jumps back across the chain
+            c.connect(g, prev, 0)
+            prev = g
+        self.assert_test(c.fragmentation() == 0, "a never optimized layout is its own baseline")
+        self.assert_test(len(c.defragment()) == 0, "a fresh circuit is not re-packed")
+        c.optimize()
+        gates.sort(key=lambda g: g.location) # chain order again
+        self.assert_test(c.fragmentation() == 0, f"optimized layout scores 0 (got {c.fragmentation():.3f})")
+        self.assert_test(len(c.defragment()) == 0, "defragment skips a clean layout")
+
+        dead = gates[2:12]
+        for g in dead:
+            c.delobj(g)
+        score = c.fragmentation()
+        self.assert_test(score >= c.frag_threshold, f"buried tombstones push the score over the threshold ({score:.3f})")
+        before = {g: g.location for g in gates}
+        moves = c.defragment()
+        moved = dict(zip(moves[::2], moves[1::2]))
+        self.assert_test(all(moved.get(old, old) == g.location for g, old in before.items()),
+            "defragment returns the old, new pairs of the gates it moved")
+        self.assert_test(c.fragmentation() == 0, "score resets after defragment")
+        self.assert_test(all(g.location >= len(c.gate_verse) - len(dead) for g in dead),
+            "tombstones moved behind the live gates")
+
+        # past limit gates a call only swaps that many tail gates into the lowest holes
+        c = Circuit()
+        c.simulate(Const.SIMULATE)
+        v = c.getcomponent(Const.VARIABLE_ID)
+        pairs = []
+        for _ in range(12):
+            a = c.getcomponent(Const.NOT_ID)
+            b = c.getcomponent(Const.NOT_ID)
+            c.connect(a, v, 0)
+            c.connect(b, a, 0)
+            pairs.append((a, b))
+        dead = [g for pair in pairs[:4] for g in pair]
+        for g in dead:
+            c.delobj(g)
+        c.collect(True)
+        c.frag_threshold = 0  # step until no hole is left
+        steps = []
+        while moves := c.defragment(limit=3):
+            steps.append(len(moves) // 4)
+        live = len(c.gate_verse) - len(dead)
+        self.assert_test(steps == [3, 3, 2], f"each step moves at most limit gates (moved {steps})")
+        self.assert_test(all(g.location >= live for g in dead), "stepping buries no tombstone")
+        for value in (Const.HIGH, Const.LOW, Const.HIGH):
+            c.toggle(v, value)
+            ok = all(a.output == 1 - value and b.output == value for a, b in pairs[4:])
+            self.assert_test(ok, f"wires follow the swapped gates (v={value})")
+        for g in dead:
+            c.renewobj(g)
+        c.toggle(v, Const.LOW)
+        self.assert_test(all(b.output == Const.LOW for a, b in pairs), "undo renews the swapped tombstones")
+
     async def test_refresh_trims_trailing_deleted(self):
         """refresh() removes trailing deleted (type<0) entries from gate_infolist."""
         self.subsection("refresh: trims trailing deleted slots")
@@ -172,6 +172,7 @@ class VerilogRunner:
         content = re.sub(r'/\*.*?\*/', '', content, flags=re.DOTALL)
         content = re.sub(r'//.*', '', content)
         statements = [s.strip() for s in content.split(';') if s.strip()]
+        self.circuit.reserve(len(statements))  # roughly one gate per statement
         connections = []
 
         for stmt in statements:
@@ -45,6 +45,7 @@ def load_verilog(filepath: str):
     content = re.sub(r'/\*.*?\*/', '', content, flags=re.DOTALL)
     content = re.sub(r'//.*', '', content)
     statements = [s.strip() for s in content.split(';') if s.strip()]
+    circuit.reserve(len(statements))  # roughly one gate per statement
 
     # First Pass: Instantiate nodes
     for stmt in statements: